@@ -1,15 +1,23 @@
 """
-Module pour ajouter une protéine à MongoDB et Neo4j.
+Module pour ajouter des protéines (une ou par lots avec add_proteins) à MongoDB et Neo4j.
 - MongoDB: stocke les informations de la protéine
 - Neo4j: crée le nœud protéine et les relations SIMILAR basées sur les domaines InterPro partagés
 """
 
-from pymongo import MongoClient
+from pymongo import MongoClient, ReplaceOne
 from neo4j import GraphDatabase
 import os
 import dotenv
 import re
-import ast
+
+import suggestions
+import kmer_index
+import sequence_store
+from data_version import bump_data_version, bump_graph_version
+import datasets
+import stats_store
+import clusters
+import outbox
 
 dotenv.load_dotenv()
 
@@ -24,6 +32,15 @@ NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "NoSQLProject")
 NEO4J_DATABASE = os.getenv("NEO4J_DATABASE_NAME", "project")
 
+# Taille des lots Neo4j (nœuds et relations par transaction)
+NODE_BATCH_SIZE = 1000
+EDGE_BATCH_SIZE = 5000
+
+# "direct" : Neo4j écrit pendant l'appel ; "outbox" : par le worker en arrière-plan (voir outbox.py)
+WRITE_MODE = os.getenv("DUAL_WRITE_MODE", "direct")
+# Mode direct : écritures MongoDB et Neo4j lancées simultanément
+CONCURRENT_WRITES = os.getenv("CONCURRENT_WRITES", "1") != "0"
+
 
 def split_string_to_list(val, delimiter=';'):
     """Fonction pour nettoyer et diviser les chaînes (InterPro, EC)"""
@@ -63,204 +80,425 @@ def prepare_mongo_document(protein_data):
     }
 
 
-def add_protein_to_mongo(protein_data):
+def add_proteins_to_mongo(proteins_data, collection=None):
     """
-    Ajoute une protéine à la base de données MongoDB.
+    Ajoute ou remplace un lot de protéines dans MongoDB en une écriture groupée
+    (séquences, suggestions et k-mers mis à jour par lot).
+
+    Args:
+        proteins_data (list): dictionnaires de protéines (voir prepare_mongo_document)
+        collection: collection cible (par défaut la version active, voir datasets.py)
+
+    Returns:
+        dict: {"inserted": [entries], "updated": [entries]}
     """
-    try:
+    client = None
+    if collection is None:
         client = MongoClient(MONGO_URI)
-        db = client[DB_NAME]
-        collection = db[COLLECTION_NAME]
-        
-        doc = prepare_mongo_document(protein_data)
-        
+        # Collection active derrière l'alias (voir datasets.py)
+        collection = datasets.active_collection(client[DB_NAME], COLLECTION_NAME)
+    try:
+        docs = [prepare_mongo_document(protein_data) for protein_data in proteins_data]
+        # La séquence est stockée à part (voir sequence_store.py)
+        sequence_docs = [sequence_store.split_sequence(doc) for doc in docs]
+        entries = [doc["_id"] for doc in docs]
+        # Anciennes séquences, pour mettre à jour l'index de k-mers
+        previous_sequences = sequence_store.get_sequences(collection, entries)
+        # Anciens documents labellisés, pour les statistiques (voir stats_store.py)
+        previously_labelled = stats_store.labelled_entries(collection, entries)
+
         # Utiliser upsert pour éviter les doublons
-        result = collection.replace_one(
-            {"_id": doc["_id"]},
-            doc,
-            upsert=True
+        result = collection.bulk_write(
+            [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in docs],
+            ordered=False
         )
-        
-        if result.upserted_id:
-            print(f"✅ Protéine {doc['_id']} ajoutée à MongoDB")
+        sequence_store.store_sequences(collection, sequence_docs)
+
+        # Mise à jour de l'index d'auto-complétion
+        suggestions.index_proteins(collection, docs)
+        # Mise à jour de l'index de k-mers (les anciennes séquences sont retirées en cas de mise à jour)
+        kmer_index.remove_many_from_index(collection, [
+            (entry, previous_sequences[entry])
+            for entry, sequence_doc in zip(entries, sequence_docs)
+            if previous_sequences.get(entry) and previous_sequences[entry] != sequence_doc["sequence"]
+        ])
+        kmer_index.add_many_to_index(collection, [(d["_id"], d["sequence"]) for d in sequence_docs])
+        # Invalide les caches de comptage / résultats
+        bump_data_version(collection)
+        # Rechargement en cours : protéines à recopier dans la nouvelle version
+        datasets.track_write(collection, entries)
+
+        inserted = [entries[i] for i in result.upserted_ids]
+        inserted_set = set(inserted)
+        labelled = sum(1 for doc in docs if doc["annotations"]["ec_numbers"])
+        stats_store.increment(
+            collection,
+            total_proteins=len(inserted),
+            labelled_proteins=labelled - len(previously_labelled)
+        )
+        # Nouveaux documents sans cluster, anciens remplacés sans leurs champs de cluster
+        clusters.mark_stale(collection, len(entries))
+        return {"inserted": inserted, "updated": [e for e in entries if e not in inserted_set]}
+    finally:
+        if client:
+            client.close()
+
+
+def add_protein_to_mongo(protein_data):
+    """
+    Ajoute une protéine à la base de données MongoDB.
+    """
+    try:
+        result = add_proteins_to_mongo([protein_data])
+        entry = protein_data.get("entry")
+        if result["inserted"]:
+            print(f"✅ Protéine {entry} ajoutée à MongoDB")
         else:
-            print(f"🔄 Protéine {doc['_id']} mise à jour dans MongoDB")
-        
-        client.close()
-        return doc["_id"]
+            print(f"🔄 Protéine {entry} mise à jour dans MongoDB")
+        return entry
         
     except Exception as e:
         print(f"❌ Erreur MongoDB: {e}")
         return None
 
 
-def add_protein_to_neo4j(protein_data):
+def _prepare_node(protein_data):
+    return {
+        "entry": protein_data.get("entry"),
+        "entry_name": protein_data.get("entry_name", ""),
+        "protein_names": process_protein_names(protein_data.get("protein_names", "")),
+        "organism": protein_data.get("organism", ""),
+        "sequence": protein_data.get("sequence", ""),
+        "ec_numbers": split_string_to_list(protein_data.get("ec_numbers", "")),
+        "interpro_list": split_string_to_list(protein_data.get("interpro", "")),
+    }
+
+
+def find_candidates(collection, domains):
     """
-    Ajoute une protéine à Neo4j et crée les relations SIMILAR avec les protéines
-    partageant des domaines InterPro.
+    Protéines partageant au moins un domaine InterPro, lues via l'index multikey
+    de MongoDB sur annotations.interpro (voir mongo_indexes.py) : le coût dépend
+    du nombre de protéines réellement concernées, pas de la taille du graphe.
+
+    Returns:
+        list: [(entry, domaines)]
+    """
+    cursor = collection.find(
+        {"annotations.interpro": {"$in": list(domains)}},
+        {"annotations.interpro": 1}
+    ).batch_size(10_000)
+    return [(doc["_id"], doc.get("annotations", {}).get("interpro", [])) for doc in cursor]
+
+
+def jaccard_edges(nodes, candidates):
+    """
+    Poids de Jaccard entre les protéines du lot et les candidats, calculés en mémoire.
+    Chaque paire n'est produite qu'une fois (y compris entre deux protéines du lot).
+
+    Args:
+        nodes (list): nœuds du lot ({"entry", "interpro_list"})
+        candidates (list): (entry, domaines) des protéines existantes
+
+    Returns:
+        list: [{"source", "target", "weight", "shared_domains"}]
     """
-    driver = None
+    batch = {node["entry"]: set(node["interpro_list"]) for node in nodes if node["interpro_list"]}
+    # Index inversé domaine -> protéines du lot
+    by_domain = {}
+    for entry, domains in batch.items():
+        for domain in domains:
+            by_domain.setdefault(domain, []).append(entry)
+
+    edges = []
+    seen = set()
+    for other_entry, other_domains in candidates:
+        other_set = set(other_domains)
+        targets = {entry for domain in other_set for entry in by_domain.get(domain, ())}
+        for entry in targets:
+            if entry == other_entry:
+                continue
+            pair = (entry, other_entry) if entry < other_entry else (other_entry, entry)
+            # Deux protéines du lot se rencontrent deux fois
+            if other_entry in batch:
+                if pair in seen:
+                    continue
+                seen.add(pair)
+            shared = batch[entry] & other_set
+            union = batch[entry] | other_set
+            edges.append({
+                "source": entry,
+                "target": other_entry,
+                "weight": len(shared) / len(union),
+                "shared_domains": sorted(shared)
+            })
+    return edges
+
+
+def node_from_document(doc, sequence=""):
+    """Nœud Neo4j à partir d'un document MongoDB (séquence lue dans la collection annexe)"""
+    annotations = doc.get("annotations", {})
+    return {
+        "entry": doc["_id"],
+        "entry_name": doc.get("entry_name", ""),
+        "protein_names": doc.get("protein_names", []),
+        "organism": doc.get("organism", ""),
+        "sequence": sequence,
+        "ec_numbers": annotations.get("ec_numbers", []),
+        "interpro_list": annotations.get("interpro", []),
+    }
+
+
+def add_proteins_to_neo4j(proteins_data, database=None, collection=None):
+    """Ajoute un lot de protéines (format d'entrée de add_proteins) à Neo4j, voir add_nodes_to_neo4j"""
+    return add_nodes_to_neo4j([_prepare_node(p) for p in proteins_data], database, collection)
+
+
+def _delete_stale_relations(tx, rows):
+    """Supprime les relations SIMILAR de chaque nœud vers les protéines hors de row.keep"""
+    result = tx.run(
+        """
+        UNWIND $rows AS row
+        MATCH (p:Protein {entry: row.entry})-[r:SIMILAR]-(n:Protein)
+        WHERE NOT n.entry IN row.keep
+        DELETE r
+        RETURN collect(DISTINCT n.entry) AS neighbours
+        """,
+        rows=rows
+    )
+    neighbours = result.single()["neighbours"]
+    return neighbours, result.consume().counters.relationships_deleted
+
+
+def add_nodes_to_neo4j(nodes, database=None, collection=None, node_batch_size=NODE_BATCH_SIZE,
+                       edge_batch_size=EDGE_BATCH_SIZE):
+    """
+    Ajoute un lot de nœuds à Neo4j : nœuds par UNWIND, candidats lus dans
+    l'index InterPro de MongoDB pour tout le lot, poids de Jaccard calculés en
+    mémoire et relations SIMILAR écrites par UNWIND ... MERGE (une transaction
+    par edge_batch_size arêtes). Les relations SIMILAR des nœuds du lot qui ne
+    sont plus calculées (domaines modifiés) sont supprimées avant : le graphe
+    est aligné sur MongoDB. Les compteurs de stats_store (protéines isolées,
+    relations) sont mis à jour d'après les seuls nœuds touchés.
+
+    Args:
+        collection: collection MongoDB des candidats (par défaut la version active)
+
+    Returns:
+        dict: {"relations": relations calculées (créées ou mises à jour),
+               "created": relations réellement créées (relationships_created des MERGE)}
+    """
+    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    client = None
+    if collection is None:
+        client = MongoClient(MONGO_URI)
+        collection = datasets.active_collection(client[DB_NAME], COLLECTION_NAME)
     try:
-        driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
-        
-        with driver.session(database=NEO4J_DATABASE) as session:
-            entry = protein_data.get("entry")
-            entry_name = protein_data.get("entry_name", "")
-            protein_names = process_protein_names(protein_data.get("protein_names", ""))
-            organism = protein_data.get("organism", "")
-            sequence = protein_data.get("sequence", "")
-            ec_numbers = split_string_to_list(protein_data.get("ec_numbers", ""))
-            interpro_list = split_string_to_list(protein_data.get("interpro", ""))
-            
-            # 1. Créer ou mettre à jour le nœud Protein
-            def create_protein_node(tx):
-                tx.run(
-                    """
-                    MERGE (p:Protein {entry: $entry})
-                    SET p.entry_name = $entry_name,
-                        p.protein_names = $protein_names,
-                        p.organism = $organism,
-                        p.sequence = $sequence,
-                        p.ec_numbers = $ec_numbers,
-                        p.interpro_list = $interpro_list
-                    """,
-                    entry=entry,
-                    entry_name=entry_name,
-                    protein_names=protein_names,
-                    organism=organism,
-                    sequence=sequence,
-                    ec_numbers=ec_numbers,
-                    interpro_list=interpro_list
-                )
-            
-            session.execute_write(create_protein_node)
-            print(f"✅ Nœud Protein {entry} créé/mis à jour dans Neo4j")
-            
-            # 2. Si pas de domaines InterPro, pas de relations SIMILAR
-            if not interpro_list:
-                print(f"ℹ️ Pas de domaines InterPro pour {entry}, aucune relation SIMILAR créée")
-                return (0, [])
-            
-            # 3. Trouver les protéines avec des domaines InterPro en commun
-            def find_similar_proteins(tx):
-                result = tx.run(
-                    """
-                    MATCH (other:Protein)
-                    WHERE other.entry <> $entry
-                      AND other.interpro_list IS NOT NULL
-                      AND (
-                          // Cas 1: interpro_list est une vraie liste Neo4j
-                          (other.interpro_list[0] IS NOT NULL 
-                           AND size([d IN other.interpro_list WHERE d IN $interpro_list]) > 0)
-                          OR
-                          // Cas 2: interpro_list est une string (anciennes données)
-                          (other.interpro_list[0] IS NULL 
-                           AND ANY(domain IN $interpro_list WHERE other.interpro_list CONTAINS domain))
-                      )
-                    RETURN other.entry AS other_entry,
-                           other.interpro_list AS other_interpro
-                    """,
-                    entry=entry,
-                    interpro_list=interpro_list
-                )
-                return [(record["other_entry"], record["other_interpro"]) for record in result]
-            
-            similar_proteins = session.execute_read(find_similar_proteins)
-            
-            if not similar_proteins:
-                print(f"ℹ️ Aucune protéine similaire trouvée pour {entry}")
-                return (0, [])
-            
-            # 4. Calculer les poids et créer les relations SIMILAR
-            relations_created = []
-            
-            def create_similar_relation(tx, other_entry, weight):
-                # Supprimer d'abord les relations existantes entre ces deux protéines
-                tx.run(
+        database = database or datasets.active_neo4j_database(COLLECTION_NAME, fresh=True)
+        with driver.session(database=database) as session:
+            # 1. Protéines avec des domaines InterPro en commun (index MongoDB) et poids de Jaccard.
+            # Les protéines du lot comptent avec leurs nouveaux domaines : l'écriture
+            # MongoDB peut être en cours (écriture simultanée, voir outbox.dual_write)
+            domains = sorted({d for node in nodes for d in node["interpro_list"]})
+            edges = []
+            if domains:
+                batch_entries = {node["entry"] for node in nodes}
+                candidates = [c for c in find_candidates(collection, domains) if c[0] not in batch_entries]
+                candidates += [(node["entry"], node["interpro_list"]) for node in nodes]
+                edges = jaccard_edges(nodes, candidates)
+
+            # Protéines dont le degré peut changer : isolées avant l'écriture
+            touched = {node["entry"] for node in nodes} | {e["target"] for e in edges}
+            isolated_before = session.execute_read(stats_store.count_isolated, touched)
+
+            # 2. Créer ou mettre à jour les nœuds Protein
+            for i in range(0, len(nodes), node_batch_size):
+                session.execute_write(lambda tx, b=nodes[i:i + node_batch_size]: tx.run(
                     """
-                    MATCH (p1:Protein {entry: $entry})-[r:SIMILAR]-(p2:Protein {entry: $other_entry})
-                    DELETE r
+                    UNWIND $batch AS node
+                    MERGE (p:Protein {entry: node.entry})
+                    SET p.entry_name = node.entry_name,
+                        p.protein_names = node.protein_names,
+                        p.organism = node.organism,
+                        p.sequence = node.sequence,
+                        p.ec_numbers = node.ec_numbers,
+                        p.interpro_list = node.interpro_list
                     """,
-                    entry=entry,
-                    other_entry=other_entry
-                )
-                # Créer la nouvelle relation bidirectionnelle (une seule arête)
-                tx.run(
+                    batch=b
+                ).consume())
+
+            # 3. Relations SIMILAR qui ne sont plus calculées pour les nœuds du lot
+            keep = {node["entry"]: set() for node in nodes}
+            for e in edges:
+                keep.setdefault(e["source"], set()).add(e["target"])
+                keep.setdefault(e["target"], set()).add(e["source"])
+            rows = [{"entry": node["entry"], "keep": sorted(keep[node["entry"]])} for node in nodes]
+            removed = 0
+            for i in range(0, len(rows), node_batch_size):
+                neighbours, deleted = session.execute_write(_delete_stale_relations, rows[i:i + node_batch_size])
+                removed += deleted
+                # Anciens voisins : reliés au lot avant l'écriture, donc non isolés
+                touched.update(neighbours)
+
+            # 4. Relations SIMILAR par lots
+            created = 0
+            for i in range(0, len(edges), edge_batch_size):
+                created += session.execute_write(lambda tx, b=edges[i:i + edge_batch_size]: tx.run(
                     """
-                    MATCH (p1:Protein {entry: $entry})
-                    MATCH (p2:Protein {entry: $other_entry})
-                    CREATE (p1)-[:SIMILAR {weight: $weight}]->(p2)
+                    UNWIND $batch AS edge
+                    MATCH (p1:Protein {entry: edge.source})
+                    MATCH (p2:Protein {entry: edge.target})
+                    // Une seule arête par paire, quel que soit son sens
+                    MERGE (p1)-[r:SIMILAR]-(p2)
+                    SET r.weight = edge.weight
                     """,
-                    entry=entry,
-                    other_entry=other_entry,
-                    weight=weight
-                )
-            
-            for other_entry, other_interpro in similar_proteins:
-                # Gérer le cas où other_interpro est une string (anciennes données)
-                if isinstance(other_interpro, str):
-                    # Parser la string "['IPR001', 'IPR002']" en liste
-                    try:
-                        other_interpro_list = ast.literal_eval(other_interpro)
-                    except:
-                        # Fallback: extraire les IPR avec regex
-                        other_interpro_list = re.findall(r'IPR\d+', other_interpro)
-                else:
-                    other_interpro_list = other_interpro if other_interpro else []
-                
-                # Calcul du poids Jaccard: intersection / union
-                set_new = set(interpro_list)
-                set_other = set(other_interpro_list)
-                
-                intersection = len(set_new & set_other)
-                union = len(set_new | set_other)
-                weight = intersection / union if union > 0 else 0
-                
-                session.execute_write(create_similar_relation, other_entry, weight)
-                relations_created.append({
-                    "source": entry,
-                    "target": other_entry,
-                    "weight": weight,
-                    "shared_domains": list(set_new & set_other)
-                })
-            
-            print(f"✅ {len(relations_created)} relations SIMILAR créées pour {entry}")
-            return (len(relations_created), relations_created)
+                    batch=[{"source": e["source"], "target": e["target"], "weight": e["weight"]} for e in b]
+                ).consume().counters.relationships_created)
+
+            isolated_after = session.execute_read(stats_store.count_isolated, touched)
+            stats_store.increment(collection, isolated_proteins=isolated_after - isolated_before,
+                                  similar_edges=created - removed)
+            # Invalide les voisinages en cache (voir neo4j_query.py)
+            bump_graph_version(collection.database, database)
+            return {"relations": edges, "created": created}
+    finally:
+        driver.close()
+        if client:
+            client.close()
+
+
+def add_protein_to_neo4j(protein_data):
+    """
+    Ajoute une protéine à Neo4j et crée les relations SIMILAR avec les protéines
+    partageant des domaines InterPro.
+    """
+    entry = protein_data.get("entry")
+    try:
+        written = add_proteins_to_neo4j([protein_data])
+        print(f"✅ Nœud Protein {entry} créé/mis à jour dans Neo4j")
+        if not written["relations"]:
+            print(f"ℹ️ Aucune protéine similaire trouvée pour {entry}")
+            return (0, [])
+        print(f"✅ {written['created']} relations SIMILAR créées pour {entry}")
+        return (written["created"], written["relations"])
             
     except Exception as e:
         print(f"❌ Erreur Neo4j: {e}")
         return (0, [])
-    finally:
-        if driver:
-            driver.close()
 
 
-def add_protein(protein_data):
+def add_proteins(proteins_data, mode=None, key=None, concurrent=None):
+    """
+    Ajoute un lot de protéines à MongoDB et Neo4j.
+
+    Args:
+        mode (str): "direct" (Neo4j écrit pendant l'appel) ou "outbox" (Neo4j mis à
+            jour en arrière-plan par le worker, voir outbox.py). Par défaut DUAL_WRITE_MODE.
+        key (str): clé d'idempotence (mode outbox) : un appel rejoué n'est enregistré qu'une fois
+        concurrent (bool): mode direct, écritures MongoDB et Neo4j simultanées (par défaut CONCURRENT_WRITES)
+
+    En mode direct, si l'une des deux écritures échoue, Neo4j est réaligné sur
+    MongoDB (outbox.reconcile) : les deux bases ne restent pas divergentes.
+
+    Returns:
+        dict: {"count", "mongodb": {"success", "inserted", "updated"},
+               "neo4j": {"success", "similar_count", "queued", "pending"}, "compensation", "success"}
+        En mode outbox, neo4j.success reste False et neo4j.pending vaut True : Neo4j
+        sera mis à jour par le worker ; success ne reflète alors que MongoDB.
+    """
+    mode = mode or WRITE_MODE
+    concurrent = CONCURRENT_WRITES if concurrent is None else concurrent
+    proteins_data = [p for p in proteins_data if p.get("entry")]
+    entries = [p["entry"] for p in proteins_data]
+    result = {
+        "count": len(proteins_data),
+        "mode": mode,
+        "mongodb": {"success": False, "inserted": 0, "updated": 0},
+        "neo4j": {"success": False, "similar_count": 0, "queued": 0, "pending": False}
+    }
+    if not proteins_data:
+        result["success"] = False
+        return result
+
+    # En mode outbox, l'intention est enregistrée avant l'écriture MongoDB (un arrêt
+    # entre les deux ne perd pas la synchronisation), retenue jusqu'à la fin de celle-ci
+    if mode == "outbox":
+        with outbox.held_for_active("upsert", entries, key) as queued:
+            result["neo4j"]["queued"] = queued
+            try:
+                mongo = add_proteins_to_mongo(proteins_data)
+                result["mongodb"] = {"success": True, "inserted": len(mongo["inserted"]), "updated": len(mongo["updated"])}
+            except Exception as e:
+                print(f"❌ Erreur MongoDB: {e}")
+        # Neo4j n'est pas encore écrit : success reste False, pending indique la synchronisation en file
+        result["neo4j"]["pending"] = result["mongodb"]["success"]
+        result["success"] = result["mongodb"]["success"]
+        print(f"✅ {len(proteins_data)} protéines ajoutées, synchronisation Neo4j en file d'attente")
+        return result
+
+    # Mode direct : MongoDB et Neo4j (avec les relations SIMILAR) en parallèle
+    writes = outbox.dual_write(
+        lambda: add_proteins_to_mongo(proteins_data),
+        lambda: add_proteins_to_neo4j(proteins_data),
+        entries, concurrent=concurrent, key=key
+    )
+    mongo, mongo_error = writes["mongodb"]
+    if mongo_error is None:
+        result["mongodb"] = {"success": True, "inserted": len(mongo["inserted"]), "updated": len(mongo["updated"])}
+    written, neo4j_error = writes["neo4j"]
+    if neo4j_error is None:
+        # Relations nouvelles seulement (une relation existante mise à jour par MERGE n'est pas comptée)
+        result["neo4j"].update(success=True, similar_count=written["created"])
+    result["compensation"] = writes["compensation"]
+
+    result["success"] = result["mongodb"]["success"] and result["neo4j"]["success"]
+    print(f"✅ {len(proteins_data)} protéines ajoutées, {result['neo4j']['similar_count']} relations SIMILAR")
+    return result
+
+
+def add_protein(protein_data, mode=None, key=None, concurrent=None):
     """
     Ajoute une protéine à MongoDB et Neo4j avec toutes les relations SIMILAR.
+    (mode, key et concurrent : voir add_proteins)
     """
     if not protein_data.get("entry"):
         print("❌ L'ID de la protéine (entry) est requis")
         return {"success": False, "error": "Entry ID is required"}
     
+    mode = mode or WRITE_MODE
+    concurrent = CONCURRENT_WRITES if concurrent is None else concurrent
+    entry = protein_data.get("entry")
     result = {
-        "entry": protein_data.get("entry"),
+        "entry": entry,
+        "mode": mode,
         "mongodb": {"success": False},
-        "neo4j": {"success": False, "similar_count": 0, "relations": []}
+        "neo4j": {"success": False, "similar_count": 0, "relations": [], "queued": False, "pending": False},
+        "compensation": None
     }
     
-    # 1. Ajouter à MongoDB
-    mongo_id = add_protein_to_mongo(protein_data)
-    if mongo_id:
-        result["mongodb"]["success"] = True
-        result["mongodb"]["id"] = mongo_id
+    if mode == "outbox":
+        with outbox.held_for_active("upsert", [entry], key) as queued:
+            result["neo4j"]["queued"] = queued > 0
+            mongo_id = add_protein_to_mongo(protein_data)
+        result["mongodb"] = {"success": bool(mongo_id), "id": mongo_id}
+        result["neo4j"]["pending"] = bool(mongo_id)
+        result["success"] = bool(mongo_id)
+        return result
     
-    # 2. Ajouter à Neo4j avec les relations SIMILAR
-    similar_count, relations = add_protein_to_neo4j(protein_data)
-    if similar_count >= 0:
-        result["neo4j"]["success"] = True
-        result["neo4j"]["similar_count"] = similar_count
-        result["neo4j"]["relations"] = relations
+    # 1. MongoDB et 2. Neo4j (relations SIMILAR) en parallèle
+    writes = outbox.dual_write(
+        lambda: add_proteins_to_mongo([protein_data]),
+        lambda: add_proteins_to_neo4j([protein_data]),
+        [entry], concurrent=concurrent, key=key
+    )
+    if writes["mongodb"][1] is None:
+        print(f"✅ Protéine {entry} ajoutée/mise à jour dans MongoDB")
+        result["mongodb"] = {"success": True, "id": entry}
+    written, neo4j_error = writes["neo4j"]
+    if neo4j_error is None:
+        print(f"✅ {written['created']} relations SIMILAR créées pour {entry}")
+        result["neo4j"].update(success=True, similar_count=written["created"], relations=written["relations"])
+    result["compensation"] = writes["compensation"]
+    result["neo4j"]["queued"] = writes["compensation"] == "queued"
     
     result["success"] = result["mongodb"]["success"] and result["neo4j"]["success"]
     
@@ -290,7 +528,10 @@ if __name__ == "__main__":
     print("=" * 60)
     print(f"Entry: {result['entry']}")
     print(f"MongoDB: {'✅' if result['mongodb']['success'] else '❌'}")
-    print(f"Neo4j: {'✅' if result['neo4j']['success'] else '❌'}")
+    if result['neo4j'].get('pending'):
+        print("Neo4j: ⏳ synchronisation en file d'attente")
+    else:
+        print(f"Neo4j: {'✅' if result['neo4j']['success'] else '❌'}")
     print(f"Relations SIMILAR créées: {result['neo4j']['similar_count']}")
     
     if result['neo4j']['relations']:
@@ -0,0 +1,343 @@
+"""
+Module pour pré-calculer les clusters de protéines et les stocker dans MongoDB et Neo4j.
+- Composantes connexes : union-find sur la liste d'arêtes SIMILAR (edges.csv)
+- Communautés : propagation de labels pondérée, vectorisée sur la liste d'arêtes (représentation creuse)
+
+Chaque protéine reçoit :
+  - cluster_id / cluster_size       (composante connexe)
+  - community_id / community_size   (communauté pondérée)
+
+Le calcul est fait par lots (run_cluster_job) : les ajouts et suppressions
+ultérieurs ne mettent pas les clusters à jour. Ils sont comptés dans la
+collection "meta" (document "clusters:<collection>", voir mark_stale) pour
+signaler des clusters périmés jusqu'au prochain calcul.
+
+Usage :
+    python backend/app/clusters.py [run]
+    python backend/app/clusters.py status
+"""
+
+from pymongo import MongoClient, UpdateOne
+from neo4j import GraphDatabase
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+import argparse
+import os
+import dotenv
+
+from mongo_indexes import ensure_indexes
+from data_version import bump_data_version, META_COLLECTION
+import datasets
+
+dotenv.load_dotenv()
+
+# Configuration MongoDB
+MONGO_URI = os.getenv("MONGO_URI")
+DB_NAME = os.getenv("DB_NAME")
+COLLECTION_NAME = os.getenv("COLLECTION_NAME")
+
+# Configuration Neo4j
+NEO4J_URI = os.getenv("NEO4J_URI", "neo4j://127.0.0.1:7687")
+NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "NoSQLProject")
+NEO4J_DATABASE = os.getenv("NEO4J_DATABASE_NAME", "project")
+
+EDGES_CSV = os.path.join("backend", "data", "processed", "edges.csv")
+
+
+def _status_id(collection):
+    return f"clusters:{collection.name}"
+
+
+def mark_stale(collection, changed):
+    """Compte les protéines ajoutées, modifiées ou supprimées depuis le dernier calcul"""
+    if not changed:
+        return
+    collection.database[META_COLLECTION].update_one(
+        {"_id": _status_id(collection)},
+        {"$inc": {"changes": int(changed)}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+
+
+def cluster_status(collection):
+    """
+    État des clusters de la collection, ou None s'ils n'ont jamais été calculés.
+
+    Returns:
+        dict: {"computed_at", "changes": modifications depuis le calcul, "stale"}
+    """
+    doc = collection.database[META_COLLECTION].find_one({"_id": _status_id(collection)})
+    if not doc or "computed_at" not in doc:
+        return None
+    changes = max(doc.get("changes", 0), 0)
+    return {"computed_at": doc["computed_at"], "changes": changes, "stale": changes > 0}
+
+
+def _changes_since_last_job(collection):
+    doc = collection.database[META_COLLECTION].find_one({"_id": _status_id(collection)})
+    return doc.get("changes", 0) if doc else 0
+
+
+def _mark_computed(collection, baseline):
+    """
+    Fin de calcul : retire les modifications comptées au démarrage (baseline),
+    celles faites pendant le calcul restent signalées.
+    """
+    collection.database[META_COLLECTION].update_one(
+        {"_id": _status_id(collection)},
+        {"$inc": {"changes": -int(baseline)}, "$set": {"computed_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+
+
+def load_edge_list(edges_csv_path=EDGES_CSV, chunksize=500_000):
+    """
+    Charge edges.csv par morceaux et renvoie (entries, src, dst, weight) :
+    - entries : tableau des identifiants (index -> entry)
+    - src, dst : indices entiers des extrémités
+    - weight : poids Jaccard
+    """
+    sources, targets, weights = [], [], []
+    for chunk in pd.read_csv(edges_csv_path, chunksize=chunksize, dtype={"Source": str, "Target": str}):
+        sources.append(chunk["Source"].to_numpy())
+        targets.append(chunk["Target"].to_numpy())
+        weights.append(chunk["Weight"].to_numpy(dtype=np.float64))
+
+    if not sources:
+        return np.array([], dtype=object), np.array([], dtype=np.int64), np.array([], dtype=np.int64), np.array([])
+
+    src_names = np.concatenate(sources)
+    dst_names = np.concatenate(targets)
+    # Encodage des identifiants en entiers (un seul dictionnaire pour les deux colonnes)
+    codes, entries = pd.factorize(np.concatenate([src_names, dst_names]))
+    n_edges = len(src_names)
+    return np.asarray(entries, dtype=object), codes[:n_edges], codes[n_edges:], np.concatenate(weights)
+
+
+def connected_components(n_nodes, src, dst):
+    """
+    Union-find (compression de chemin + union par taille).
+    Renvoie un tableau label[i] = racine de la composante de i.
+    """
+    # Listes Python : l'accès élément par élément y est bien plus rapide qu'avec numpy
+    parent = list(range(n_nodes))
+    size = [1] * n_nodes
+
+    def find(x):
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        # Compression de chemin
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    for a, b in zip(src.tolist(), dst.tolist()):
+        ra, rb = find(a), find(b)
+        if ra == rb:
+            continue
+        if size[ra] < size[rb]:
+            ra, rb = rb, ra
+        parent[rb] = ra
+        size[ra] += size[rb]
+
+    return np.fromiter((find(i) for i in range(n_nodes)), dtype=np.int64, count=n_nodes)
+
+
+def weighted_communities(n_nodes, src, dst, weight, max_iter=20, seed=42):
+    """
+    Propagation de labels pondérée, synchrone et vectorisée.
+    À chaque itération, chaque nœud prend le label dont la somme des poids
+    de ses voisins est maximale. Le label courant du nœud reçoit un petit bonus
+    pour éviter les oscillations typiques de la version synchrone.
+    """
+    labels = np.arange(n_nodes, dtype=np.int64)
+    if len(src) == 0:
+        return labels
+
+    # Liste d'arêtes symétrique (graphe non orienté)
+    nodes = np.concatenate([src, dst])
+    neighbors = np.concatenate([dst, src])
+    w = np.concatenate([weight, weight])
+
+    rng = np.random.default_rng(seed)
+    # Bruit minime pour départager les égalités de façon déterministe
+    jitter = rng.random(n_nodes) * 1e-9
+
+    for _ in range(max_iter):
+        votes = pd.DataFrame({
+            "node": np.concatenate([nodes, np.arange(n_nodes)]),
+            "label": np.concatenate([labels[neighbors], labels]),
+            "w": np.concatenate([w, np.full(n_nodes, 1e-6)]),
+        })
+        scores = votes.groupby(["node", "label"], sort=False)["w"].sum().reset_index()
+        scores["w"] += jitter[scores["label"].to_numpy()]
+        best = scores.loc[scores.groupby("node")["w"].idxmax()]
+
+        new_labels = labels.copy()
+        new_labels[best["node"].to_numpy()] = best["label"].to_numpy()
+        changed = int((new_labels != labels).sum())
+        labels = new_labels
+        if changed == 0:
+            break
+
+    return labels
+
+
+def _relabel_by_size(labels):
+    """
+    Renumérote les labels de 0 à n-1 par taille décroissante.
+    Renvoie (ids, sizes) alignés sur les nœuds.
+    """
+    uniques, inverse, counts = np.unique(labels, return_inverse=True, return_counts=True)
+    order = np.argsort(-counts, kind="stable")
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return rank[inverse], counts[inverse]
+
+
+def compute_clusters(all_entries, edges_csv_path=EDGES_CSV):
+    """
+    Calcule composantes connexes et communautés pour toutes les protéines.
+    Les protéines sans arête forment leur propre cluster de taille 1.
+
+    Returns:
+        pd.DataFrame: colonnes entry, cluster_id, cluster_size, community_id, community_size
+    """
+    edge_entries, src, dst, weight = load_edge_list(edges_csv_path)
+
+    # On ajoute les protéines isolées à la fin de l'index
+    known = set(edge_entries.tolist())
+    isolated = [e for e in all_entries if e not in known]
+    entries = np.concatenate([edge_entries, np.asarray(isolated, dtype=object)])
+    n_nodes = len(entries)
+
+    component_labels = connected_components(n_nodes, src, dst)
+    community_labels = weighted_communities(n_nodes, src, dst, weight)
+
+    cluster_id, cluster_size = _relabel_by_size(component_labels)
+    community_id, community_size = _relabel_by_size(community_labels)
+
+    return pd.DataFrame({
+        "entry": entries,
+        "cluster_id": cluster_id,
+        "cluster_size": cluster_size,
+        "community_id": community_id,
+        "community_size": community_size,
+    })
+
+
+def write_clusters_to_mongo(collection, clusters_df, batch_size=5000):
+    """Écrit les identifiants de clusters sur les documents MongoDB par lots"""
+    ops = []
+    updated = 0
+    for row in clusters_df.itertuples(index=False):
+        ops.append(UpdateOne(
+            {"_id": row.entry},
+            {"$set": {
+                "cluster_id": int(row.cluster_id),
+                "cluster_size": int(row.cluster_size),
+                "community_id": int(row.community_id),
+                "community_size": int(row.community_size),
+            }}
+        ))
+        if len(ops) >= batch_size:
+            updated += collection.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        updated += collection.bulk_write(ops, ordered=False).modified_count
+
+    # Index cluster_id / community_id utilisés par le filtre cluster de advanced_search
+    ensure_indexes(collection)
+    bump_data_version(collection)
+    print(f"✅ {updated} documents MongoDB mis à jour avec leurs clusters")
+    return updated
+
+
+def write_clusters_to_neo4j(session, clusters_df, batch_size=5000):
+    """Écrit les identifiants de clusters sur les nœuds Protein par lots"""
+    session.run("CREATE INDEX protein_cluster IF NOT EXISTS FOR (p:Protein) ON (p.cluster_id)")
+    session.run("CREATE INDEX protein_community IF NOT EXISTS FOR (p:Protein) ON (p.community_id)")
+
+    records = [
+        {
+            "entry": row.entry,
+            "cluster_id": int(row.cluster_id),
+            "cluster_size": int(row.cluster_size),
+            "community_id": int(row.community_id),
+            "community_size": int(row.community_size),
+        }
+        for row in clusters_df.itertuples(index=False)
+    ]
+    for i in range(0, len(records), batch_size):
+        session.execute_write(lambda tx, b=records[i:i + batch_size]: tx.run(
+            """
+            UNWIND $batch AS row
+            MATCH (p:Protein {entry: row.entry})
+            SET p.cluster_id = row.cluster_id,
+                p.cluster_size = row.cluster_size,
+                p.community_id = row.community_id,
+                p.community_size = row.community_size
+            """,
+            batch=b
+        ))
+    print(f"✅ {len(records)} nœuds Neo4j mis à jour avec leurs clusters")
+
+
+def run_cluster_job(edges_csv_path=EDGES_CSV, collection=None, neo4j_database=None):
+    """
+    Job complet : lit les identifiants dans MongoDB, calcule les clusters
+    et les écrit dans les deux bases.
+
+    Par défaut, la version active du jeu de données (voir datasets.py) ;
+    collection / neo4j_database permettent de viser une version en préparation.
+    """
+    client = MongoClient(MONGO_URI)
+    if collection is None:
+        dataset = datasets.active_dataset(client[DB_NAME])
+        collection = client[DB_NAME][dataset["mongo"]]
+        neo4j_database = neo4j_database or dataset["neo4j"]
+    baseline = _changes_since_last_job(collection)
+    all_entries = [doc["_id"] for doc in collection.find({}, {"_id": 1})]
+
+    clusters_df = compute_clusters(all_entries, edges_csv_path)
+    print(f"🧩 {clusters_df['cluster_id'].nunique()} composantes connexes, "
+          f"{clusters_df['community_id'].nunique()} communautés")
+
+    write_clusters_to_mongo(collection, clusters_df)
+    client.close()
+    neo4j_database = neo4j_database or datasets.active_neo4j_database()
+
+    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    try:
+        with driver.session(database=neo4j_database) as session:
+            write_clusters_to_neo4j(session, clusters_df)
+    finally:
+        driver.close()
+
+    _mark_computed(collection, baseline)
+    return clusters_df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clusters de protéines (composantes connexes et communautés)")
+    parser.add_argument("command", nargs="?", choices=["run", "status"], default="run")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        run_cluster_job()
+    else:
+        client = MongoClient(MONGO_URI)
+        try:
+            status = cluster_status(datasets.active_collection(client[DB_NAME], COLLECTION_NAME))
+        finally:
+            client.close()
+        if status is None:
+            print("ℹ️ Clusters jamais calculés : lancez 'python backend/app/clusters.py'")
+        elif status["stale"]:
+            print(f"⚠️ Clusters calculés le {status['computed_at']:%Y-%m-%d %H:%M}, "
+                  f"{status['changes']} protéine(s) modifiée(s) depuis")
+        else:
+            print(f"✅ Clusters à jour (calculés le {status['computed_at']:%Y-%m-%d %H:%M})")
@@ -0,0 +1,50 @@
+"""
+Compteur de version des données, stocké dans la collection "meta".
+Chaque écriture (ajout, suppression, rechargement) incrémente la version de la
+collection concernée ; les caches (comptages, résultats) l'intègrent à leur clé
+et sont donc invalidés dès que les données changent.
+
+La version du graphe ("graph_version:<base Neo4j>") est incrémentée après chaque
+écriture dans Neo4j (directe ou par le worker outbox) : les caches de voisinages
+(voir neo4j_query.py) l'intègrent à leur clé.
+"""
+
+META_COLLECTION = "meta"
+
+
+def _version_id(collection):
+    return f"data_version:{collection.name}"
+
+
+def get_data_version(collection):
+    """Version courante des données de la collection (0 si jamais modifiée)"""
+    doc = collection.database[META_COLLECTION].find_one({"_id": _version_id(collection)})
+    return doc["value"] if doc else 0
+
+
+def bump_data_version(collection):
+    """Signale une modification des données de la collection"""
+    collection.database[META_COLLECTION].update_one(
+        {"_id": _version_id(collection)},
+        {"$inc": {"value": 1}},
+        upsert=True
+    )
+
+
+def _graph_version_id(neo4j_database):
+    return f"graph_version:{neo4j_database}"
+
+
+def get_graph_version(db, neo4j_database):
+    """Version courante du graphe d'une base Neo4j (0 si jamais modifiée)"""
+    doc = db[META_COLLECTION].find_one({"_id": _graph_version_id(neo4j_database)})
+    return doc["value"] if doc else 0
+
+
+def bump_graph_version(db, neo4j_database):
+    """Signale une modification du graphe d'une base Neo4j"""
+    db[META_COLLECTION].update_one(
+        {"_id": _graph_version_id(neo4j_database)},
+        {"$inc": {"value": 1}},
+        upsert=True
+    )
@@ -0,0 +1,498 @@
+"""
+Jeux de données versionnés (bascule bleu/vert).
+
+Le nom COLLECTION_NAME devient un alias : un pointeur stocké dans la
+collection "meta" désigne la collection MongoDB et la base Neo4j actives.
+
+{
+  "_id": "dataset:proteins",
+  "active":   {"version": 3, "mongo": "proteins__v3", "neo4j": "project-v3", "switched_at": ...},
+  "previous": {"version": 2, "mongo": "proteins__v2", "neo4j": "project-v2", "switched_at": ...}
+}
+
+Un rechargement se fait dans une version de pré-production (collection et
+base Neo4j neuves) pendant que l'application continue de lire la version
+active ; après chauffe des index et validation des comptages, le pointeur est
+basculé en une seule écriture. La version précédente est conservée pour un
+retour arrière immédiat.
+
+Les écritures faites sur la version active pendant le rechargement ne sont
+pas perdues : tant que le marqueur "loading:<alias>" existe, add_protein et
+delete_protein enregistrent les protéines touchées (track_write) dans la
+collection annexe "<pré-production>_replay". Leur état courant est recopié
+dans la nouvelle version juste avant la bascule, puis une seconde fois après
+ALIAS_TTL secondes (écritures en vol au moment de la bascule).
+
+Les collections annexes (_sequences, _suggestions, _kmers, _outbox) et la version des
+données (data_version.py) sont nommées d'après la collection physique : elles
+suivent donc automatiquement la version.
+
+Sans pointeur, l'alias désigne directement COLLECTION_NAME / NEO4J_DATABASE_NAME.
+
+Usage :
+    python backend/app/datasets.py load [chemin.tsv] [--nodes nodes.csv --edges edges.csv]
+    python backend/app/datasets.py status
+    python backend/app/datasets.py rollback
+    python backend/app/datasets.py cleanup
+"""
+
+from pymongo import MongoClient, ReplaceOne, UpdateOne
+from neo4j import GraphDatabase
+from datetime import datetime, timezone
+import argparse
+import os
+import threading
+import time
+import dotenv
+
+from data_version import META_COLLECTION, get_graph_version
+
+dotenv.load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI")
+DB_NAME = os.getenv("DB_NAME")
+COLLECTION_NAME = os.getenv("COLLECTION_NAME")
+
+NEO4J_URI = os.getenv("NEO4J_URI", "neo4j://127.0.0.1:7687")
+NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "NoSQLProject")
+NEO4J_DATABASE = os.getenv("NEO4J_DATABASE_NAME", "project")
+
+# Durée pendant laquelle un pointeur résolu est réutilisé sans relire "meta"
+ALIAS_TTL = 5.0
+# Validation : la nouvelle version doit contenir au moins cette part de l'ancienne
+MIN_COUNT_RATIO = 0.9
+
+NODES_CSV = os.path.join("backend", "data", "processed", "nodes.csv")
+EDGES_CSV = os.path.join("backend", "data", "processed", "edges.csv")
+
+SIDE_SUFFIXES = ("_sequences", "_suggestions", "_kmers", "_outbox", "_replay")
+# Protéines recopiées par appel de replay_writes
+REPLAY_BATCH_SIZE = 1000
+
+_resolved = {}
+_resolved_lock = threading.Lock()
+_client = None
+
+
+def _pointer_id(alias):
+    return f"dataset:{alias}"
+
+
+def _loading_id(alias):
+    return f"loading:{alias}"
+
+
+def _legacy(alias=COLLECTION_NAME):
+    """Version implicite quand aucun pointeur n'existe encore"""
+    return {"version": 0, "mongo": alias, "neo4j": NEO4J_DATABASE}
+
+
+def get_pointer(db, alias=COLLECTION_NAME):
+    """Document pointeur de l'alias (None si jamais basculé)"""
+    return db[META_COLLECTION].find_one({"_id": _pointer_id(alias)})
+
+
+def active_dataset(db, alias=COLLECTION_NAME):
+    """Version active : {"version", "mongo", "neo4j"}"""
+    pointer = get_pointer(db, alias)
+    return pointer["active"] if pointer else _legacy(alias)
+
+
+def active_collection(db, alias=COLLECTION_NAME):
+    """Collection MongoDB active derrière l'alias"""
+    return db[active_dataset(db, alias)["mongo"]]
+
+
+def resolve(db, alias=COLLECTION_NAME):
+    """
+    Version active avec mise en cache (ALIAS_TTL secondes) : utilisé par les
+    chemins de lecture, pour ne pas relire "meta" à chaque requête.
+    """
+    now = time.monotonic()
+    key = (db.name, alias)
+    with _resolved_lock:
+        cached = _resolved.get(key)
+        if cached and now - cached[0] < ALIAS_TTL:
+            return cached[1]
+    dataset = active_dataset(db, alias)
+    with _resolved_lock:
+        _resolved[key] = (now, dataset)
+    return dataset
+
+
+def invalidate(alias=None):
+    """Oublie les pointeurs résolus (tous, ou ceux d'un alias) de ce processus"""
+    with _resolved_lock:
+        for key in [k for k in _resolved if alias is None or k[1] == alias]:
+            del _resolved[key]
+
+
+def active_neo4j_database(alias=COLLECTION_NAME, fresh=False):
+    """
+    Base Neo4j active, pour neo4j_query (client MongoDB partagé).
+    Si MongoDB est injoignable, on retombe sur NEO4J_DATABASE_NAME.
+
+    Args:
+        fresh (bool): relit le pointeur sans cache. Les chemins d'écriture l'utilisent :
+            dans un autre processus, le cache peut survivre ALIAS_TTL secondes à une
+            bascule, et MongoDB (relu à chaque écriture) et Neo4j divergeraient.
+    """
+    global _client
+    try:
+        if _client is None:
+            _client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=2000)
+        if fresh:
+            return active_dataset(_client[DB_NAME], alias)["neo4j"]
+        return resolve(_client[DB_NAME], alias)["neo4j"]
+    except Exception as e:
+        print(f"❌ Résolution de l'alias Neo4j impossible : {e}")
+        return NEO4J_DATABASE
+
+
+def active_graph(alias=COLLECTION_NAME):
+    """
+    (base Neo4j active, version de son graphe), clé des caches de voisinages.
+    Si MongoDB est injoignable : (NEO4J_DATABASE_NAME, None).
+    """
+    global _client
+    try:
+        if _client is None:
+            _client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=2000)
+        database = resolve(_client[DB_NAME], alias)["neo4j"]
+        return database, get_graph_version(_client[DB_NAME], database)
+    except Exception as e:
+        print(f"❌ Version du graphe illisible : {e}")
+        return NEO4J_DATABASE, None
+
+
+def _staging(db, alias):
+    """Prochaine version : numéro et noms physiques"""
+    pointer = get_pointer(db, alias) or {}
+    versions = [v["version"] for v in (pointer.get("active"), pointer.get("previous")) if v]
+    version = max(versions + [pointer.get("last_version", 0)]) + 1
+    return {"version": version, "mongo": f"{alias}__v{version}", "neo4j": f"{NEO4J_DATABASE}-v{version}"}
+
+
+def drop_mongo_version(db, name):
+    """Supprime une collection physique et ses collections annexes"""
+    for suffix in ("",) + SIDE_SUFFIXES:
+        db[f"{name}{suffix}"].drop()
+
+
+def create_neo4j_database(driver, name):
+    """Crée une base Neo4j (nécessite une édition multi-bases)"""
+    with driver.session(database="system") as session:
+        session.run(f"CREATE DATABASE `{name}` IF NOT EXISTS WAIT").consume()
+
+
+def drop_neo4j_database(driver, name):
+    with driver.session(database="system") as session:
+        session.run(f"DROP DATABASE `{name}` IF EXISTS").consume()
+
+
+def warm_up(collection):
+    """
+    Parcourt chaque index (requête couverte) pour le charger dans le cache
+    WiredTiger avant la bascule : les premières requêtes ne paient pas les
+    lectures disque.
+    """
+    for index in collection.list_indexes():
+        if index.get("collation"):
+            continue
+        fields = [field for field in index["key"]]
+        projection = {field: 1 for field in fields}
+        if "_id" not in projection:
+            projection["_id"] = 0
+        for _ in collection.find({}, projection).hint(index["name"]).batch_size(10_000):
+            pass
+    print(f"🔥 Index de {collection.name} chargés en cache")
+
+
+def validate_mongo(db, staging, active, min_ratio=MIN_COUNT_RATIO):
+    """
+    Vérifie la version de pré-production avant bascule.
+
+    Raises:
+        ValueError: collection vide, séquences manquantes ou baisse anormale du nombre de protéines
+    """
+    collection = db[staging["mongo"]]
+    count = collection.count_documents({})
+    sequences = db[f"{staging['mongo']}_sequences"].count_documents({})
+    if count == 0:
+        raise ValueError(f"{staging['mongo']} est vide")
+    if sequences != count:
+        raise ValueError(f"{staging['mongo']} : {count} protéines mais {sequences} séquences")
+    if active["mongo"] in db.list_collection_names():
+        previous = db[active["mongo"]].estimated_document_count()
+        if count < min_ratio * previous:
+            raise ValueError(
+                f"{staging['mongo']} : {count} protéines contre {previous} dans la version active "
+                f"(moins de {min_ratio:.0%})"
+            )
+    print(f"✅ {staging['mongo']} validée : {count} protéines")
+    return count
+
+
+def validate_neo4j(driver, staging, expected_nodes):
+    """Le nombre de nœuds Protein doit correspondre au fichier importé"""
+    with driver.session(database=staging["neo4j"]) as session:
+        nodes = session.run("MATCH (p:Protein) RETURN count(p) AS n").single()["n"]
+    if nodes != expected_nodes:
+        raise ValueError(f"{staging['neo4j']} : {nodes} nœuds Protein, {expected_nodes} attendus")
+    print(f"✅ {staging['neo4j']} validée : {nodes} nœuds")
+    return nodes
+
+
+def switch(db, dataset, alias=COLLECTION_NAME):
+    """
+    Bascule l'alias sur `dataset` en une seule écriture ; l'ancienne version
+    active devient la version de retour arrière.
+
+    Returns:
+        dict: version remplacée (None si aucune)
+    """
+    pointer = get_pointer(db, alias)
+    previous = pointer["active"] if pointer else _legacy(alias)
+    dataset = dict(dataset, switched_at=datetime.now(timezone.utc))
+    db[META_COLLECTION].update_one(
+        {"_id": _pointer_id(alias)},
+        {"$set": {"active": dataset, "previous": previous},
+         "$max": {"last_version": dataset["version"]}},
+        upsert=True
+    )
+    # Les autres processus relisent le pointeur au plus ALIAS_TTL secondes plus tard
+    # (les écritures, elles, le relisent à chaque fois, voir active_neo4j_database)
+    invalidate(alias)
+    print(f"✅ Alias {alias} -> {dataset['mongo']} / {dataset['neo4j']} (précédente : {previous['mongo']})")
+    return previous
+
+
+def rollback(db, alias=COLLECTION_NAME):
+    """Revient à la version précédente (et garde l'actuelle comme précédente)"""
+    pointer = get_pointer(db, alias)
+    if not pointer or not pointer.get("previous"):
+        raise ValueError(f"Aucune version précédente pour {alias}")
+    previous = pointer["previous"]
+    if previous["mongo"] not in db.list_collection_names():
+        raise ValueError(f"La collection {previous['mongo']} n'existe plus")
+    return switch(db, {k: v for k, v in previous.items() if k != "switched_at"}, alias)
+
+
+def cleanup(db, driver=None, alias=COLLECTION_NAME):
+    """Supprime les versions qui ne sont ni active ni précédente"""
+    pointer = get_pointer(db, alias)
+    if not pointer:
+        print("ℹ️  Aucun pointeur : rien à nettoyer")
+        return []
+    kept = {v["mongo"] for v in (pointer["active"], pointer.get("previous")) if v}
+    kept_neo4j = {v["neo4j"] for v in (pointer["active"], pointer.get("previous")) if v}
+    removed = []
+    for name in db.list_collection_names():
+        # La collection d'origine (nommée comme l'alias) est une version comme une autre
+        versioned = name == alias or (name.startswith(f"{alias}__v") and not name.endswith(SIDE_SUFFIXES))
+        if versioned and name not in kept:
+            drop_mongo_version(db, name)
+            removed.append(name)
+    if driver is not None:
+        with driver.session(database="system") as session:
+            names = [r["name"] for r in session.run("SHOW DATABASES YIELD name RETURN name")]
+        for name in names:
+            if name.startswith(f"{NEO4J_DATABASE}-v") and name not in kept_neo4j:
+                drop_neo4j_database(driver, name)
+                removed.append(name)
+    print(f"🗑️ Versions supprimées : {removed or 'aucune'}")
+    return removed
+
+
+def track_write(collection, entries, alias=COLLECTION_NAME):
+    """
+    À appeler après une écriture MongoDB : pendant un rechargement, les protéines
+    écrites dans la version qui était active au début du chargement sont
+    enregistrées pour être recopiées dans la nouvelle (voir replay_writes). Les
+    autres collections (benchmarks, version en préparation) sont ignorées.
+    """
+    db = collection.database
+    loading = db[META_COLLECTION].find_one({"_id": _loading_id(alias)})
+    if not loading or collection.name != loading["source"] or not entries:
+        return
+    now = datetime.now(timezone.utc)
+    db[f"{loading['mongo']}_replay"].bulk_write(
+        [UpdateOne({"_id": entry}, {"$set": {"written_at": now}}, upsert=True) for entry in dict.fromkeys(entries)],
+        ordered=False
+    )
+
+
+def replay_writes(db, source, target, neo4j_database=None, batch_size=REPLAY_BATCH_SIZE):
+    """
+    Recopie dans la version `target` l'état actuel, dans `source`, des protéines
+    enregistrées par track_write : document, séquence, suggestions et k-mers, ou
+    suppression si la protéine n'existe plus. Neo4j est ensuite aligné si
+    neo4j_database est fourni (y compris quand la base Neo4j est partagée avec
+    l'ancienne version : les entrées encore dans son outbox ne seront plus traitées).
+
+    Returns:
+        int: nombre de protéines recopiées
+    """
+    import kmer_index
+    import outbox
+    import sequence_store
+    import suggestions
+    from data_version import bump_data_version
+
+    replay = db[f"{target['mongo']}_replay"]
+    src, dst = db[source["mongo"]], db[target["mongo"]]
+    total = 0
+    while True:
+        entries = [doc["_id"] for doc in replay.find({}, {"_id": 1}).limit(batch_size)]
+        if not entries:
+            break
+        docs = list(src.find({"_id": {"$in": entries}}))
+        present = [doc["_id"] for doc in docs]
+        present_set = set(present)
+        missing = [entry for entry in entries if entry not in present_set]
+        sequences = sequence_store.get_sequences(src, present)
+        previous_sequences = sequence_store.get_sequences(dst, entries)
+
+        if docs:
+            dst.bulk_write([ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in docs], ordered=False)
+            sequence_store.store_sequences(dst, [{"_id": e, "sequence": sequences.get(e, "")} for e in present])
+            suggestions.index_proteins(dst, docs)
+            kmer_index.remove_many_from_index(dst, [
+                (e, previous_sequences[e]) for e in present
+                if previous_sequences.get(e) and previous_sequences[e] != sequences.get(e, "")
+            ])
+            kmer_index.add_many_to_index(dst, [(e, sequences.get(e, "")) for e in present])
+        if missing:
+            dst.delete_many({"_id": {"$in": missing}})
+            suggestions.remove_proteins(dst, missing)
+            kmer_index.remove_many_from_index(dst, sequence_store.delete_sequences(dst, missing).items())
+        if neo4j_database:
+            outbox.apply_entries(dst, neo4j_database, entries)
+
+        replay.delete_many({"_id": {"$in": entries}})
+        total += len(entries)
+    if total:
+        bump_data_version(dst)
+        print(f"🔄 {total} protéine(s) écrite(s) pendant le rechargement recopiée(s) dans {target['mongo']}")
+    return total
+
+
+def load_version(db, tsv_path, nodes_csv=None, edges_csv=None, driver=None, alias=COLLECTION_NAME):
+    """
+    Charge une nouvelle version complète sans toucher à la version active,
+    la valide puis bascule l'alias. En cas d'erreur, la version de
+    pré-production est supprimée et l'alias n'est pas modifié.
+
+    Les écritures faites sur la version active pendant le chargement sont
+    recopiées avant la bascule et après ALIAS_TTL secondes (voir track_write).
+    """
+    from mongo_builder import load_tsv, _count_rows
+    from mongo_indexes import ensure_indexes
+    from suggestions import build_suggestion_index
+    from kmer_index import build_kmer_index
+    from stats_store import recompute as recompute_stats
+
+    active = active_dataset(db, alias)
+    staging = _staging(db, alias)
+    with_graph = driver is not None and nodes_csv and edges_csv
+    if not with_graph:
+        # Sans graphe, la version garde la base Neo4j active
+        staging["neo4j"] = active["neo4j"]
+    print(f"🔄 Chargement de la version {staging['version']} ({staging['mongo']} / {staging['neo4j']})")
+
+    drop_mongo_version(db, staging["mongo"])
+    # À partir d'ici, les écritures sur la version active sont enregistrées pour être recopiées
+    db[META_COLLECTION].replace_one(
+        {"_id": _loading_id(alias)},
+        {**staging, "source": active["mongo"], "started_at": datetime.now(timezone.utc)},
+        upsert=True
+    )
+    try:
+        collection = db[staging["mongo"]]
+        load_tsv(collection, tsv_path)
+        ensure_indexes(collection)
+        build_suggestion_index(collection)
+        build_kmer_index(collection)
+        warm_up(collection)
+        validate_mongo(db, staging, active)
+
+        if with_graph:
+            import neo4j_graph_builder
+            from clusters import run_cluster_job
+
+            create_neo4j_database(driver, staging["neo4j"])
+            with driver.session(database=staging["neo4j"]) as session:
+                session.execute_write(neo4j_graph_builder.create_indexes)
+                neo4j_graph_builder.import_nodes_optimized(session, nodes_csv)
+                neo4j_graph_builder.import_edges_optimized(session, edges_csv)
+                session.execute_write(neo4j_graph_builder.record_schema_version)
+            validate_neo4j(driver, staging, _count_rows(nodes_csv))
+            run_cluster_job(edges_csv, collection=collection, neo4j_database=staging["neo4j"])
+        replay_writes(db, active, staging, staging["neo4j"])
+        recompute_stats(collection, staging["neo4j"], driver)
+    except Exception:
+        print(f"❌ Échec du chargement : la version {staging['version']} est abandonnée, l'alias n'a pas changé")
+        db[META_COLLECTION].delete_one({"_id": _loading_id(alias)})
+        drop_mongo_version(db, staging["mongo"])
+        if with_graph:
+            drop_neo4j_database(driver, staging["neo4j"])
+        raise
+
+    switch(db, staging, alias)
+    # Écritures qui ont résolu l'ancienne version juste avant la bascule
+    time.sleep(ALIAS_TTL)
+    try:
+        if replay_writes(db, active, staging, staging["neo4j"]):
+            recompute_stats(collection, staging["neo4j"], driver)
+    finally:
+        db[META_COLLECTION].delete_one({"_id": _loading_id(alias)})
+    return staging
+
+
+def _print_status(db, alias):
+    loading = db[META_COLLECTION].find_one({"_id": _loading_id(alias)})
+    if loading:
+        print(f"🔄 Rechargement de la version {loading['version']} en cours depuis le {loading['started_at']}")
+    pointer = get_pointer(db, alias)
+    if not pointer:
+        print(f"ℹ️  Pas de pointeur : {alias} désigne directement {alias} / {NEO4J_DATABASE}")
+        return
+    for role in ("active", "previous"):
+        version = pointer.get(role)
+        if version:
+            count = db[version["mongo"]].estimated_document_count()
+            print(f"  {role:<9} v{version['version']} : {version['mongo']} ({count} protéines) / "
+                  f"{version['neo4j']} — basculée le {version.get('switched_at', '-')}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Jeux de données versionnés (bascule bleu/vert)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    load_parser = sub.add_parser("load", help="Charge une nouvelle version puis bascule l'alias")
+    load_parser.add_argument("tsv_path", nargs="?", default=os.path.join("backend", "data", "raw", "uniprot.tsv"))
+    load_parser.add_argument("--nodes", default=NODES_CSV, help="nodes.csv du graphe")
+    load_parser.add_argument("--edges", default=EDGES_CSV, help="edges.csv du graphe")
+    load_parser.add_argument("--mongo-only", action="store_true", help="Ne recharge pas Neo4j")
+    sub.add_parser("status", help="Versions active et précédente")
+    sub.add_parser("rollback", help="Revient à la version précédente")
+    sub.add_parser("cleanup", help="Supprime les versions plus anciennes que la précédente")
+    args = parser.parse_args()
+
+    client = MongoClient(MONGO_URI)
+    db = client[DB_NAME]
+    driver = None
+    if args.command == "cleanup" or (args.command == "load" and not args.mongo_only):
+        driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    try:
+        if args.command == "load":
+            load_version(db, args.tsv_path, args.nodes, args.edges, driver)
+        elif args.command == "rollback":
+            rollback(db)
+        elif args.command == "cleanup":
+            cleanup(db, driver)
+        _print_status(db, COLLECTION_NAME)
+    finally:
+        if driver is not None:
+            driver.close()
+        client.close()
@@ -1,5 +1,5 @@
 """
-Module pour supprimer une protéine de MongoDB et Neo4j.
+Module pour supprimer des protéines (une ou par lots avec delete_proteins) de MongoDB et Neo4j.
 - MongoDB: supprime le document de la protéine
 - Neo4j: supprime le nœud protéine ET toutes ses relations SIMILAR
 """
@@ -7,8 +7,18 @@ Module pour supprimer une protéine de MongoDB et Neo4j.
 from pymongo import MongoClient
 from neo4j import GraphDatabase
 import os
+import threading
 import dotenv
 
+import suggestions
+import kmer_index
+import sequence_store
+from data_version import bump_data_version, bump_graph_version
+import datasets
+import stats_store
+import clusters
+import outbox
+
 dotenv.load_dotenv()
 
 # Configuration MongoDB
@@ -22,127 +32,336 @@ NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "NoSQLProject")
 NEO4J_DATABASE = os.getenv("NEO4J_DATABASE_NAME", "project")
 
+# Nœuds par lot de suppression, et relations supprimées par transaction (nœuds très connectés)
+NODE_BATCH_SIZE = 1000
+RELATION_CHUNK_SIZE = 10_000
+
+# "direct" : Neo4j écrit pendant l'appel ; "outbox" : par le worker en arrière-plan (voir outbox.py)
+WRITE_MODE = os.getenv("DUAL_WRITE_MODE", "direct")
+# Mode direct : suppressions MongoDB et Neo4j lancées simultanément
+CONCURRENT_WRITES = os.getenv("CONCURRENT_WRITES", "1") != "0"
+
+# Client MongoDB et driver Neo4j partagés par toutes les suppressions du processus
+# (tous deux gèrent leur propre pool de connexions et sont utilisables entre threads)
+_client = None
+_driver = None
+_connections_lock = threading.Lock()
+
+
+def _shared_client():
+    global _client
+    with _connections_lock:
+        if _client is None:
+            _client = MongoClient(MONGO_URI)
+        return _client
+
+
+def _shared_driver():
+    global _driver
+    with _connections_lock:
+        if _driver is None:
+            _driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+        return _driver
+
+
+def delete_proteins_from_mongo(entries, collection=None):
+    """
+    Supprime un lot de protéines de MongoDB en un seul delete_many, puis leurs
+    séquences, suggestions et k-mers. Une lecture projetée sur _id (documents
+    labellisés du lot) fournit le compteur des statistiques. Les séquences sont
+    lues avant leur suppression : leurs k-mers indiquent les listes de l'index
+    à mettre à jour.
+
+    Returns:
+        dict: {"deleted": nombre supprimé (compté par delete_many), "entries": identifiants supprimés}
+    """
+    if collection is None:
+        # Collection active derrière l'alias (voir datasets.py)
+        collection = datasets.active_collection(_shared_client()[DB_NAME], COLLECTION_NAME)
+    entries = list(dict.fromkeys(entries))
+    selector = {"_id": {"$in": entries}}
+    labelled = len(stats_store.labelled_entries(collection, entries))
+    deleted = collection.delete_many(selector).deleted_count
+    if not deleted:
+        return {"deleted": 0, "entries": []}
+
+    # Les séquences supprimées servent à retirer les protéines de l'index de k-mers
+    sequences = sequence_store.delete_sequences(collection, entries)
+    # Identifiants supprimés : tous dans le cas courant, sinon ceux qui avaient une séquence
+    found = entries if deleted == len(entries) else [e for e in entries if e in sequences]
+    suggestions.remove_proteins(collection, found)
+    kmer_index.remove_many_from_index(collection, sequences.items())
+    bump_data_version(collection)
+    # Rechargement en cours : suppressions à reporter dans la nouvelle version
+    datasets.track_write(collection, found)
+    stats_store.increment(collection, total_proteins=-deleted, labelled_proteins=-labelled)
+    clusters.mark_stale(collection, deleted)
+    return {"deleted": deleted, "entries": found}
+
 
 def delete_protein_from_mongo(entry_id):
     """
     Supprime une protéine de la base de données MongoDB.
     """
     try:
-        client = MongoClient(MONGO_URI)
-        db = client[DB_NAME]
-        collection = db[COLLECTION_NAME]
-        
-        result = collection.delete_one({"_id": entry_id})
-        
-        if result.deleted_count > 0:
+        if delete_proteins_from_mongo([entry_id])["deleted"] > 0:
             print(f"✅ Protéine {entry_id} supprimée de MongoDB")
-            client.close()
             return True
-        else:
-            print(f"ℹ️ Protéine {entry_id} non trouvée dans MongoDB")
-            client.close()
-            return False
+        print(f"ℹ️ Protéine {entry_id} non trouvée dans MongoDB")
+        return False
             
     except Exception as e:
         print(f"❌ Erreur MongoDB: {e}")
         return False
 
 
+def delete_proteins_from_neo4j(entries, database=None, batch_size=NODE_BATCH_SIZE,
+                               relation_chunk=RELATION_CHUNK_SIZE, collection=None):
+    """
+    Supprime un lot de protéines de Neo4j avec leurs relations SIMILAR.
+
+    Les relations sont supprimées par morceaux de relation_chunk (une
+    transaction par morceau) : un nœud très connecté ne produit pas une
+    transaction géante. Les compteurs viennent du résumé des suppressions
+    elles-mêmes, sans requête de comptage préalable.
+
+    Les compteurs de stats_store de la collection (par défaut la version active)
+    sont mis à jour sans lecture supplémentaire : chaque morceau renvoie les
+    voisins et les protéines du lot qu'il a touchés, et la suppression des nœuds
+    renvoie le nombre de voisins devenus isolés. Un lot standard coûte donc deux
+    transactions.
+
+    Returns:
+        dict: {"nodes_deleted", "relations_deleted"}
+    """
+    entries = list(dict.fromkeys(entries))
+    result = {"nodes_deleted": 0, "relations_deleted": 0}
+
+    def delete_relations(tx, batch):
+        # Une relation entre deux protéines du lot apparaît deux fois (une par extrémité)
+        record = tx.run(
+            """
+            MATCH (p:Protein)-[r:SIMILAR]-(n:Protein)
+            WHERE p.entry IN $entries
+            WITH r, p, n LIMIT $limit
+            DELETE r
+            RETURN count(*) AS pairs,
+                   collect(DISTINCT p.entry) AS touched,
+                   [x IN collect(DISTINCT n.entry) WHERE NOT x IN $entries] AS neighbours
+            """,
+            entries=batch, limit=relation_chunk
+        )
+        row = record.single()
+        deleted = record.consume().counters.relationships_deleted
+        return row["pairs"], deleted, row["touched"], row["neighbours"]
+
+    def delete_nodes(tx, batch, neighbours):
+        record = tx.run(
+            """
+            OPTIONAL MATCH (p:Protein)
+            WHERE p.entry IN $entries
+            DETACH DELETE p
+            WITH count(*) AS ignored
+            OPTIONAL MATCH (n:Protein)
+            WHERE n.entry IN $neighbours AND NOT (n)-[:SIMILAR]-()
+            RETURN count(n) AS isolated
+            """,
+            entries=batch, neighbours=neighbours
+        )
+        isolated = record.single()["isolated"]
+        counters = record.consume().counters
+        return counters.nodes_deleted, counters.relationships_deleted, isolated
+
+    if collection is None:
+        collection = datasets.active_collection(_shared_client()[DB_NAME], COLLECTION_NAME)
+    database = database or datasets.active_neo4j_database(COLLECTION_NAME, fresh=True)
+    isolated_delta = 0
+    with _shared_driver().session(database=database) as session:
+        for i in range(0, len(entries), batch_size):
+            batch = entries[i:i + batch_size]
+            # 1. Relations SIMILAR par morceaux (le dernier morceau est incomplet)
+            touched, neighbours = set(), set()
+            pairs = relation_chunk
+            while pairs >= relation_chunk:
+                pairs, deleted, chunk_touched, chunk_neighbours = session.execute_write(delete_relations, batch)
+                result["relations_deleted"] += deleted
+                touched.update(chunk_touched)
+                neighbours.update(chunk_neighbours)
+            # 2. Nœuds (et relations d'autres types éventuelles), voisins devenus isolés
+            nodes, relations, isolated_neighbours = session.execute_write(delete_nodes, batch, list(neighbours))
+            result["nodes_deleted"] += nodes
+            result["relations_deleted"] += relations
+            # Nœuds supprimés qui étaient isolés : ceux qui n'avaient aucune relation SIMILAR
+            isolated_delta += isolated_neighbours - (nodes - len(touched))
+    stats_store.increment(collection, isolated_proteins=isolated_delta,
+                          similar_edges=-result["relations_deleted"])
+    # Invalide les voisinages en cache (voir neo4j_query.py)
+    bump_graph_version(collection.database, database)
+    return result
+
+
 def delete_protein_from_neo4j(entry_id):
     """
     Supprime une protéine de Neo4j ainsi que toutes ses relations SIMILAR.
     """
-    driver = None
     result = {
         "node_deleted": False,
         "relations_deleted": 0
     }
     
     try:
-        driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
-        
-        with driver.session(database=NEO4J_DATABASE) as session:
-            
-            # 1. Compter les relations SIMILAR avant suppression
-            def count_relations(tx):
-                res = tx.run(
-                    """
-                    MATCH (p:Protein {entry: $entry})-[r:SIMILAR]-()
-                    RETURN count(r) as count
-                    """,
-                    entry=entry_id
-                )
-                record = res.single()
-                return record["count"] if record else 0
-            
-            relations_count = session.execute_read(count_relations)
-            
-            # 2. Supprimer le nœud et toutes ses relations (DETACH DELETE)
-            def delete_node_and_relations(tx):
-                res = tx.run(
-                    """
-                    MATCH (p:Protein {entry: $entry})
-                    DETACH DELETE p
-                    RETURN count(p) as deleted
-                    """,
-                    entry=entry_id
-                )
-                record = res.single()
-                return record["deleted"] if record else 0
-            
-            deleted = session.execute_write(delete_node_and_relations)
-            
-            if deleted > 0:
-                result["node_deleted"] = True
-                result["relations_deleted"] = relations_count
-                print(f"✅ Protéine {entry_id} supprimée de Neo4j")
-                print(f"   └── {relations_count} relation(s) SIMILAR supprimée(s)")
-            else:
-                print(f"ℹ️ Protéine {entry_id} non trouvée dans Neo4j")
+        counts = delete_proteins_from_neo4j([entry_id])
+        if counts["nodes_deleted"] > 0:
+            result["node_deleted"] = True
+            result["relations_deleted"] = counts["relations_deleted"]
+            print(f"✅ Protéine {entry_id} supprimée de Neo4j")
+            print(f"   └── {counts['relations_deleted']} relation(s) SIMILAR supprimée(s)")
+        else:
+            print(f"ℹ️ Protéine {entry_id} non trouvée dans Neo4j")
                 
     except Exception as e:
         print(f"❌ Erreur Neo4j: {e}")
-    finally:
-        if driver:
-            driver.close()
     
     return result
 
 
-def delete_protein(entry_id):
+def delete_proteins(entries, mode=None, key=None, concurrent=None):
+    """
+    Supprime un lot de protéines de MongoDB et Neo4j (avec toutes leurs relations).
+
+    Args:
+        mode (str): "direct" ou "outbox" (Neo4j mis à jour par le worker, voir outbox.py).
+            Par défaut DUAL_WRITE_MODE.
+        key (str): clé d'idempotence (mode outbox)
+        concurrent (bool): mode direct, suppressions MongoDB et Neo4j simultanées
+            (par défaut CONCURRENT_WRITES). Si l'une échoue, Neo4j est réaligné sur
+            MongoDB (outbox.reconcile).
+
+    Returns:
+        dict: {"requested", "mongodb": {"deleted"},
+               "neo4j": {"nodes_deleted", "relations_deleted", "queued", "pending", "success"},
+               "not_found": identifiants absents de MongoDB, "compensation", "success"}
+    """
+    mode = mode or WRITE_MODE
+    concurrent = CONCURRENT_WRITES if concurrent is None else concurrent
+    entries = [e for e in dict.fromkeys(entries) if e]
+    result = {
+        "requested": len(entries),
+        "mode": mode,
+        "mongodb": {"deleted": 0, "success": False},
+        "neo4j": {"nodes_deleted": 0, "relations_deleted": 0, "queued": 0, "pending": False, "success": False},
+        "not_found": [],
+        "compensation": None,
+        "success": False
+    }
+    if not entries:
+        return result
+
+    if mode == "outbox":
+        # Supprimer de MongoDB, Neo4j est mis à jour par le worker une fois la suppression faite
+        with outbox.held_for_active("delete", entries, key) as queued:
+            result["neo4j"]["queued"] = queued
+            try:
+                mongo = delete_proteins_from_mongo(entries)
+                result["mongodb"].update(deleted=mongo["deleted"], success=True)
+            except Exception as e:
+                print(f"❌ Erreur MongoDB: {e}")
+        # Neo4j n'est pas encore écrit : success reste False, pending indique la synchronisation en file
+        result["neo4j"]["pending"] = result["mongodb"]["success"]
+    else:
+        # Mode direct : MongoDB et Neo4j (nœuds + relations) en parallèle
+        writes = outbox.dual_write(
+            lambda: delete_proteins_from_mongo(entries),
+            lambda: delete_proteins_from_neo4j(entries),
+            entries, concurrent=concurrent, key=key
+        )
+        mongo, mongo_error = writes["mongodb"]
+        if mongo_error is None:
+            result["mongodb"].update(deleted=mongo["deleted"], success=True)
+        counts, neo4j_error = writes["neo4j"]
+        if neo4j_error is None:
+            result["neo4j"].update(counts, success=True)
+        result["compensation"] = writes["compensation"]
+
+    if result["mongodb"]["success"]:
+        deleted = set(mongo["entries"])
+        result["not_found"] = [e for e in entries if e not in deleted]
+
+    # Succès seulement si les deux bases sont à jour (ou la synchronisation en file en mode outbox)
+    result["success"] = result["mongodb"]["success"] and (result["neo4j"]["success"] or result["neo4j"]["pending"])
+    print(
+        f"✅ {result['mongodb']['deleted']} protéine(s) supprimée(s) de MongoDB, "
+        f"{result['neo4j']['nodes_deleted']} nœud(s) et {result['neo4j']['relations_deleted']} "
+        f"relation(s) supprimé(s) de Neo4j"
+    )
+    return result
+
+
+def delete_protein(entry_id, mode=None, key=None, concurrent=None):
     """
     Supprime une protéine de MongoDB et Neo4j (avec toutes ses relations).
+    (mode, key et concurrent : voir delete_proteins)
     """
     if not entry_id:
         print("❌ L'ID de la protéine (entry) est requis")
         return {"success": False, "error": "Entry ID is required"}
     
+    mode = mode or WRITE_MODE
+    concurrent = CONCURRENT_WRITES if concurrent is None else concurrent
     result = {
         "entry": entry_id,
+        "mode": mode,
         "mongodb": {"deleted": False},
-        "neo4j": {"deleted": False, "relations_deleted": 0}
+        "neo4j": {"deleted": False, "relations_deleted": 0, "queued": False, "pending": False},
+        "compensation": None
     }
     
     print(f"\n🗑️ Suppression de la protéine {entry_id}...")
     print("-" * 40)
     
-    # 1. Supprimer de MongoDB
-    mongo_deleted = delete_protein_from_mongo(entry_id)
-    result["mongodb"]["deleted"] = mongo_deleted
-    
-    # 2. Supprimer de Neo4j (nœud + relations)
-    neo4j_result = delete_protein_from_neo4j(entry_id)
-    result["neo4j"]["deleted"] = neo4j_result["node_deleted"]
-    result["neo4j"]["relations_deleted"] = neo4j_result["relations_deleted"]
+    if mode == "outbox":
+        mongo_ok = True
+        with outbox.held_for_active("delete", [entry_id], key) as queued:
+            result["neo4j"]["queued"] = queued > 0
+            try:
+                result["mongodb"]["deleted"] = delete_proteins_from_mongo([entry_id])["deleted"] > 0
+            except Exception as e:
+                print(f"❌ Erreur MongoDB: {e}")
+                mongo_ok = False
+        # Nœud supprimé plus tard par le worker : pas d'erreur Neo4j possible ici
+        result["neo4j"]["pending"] = mongo_ok
+        neo4j_ok = True
+    else:
+        # 1. MongoDB et 2. Neo4j (nœud + relations) en parallèle
+        writes = outbox.dual_write(
+            lambda: delete_proteins_from_mongo([entry_id]),
+            lambda: delete_proteins_from_neo4j([entry_id]),
+            [entry_id], concurrent=concurrent, key=key
+        )
+        mongo, mongo_error = writes["mongodb"]
+        mongo_ok = mongo_error is None
+        if mongo_ok:
+            result["mongodb"]["deleted"] = mongo["deleted"] > 0
+        counts, neo4j_error = writes["neo4j"]
+        neo4j_ok = neo4j_error is None
+        if neo4j_ok:
+            result["neo4j"]["deleted"] = counts["nodes_deleted"] > 0
+            result["neo4j"]["relations_deleted"] = counts["relations_deleted"]
+        result["compensation"] = writes["compensation"]
+        result["neo4j"]["queued"] = writes["compensation"] == "queued"
     
-    # Succès si supprimé d'au moins une base
-    result["success"] = result["mongodb"]["deleted"] or result["neo4j"]["deleted"]
+    # Succès si la protéine existait et que les deux bases sont à jour
+    # (auparavant : succès dès qu'une seule base était modifiée)
+    found = result["mongodb"]["deleted"] or result["neo4j"]["deleted"]
+    result["success"] = mongo_ok and neo4j_ok and found
     
     print("-" * 40)
     if result["success"]:
         print(f"✅ Suppression terminée pour {entry_id}")
-    else:
+    elif not found and mongo_ok and neo4j_ok:
         print(f"⚠️ Protéine {entry_id} non trouvée dans les bases de données")
+    else:
+        print(f"⚠️ Suppression incomplète pour {entry_id}")
     
     return result
 
@@ -163,6 +382,9 @@ if __name__ == "__main__":
     print("=" * 60)
     print(f"Entry: {result['entry']}")
     print(f"MongoDB: {'✅ Supprimée' if result['mongodb']['deleted'] else '❌ Non trouvée'}")
-    print(f"Neo4j: {'✅ Supprimée' if result['neo4j']['deleted'] else '❌ Non trouvée'}")
+    if result['neo4j']['pending']:
+        print("Neo4j: ⏳ suppression en file d'attente")
+    else:
+        print(f"Neo4j: {'✅ Supprimée' if result['neo4j']['deleted'] else '❌ Non trouvée'}")
     if result['neo4j']['deleted']:
         print(f"Relations SIMILAR supprimées: {result['neo4j']['relations_deleted']}")
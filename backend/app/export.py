@@ -0,0 +1,136 @@
+"""
+Export en flux des résultats d'une recherche (CSV, FASTA, JSONL).
+Le curseur MongoDB est parcouru par lots : la mémoire utilisée ne dépend que
+de la taille d'un lot, pas du nombre de résultats.
+"""
+
+import csv
+import io
+import json
+
+import sequence_store
+
+EXPORT_FORMATS = {
+    "csv": {"extension": "csv", "mime": "text/csv"},
+    "fasta": {"extension": "fasta", "mime": "text/plain"},
+    "jsonl": {"extension": "jsonl", "mime": "application/x-ndjson"},
+}
+
+CSV_COLUMNS = [
+    "entry", "entry_name", "protein_names", "organism", "sequence_length",
+    "ec_numbers", "interpro", "cluster_id", "community_id"
+]
+
+# Nombre de documents ramenés par aller-retour au serveur
+DEFAULT_BATCH_SIZE = 2000
+FASTA_LINE_WIDTH = 60
+
+
+def _iter_batches(protein_db, filters, batch_size):
+    """Parcourt les résultats d'une recherche par lots de batch_size documents"""
+    query = protein_db._build_query(filters)
+    collation = protein_db._collation_for(filters)
+    cursor = (
+        protein_db.collection.find(query, {"sequence": 0}, collation=collation)
+        .sort("_id", 1)
+        .batch_size(batch_size)
+    )
+    batch = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _csv_chunks(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    yield buffer.getvalue()
+
+    for batch in batches:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for doc in batch:
+            annotations = doc.get("annotations", {})
+            writer.writerow([
+                doc["_id"],
+                doc.get("entry_name", ""),
+                ";".join(doc.get("protein_names", [])),
+                doc.get("organism", ""),
+                doc.get("sequence_length", ""),
+                ";".join(annotations.get("ec_numbers", [])),
+                ";".join(annotations.get("interpro", [])),
+                doc.get("cluster_id", ""),
+                doc.get("community_id", ""),
+            ])
+        yield buffer.getvalue()
+
+
+def _jsonl_chunks(batches):
+    for batch in batches:
+        yield "".join(json.dumps(doc, default=str, ensure_ascii=False) + "\n" for doc in batch)
+
+
+def _fasta_chunks(protein_db, batches):
+    for batch in batches:
+        # Les séquences sont lues lot par lot dans la collection annexe
+        sequences = sequence_store.get_sequences(protein_db.collection, [doc["_id"] for doc in batch])
+        lines = []
+        for doc in batch:
+            sequence = sequences.get(doc["_id"], "")
+            names = doc.get("protein_names", [])
+            description = names[0] if names else ""
+            lines.append(f">{doc['_id']}|{doc.get('entry_name', '')} {description} OS={doc.get('organism', '')}")
+            lines.extend(sequence[i:i + FASTA_LINE_WIDTH] for i in range(0, len(sequence), FASTA_LINE_WIDTH))
+        yield "\n".join(lines) + "\n"
+
+
+def iter_export(protein_db, filters, fmt="csv", batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Générateur de morceaux de texte pour l'export d'une recherche.
+
+    Args:
+        protein_db (ProteinDatabase): instance connectée
+        filters (dict): mêmes filtres que advanced_search
+        fmt (str): "csv", "fasta" ou "jsonl"
+        batch_size (int): documents par lot
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Format d'export inconnu : {fmt} (attendu : {', '.join(EXPORT_FORMATS)})")
+
+    batches = _iter_batches(protein_db, filters, batch_size)
+    if fmt == "csv":
+        return _csv_chunks(batches)
+    if fmt == "jsonl":
+        return _jsonl_chunks(batches)
+    return _fasta_chunks(protein_db, batches)
+
+
+def write_export(protein_db, filters, fileobj, fmt="csv", batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Écrit l'export dans un fichier binaire ouvert, morceau par morceau.
+
+    Returns:
+        int: nombre d'octets écrits
+    """
+    written = 0
+    for chunk in iter_export(protein_db, filters, fmt, batch_size):
+        data = chunk.encode("utf-8")
+        fileobj.write(data)
+        written += len(data)
+    return written
+
+
+if __name__ == "__main__":
+    import sys
+    from mongo_queries import ProteinDatabase
+
+    # Exemple : python backend/app/export.py fasta cytochrome > cytochrome.fasta
+    fmt = sys.argv[1] if len(sys.argv) > 1 else "csv"
+    keyword = sys.argv[2] if len(sys.argv) > 2 else None
+    filters = {"keyword": keyword} if keyword else {}
+    write_export(ProteinDatabase(), filters, sys.stdout.buffer, fmt)
@@ -0,0 +1,217 @@
+"""
+Compilateur d'expressions booléennes sur les annotations EC / InterPro.
+
+Grammaire (AND prioritaire sur OR, la virgule vaut AND) :
+    expr    := and_expr ( OR and_expr )*
+    and_expr:= not_expr ( (AND | ",") not_expr )*
+    not_expr:= NOT not_expr | "(" expr ")" | terme
+    terme   := [ec: | ipr: | interpro:] valeur
+
+Exemples :
+    (1.14.14.1 AND 4.2.1.152) OR 1.14.14.19
+    IPR000001 AND NOT (ec:3.1.1.1 OR ec:3.1.1.2)
+
+Le champ d'un terme sans préfixe est déduit de sa forme (IPR000001 -> InterPro,
+1.2.3.4 -> EC), sinon c'est le champ par défaut du filtre. On peut donc mélanger
+EC et InterPro dans une même expression.
+
+L'arbre est représenté par des tuples (immuables, donc utilisables comme clé de cache) :
+    ("term", champ, valeur) | ("and", (enfants...)) | ("or", (enfants...)) | ("not", enfant)
+"""
+
+from functools import lru_cache
+import re
+
+FIELDS = {
+    "ec": "annotations.ec_numbers",
+    "ipr": "annotations.interpro",
+    "interpro": "annotations.interpro",
+}
+
+_TOKEN = re.compile(r"\(|\)|,|[^\s(),]+")
+_IPR = re.compile(r"^IPR\d+$", re.IGNORECASE)
+_EC = re.compile(r"^\d+(\.(\d+|-|n\d+)){0,3}$")
+_KEYWORDS = {"AND", "OR", "NOT"}
+
+
+def _tokenize(expression):
+    return _TOKEN.findall(expression)
+
+
+def _term(token, default_field):
+    """Construit une feuille ("term", champ, valeur) à partir d'un jeton"""
+    prefix, sep, value = token.partition(":")
+    if sep and prefix.lower() in FIELDS:
+        field = FIELDS[prefix.lower()]
+    else:
+        value = token
+        if _IPR.match(value):
+            field = FIELDS["interpro"]
+        elif _EC.match(value):
+            field = FIELDS["ec"]
+        elif default_field:
+            field = default_field
+        else:
+            raise ValueError(f"Impossible de déterminer le champ du terme '{token}' (préfixez par ec: ou ipr:)")
+    if field == FIELDS["interpro"]:
+        value = value.upper()
+    return ("term", field, value)
+
+
+class _Parser:
+    """Analyseur descendant récursif"""
+
+    def __init__(self, tokens, default_field):
+        self.tokens = tokens
+        self.pos = 0
+        self.default_field = default_field
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def keyword(self, token):
+        return token is not None and token.upper() in _KEYWORDS and token.upper()
+
+    def take(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise ValueError("Expression vide")
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise ValueError(f"Jeton inattendu '{self.peek()}' en position {self.pos + 1}")
+        return node
+
+    def parse_or(self):
+        children = [self.parse_and()]
+        while self.keyword(self.peek()) == "OR":
+            self.take()
+            children.append(self.parse_and())
+        return children[0] if len(children) == 1 else ("or", tuple(children))
+
+    def parse_and(self):
+        children = [self.parse_not()]
+        while self.peek() == "," or self.keyword(self.peek()) == "AND":
+            self.take()
+            children.append(self.parse_not())
+        return children[0] if len(children) == 1 else ("and", tuple(children))
+
+    def parse_not(self):
+        token = self.peek()
+        if token is None:
+            raise ValueError("Expression incomplète")
+        if self.keyword(token) == "NOT":
+            self.take()
+            return ("not", self.parse_not())
+        if token == "(":
+            self.take()
+            node = self.parse_or()
+            if self.take() != ")":
+                raise ValueError("Parenthèse fermante manquante")
+            return node
+        if token in (")", ",") or self.keyword(token):
+            raise ValueError(f"Terme attendu, trouvé '{token}'")
+        return _term(self.take(), self.default_field)
+
+
+def _normalize(node):
+    """
+    Forme canonique : opérateurs imbriqués aplatis ((A AND B) AND C -> AND(A, B, C)),
+    doublons retirés, enfants triés. Deux expressions équivalentes à l'écriture près
+    donnent le même arbre, et donc la même entrée de cache.
+    """
+    kind = node[0]
+    if kind == "term":
+        return node
+    if kind == "not":
+        child = _normalize(node[1])
+        return child[1] if child[0] == "not" else ("not", child)
+    children = []
+    for child in (_normalize(c) for c in node[1]):
+        if child[0] == kind:
+            children.extend(child[1])
+        else:
+            children.append(child)
+    children = tuple(sorted(set(children), key=repr))
+    return children[0] if len(children) == 1 else (kind, children)
+
+
+@lru_cache(maxsize=1024)
+def parse_expression(expression, default_field=None):
+    """Analyse et normalise une expression (résultat mis en cache)"""
+    return _normalize(_Parser(_tokenize(expression), default_field).parse())
+
+
+def to_string(node):
+    """Réécrit un arbre sous forme d'expression (clé de cache lisible)"""
+    kind = node[0]
+    if kind == "term":
+        prefix = "ipr" if node[1] == FIELDS["interpro"] else "ec"
+        return f"{prefix}:{node[2]}"
+    if kind == "not":
+        return f"NOT {to_string(node[1])}"
+    return "(" + f" {kind.upper()} ".join(to_string(c) for c in node[1]) + ")"
+
+
+def estimate(node, selectivity, total):
+    """
+    Estimation du nombre de documents correspondant à un nœud.
+    selectivity(champ, valeur) renvoie le nombre de documents d'un terme.
+    """
+    kind = node[0]
+    if kind == "term":
+        return selectivity(node[1], node[2])
+    if kind == "not":
+        return total
+    estimates = [estimate(c, selectivity, total) for c in node[1]]
+    return min(estimates) if kind == "and" else min(total, sum(estimates))
+
+
+def compile_node(node, selectivity=None, total=0):
+    """
+    Compile un arbre en requête MongoDB.
+    - AND de termes d'un même champ -> $all ; OR de termes d'un même champ -> $in
+    - Les prédicats indexés les plus sélectifs sont placés en tête des $and,
+      les négations (non indexables) en dernier.
+    """
+    kind = node[0]
+    if kind == "term":
+        return {node[1]: node[2]}
+
+    if kind == "not":
+        child = node[1]
+        if child[0] == "term":
+            return {child[1]: {"$ne": child[2]}}
+        return {"$nor": [compile_node(child, selectivity, total)]}
+
+    # Regroupement des termes d'un même champ
+    grouped = {}
+    others = []
+    for child in node[1]:
+        if child[0] == "term":
+            grouped.setdefault(child[1], []).append(child[2])
+        else:
+            others.append(child)
+
+    operator = "$all" if kind == "and" else "$in"
+    clauses = []
+    for field, values in grouped.items():
+        if kind == "and" and selectivity is not None:
+            # $all n'utilise l'index que pour son premier élément : on y met le plus sélectif
+            values = sorted(values, key=lambda v: selectivity(field, v))
+        clause = {field: values[0]} if len(values) == 1 else {field: {operator: values}}
+        terms = [("term", field, v) for v in values]
+        clauses.append((clause, False, terms))
+    for child in others:
+        clauses.append((compile_node(child, selectivity, total), child[0] == "not", [child]))
+
+    if kind == "and" and selectivity is not None:
+        # Négations en dernier, puis du plus sélectif au moins sélectif
+        clauses.sort(key=lambda c: (c[1], min(estimate(n, selectivity, total) for n in c[2])))
+
+    if len(clauses) == 1:
+        return clauses[0][0]
+    return {"$and" if kind == "and" else "$or": [c[0] for c in clauses]}
@@ -0,0 +1,242 @@
+"""
+Index inversé de k-mers pour la recherche de sous-séquences.
+Collection annexe "<collection>_kmers", un document par k-mer :
+
+{
+  "_id": "GVLF",                        # k-mer (K acides aminés)
+  "entries": ["P12345", "Q67890", ...], # protéines dont la séquence contient ce k-mer
+  "saturated": true                     # (optionnel) k-mer trop fréquent : liste abandonnée
+}
+
+Une recherche de motif intersecte les listes des k-mers du motif (en commençant
+par les plus courtes) pour obtenir des candidats, puis MongoDB vérifie la
+correspondance exacte uniquement sur ces candidats.
+
+L'index n'est utilisé que s'il est complet : build_kmer_index l'enregistre dans
+la collection "meta" ("kmers:<collection>") à la fin de la construction et
+l'efface au début (voir index_ready).
+"""
+
+from pymongo import MongoClient, UpdateOne
+import os
+import re
+import dotenv
+
+from sequence_store import sequence_collection
+from data_version import META_COLLECTION
+
+dotenv.load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI")
+DB_NAME = os.getenv("DB_NAME")
+COLLECTION_NAME = os.getenv("COLLECTION_NAME")
+
+K = 4
+# Au-delà de ce nombre de protéines, un k-mer n'est plus sélectif : sa liste est abandonnée
+MAX_POSTINGS = 50_000
+# Nombre maximum de listes intersectées (les suivantes n'affinent plus beaucoup)
+MAX_LISTS = 4
+
+_MOTIF = re.compile(r"^[A-Z]+$")
+
+
+def kmer_collection(collection):
+    """Collection annexe associée à la collection des protéines"""
+    return collection.database[f"{collection.name}_kmers"]
+
+
+def sequence_kmers(sequence, k=K):
+    """Ensemble des k-mers distincts d'une séquence"""
+    if not isinstance(sequence, str):
+        return set()
+    sequence = sequence.upper()
+    return {sequence[i:i + k] for i in range(len(sequence) - k + 1)}
+
+
+def _mark_saturated(kmers_coll, kmers=None):
+    """Abandonne les listes qui dépassent MAX_POSTINGS entrées"""
+    query = {f"entries.{MAX_POSTINGS}": {"$exists": True}}
+    if kmers is not None:
+        query["_id"] = {"$in": list(kmers)}
+    kmers_coll.update_many(query, {"$set": {"saturated": True}, "$unset": {"entries": ""}})
+
+
+def _saturated_kmers(kmers_coll, kmers=None):
+    query = {"saturated": True}
+    if kmers is not None:
+        query["_id"] = {"$in": list(kmers)}
+    return {doc["_id"] for doc in kmers_coll.find(query, {"_id": 1})}
+
+
+def _flush_postings(kmers_coll, postings, saturated):
+    """Écrit un lot de listes {kmer: [entries]} en ajout ($push) sur les documents existants"""
+    ops = [
+        UpdateOne({"_id": kmer}, {"$push": {"entries": {"$each": entries}}}, upsert=True)
+        for kmer, entries in postings.items()
+        if kmer not in saturated
+    ]
+    if ops:
+        kmers_coll.bulk_write(ops, ordered=False)
+    _mark_saturated(kmers_coll, postings.keys())
+    saturated.update(_saturated_kmers(kmers_coll, postings.keys()))
+
+
+def index_sequences(collection, items, batch_size=2000, saturated=None):
+    """
+    Ajoute des séquences à l'index par lots (mémoire bornée par batch_size).
+
+    Args:
+        items: itérable de (entry, sequence)
+        saturated (set): k-mers déjà saturés (évite des écritures inutiles)
+
+    Returns:
+        int: nombre de séquences indexées
+    """
+    kmers_coll = kmer_collection(collection)
+    if saturated is None:
+        saturated = _saturated_kmers(kmers_coll)
+
+    postings = {}
+    count = 0
+    pending = 0
+    for entry, sequence in items:
+        for kmer in sequence_kmers(sequence):
+            postings.setdefault(kmer, []).append(entry)
+        count += 1
+        pending += 1
+        if pending >= batch_size:
+            _flush_postings(kmers_coll, postings, saturated)
+            postings = {}
+            pending = 0
+    if postings:
+        _flush_postings(kmers_coll, postings, saturated)
+    return count
+
+
+def _status_id(collection):
+    return f"kmers:{collection.name}"
+
+
+def index_ready(collection):
+    """Vrai si l'index de k-mers de la collection a été entièrement construit"""
+    doc = collection.database[META_COLLECTION].find_one({"_id": _status_id(collection)})
+    return bool(doc and doc.get("complete"))
+
+
+def build_kmer_index(collection, batch_size=2000):
+    """(Re)construit tout l'index à partir de la collection annexe des séquences"""
+    meta = collection.database[META_COLLECTION]
+    # Index incomplet pendant la reconstruction : les recherches s'en passent
+    meta.delete_one({"_id": _status_id(collection)})
+    kmer_collection(collection).drop()
+    cursor = sequence_collection(collection).find({}).batch_size(batch_size)
+    total = index_sequences(
+        collection,
+        ((doc["_id"], doc.get("sequence")) for doc in cursor),
+        batch_size=batch_size,
+        saturated=set()
+    )
+    meta.replace_one({"_id": _status_id(collection)}, {"complete": True, "sequences": total}, upsert=True)
+    print(f"✅ {total} séquences indexées ({K}-mers)")
+    return total
+
+
+def add_many_to_index(collection, items):
+    """
+    Ajoute un lot de protéines à l'index (idempotent) : une écriture groupée
+    pour tous les k-mers du lot.
+
+    Args:
+        items: itérable de (entry, sequence)
+    """
+    postings = {}
+    for entry, sequence in items:
+        for kmer in sequence_kmers(sequence):
+            postings.setdefault(kmer, []).append(entry)
+    if not postings:
+        return
+    kmers_coll = kmer_collection(collection)
+    saturated = _saturated_kmers(kmers_coll, postings.keys())
+    ops = [
+        UpdateOne({"_id": kmer}, {"$addToSet": {"entries": {"$each": entries}}}, upsert=True)
+        for kmer, entries in postings.items()
+        if kmer not in saturated
+    ]
+    if ops:
+        kmers_coll.bulk_write(ops, ordered=False)
+        _mark_saturated(kmers_coll, postings.keys())
+
+
+def remove_many_from_index(collection, items):
+    """Retire un lot de protéines de l'index : items = itérable de (entry, sequence)"""
+    postings = {}
+    for entry, sequence in items:
+        for kmer in sequence_kmers(sequence):
+            postings.setdefault(kmer, []).append(entry)
+    ops = [
+        UpdateOne({"_id": kmer}, {"$pull": {"entries": {"$in": entries}}})
+        for kmer, entries in postings.items()
+    ]
+    if ops:
+        kmer_collection(collection).bulk_write(ops, ordered=False)
+
+
+def add_to_index(collection, entry, sequence):
+    """Ajoute une protéine à l'index (idempotent)"""
+    add_many_to_index(collection, [(entry, sequence)])
+
+
+def remove_from_index(collection, entry, sequence):
+    """Retire une protéine de l'index"""
+    remove_many_from_index(collection, [(entry, sequence)])
+
+
+def candidate_entries(collection, pattern, max_candidates=20_000):
+    """
+    Protéines susceptibles de contenir le motif (sur-ensemble des vrais résultats).
+
+    Returns:
+        set | None: candidats, ou None si l'index ne peut pas aider
+        (motif plus court que K, caractères spéciaux, k-mers tous saturés,
+        ou trop de candidats pour qu'un $in soit rentable)
+    """
+    pattern = (pattern or "").upper()
+    if len(pattern) < K or not _MOTIF.match(pattern):
+        return None
+
+    kmers = sequence_kmers(pattern)
+    kmers_coll = kmer_collection(collection)
+    sizes = {
+        doc["_id"]: doc["n"]
+        for doc in kmers_coll.aggregate([
+            {"$match": {"_id": {"$in": list(kmers)}, "saturated": {"$ne": True}}},
+            {"$project": {"n": {"$size": {"$ifNull": ["$entries", []]}}}}
+        ])
+    }
+    saturated = _saturated_kmers(kmers_coll, kmers)
+
+    # Un k-mer absent de l'index (et non saturé) : aucune séquence ne contient le motif
+    if any(kmer not in sizes and kmer not in saturated for kmer in kmers):
+        return set()
+    if not sizes:
+        return None
+
+    candidates = None
+    for kmer in sorted(sizes, key=sizes.get)[:MAX_LISTS]:
+        doc = kmers_coll.find_one({"_id": kmer}, {"entries": 1})
+        entries = set(doc.get("entries", [])) if doc else set()
+        candidates = entries if candidates is None else candidates & entries
+        if len(candidates) <= 1:
+            break
+
+    if candidates is not None and len(candidates) > max_candidates:
+        return None
+    return candidates
+
+
+if __name__ == "__main__":
+    import datasets
+
+    client = MongoClient(MONGO_URI)
+    build_kmer_index(datasets.active_collection(client[DB_NAME], COLLECTION_NAME))
+    client.close()
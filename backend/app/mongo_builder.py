@@ -1,8 +1,25 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import AutoReconnect, BulkWriteError
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from tqdm import tqdm
+import argparse
 import os
+import time
 import dotenv
 import pandas as pd
-import re
+
+from mongo_indexes import ensure_indexes
+from suggestions import build_suggestion_index
+from data_version import bump_data_version
+from kmer_index import build_kmer_index
+from sequence_store import ensure_sequence_collection, sequence_collection
+import kmer_index
+import sequence_store
+import suggestions
+import datasets
+import outbox
+import stats_store
+import clusters
 
 dotenv.load_dotenv()
 
@@ -10,69 +27,440 @@ MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = os.getenv("DB_NAME")
 COLLECTION_NAME = os.getenv("COLLECTION_NAME")
 
+# Lignes du TSV lues par morceau (la mémoire dépend de cette valeur, pas de la taille du fichier)
+CHUNK_SIZE = 20_000
+# Documents par insert_many
+BATCH_SIZE = 1_000
+# Threads d'écriture (les lots en attente sont bornés à 2 x WORKERS)
+WORKERS = 4
+MAX_RETRIES = 5
+RETRY_DELAY = 0.5
+
+# Mode "sync" : au-delà de cette part de la collection, les suppressions sont refusées
+# (fichier tronqué ou mauvais fichier) sauf --allow-mass-delete
+MAX_DELETE_RATIO = 0.2
+
+TSV_COLUMNS = ["Entry", "Entry Name", "Protein names", "Organism", "Sequence", "EC number", "InterPro"]
+# Champs issus du TSV (hors séquence), comparés lors de la migration des empreintes
+CONTENT_FIELDS = ["entry_name", "protein_names", "organism", "sequence_length", "annotations"]
+# Empreintes des versions précédentes (sha1 du document) : remplacées sans réécriture si le contenu est identique
+LEGACY_HASH_LENGTH = 40
+DUPLICATE_KEY = 11000
+
+
+# Élément non vide d'une liste "1.1.1; 2.2.2" (InterPro, EC), espaces autour exclus
+LIST_ITEM = r"[^;\s](?:[^;]*[^;\s])?"
+
+
+def split_list_column(series):
+    """Chaînes "a; b; c" -> listes ["a", "b", "c"] pour toute une colonne (vide ou NaN -> [])"""
+    return series.fillna("").str.findall(LIST_ITEM)
+
+
+def protein_names_column(series):
+    """
+    Noms de protéines "Nom (Synonyme) (EC 1.1.1.1)" -> ["Nom", "Synonyme"] pour
+    toute une colonne : les numéros EC qui traînent dans les noms sont écartés.
+    """
+    parts = (
+        series.str.replace(")", "", regex=False)
+        .str.split(r"\s*\(", regex=True)
+        .explode()
+        .str.strip()
+    )
+    parts = parts[parts.notna() & ~parts.str.startswith("EC ", na=False)]
+    grouped = parts.groupby(level=0).agg(list).reindex(series.index)
+    return pd.Series([names if isinstance(names, list) else [] for names in grouped], index=series.index)
 
-# Fonction pour nettoyer et diviser les chaînes (InterPro, EC)
-def split_string_to_list(val, delimiter=';'):
-    if pd.isna(val) or val == '':
-        return []
-    # Divise, enlève les espaces autour et filtre les chaînes vides
-    return [x.strip() for x in str(val).split(delimiter) if x.strip()]
 
-# Fonction pour nettoyer les noms de protéines 
-def process_protein_names(val):
-    if pd.isna(val):
-        return []
-    names = re.split(r'\s*\(', val)
-    clean_names = []
-    for n in names:
-        n = n.replace(')', '').strip()
-        # On évite d'inclure les EC number qui traînent dans les noms
-        if not n.startswith('EC '): 
-            clean_names.append(n)
-    return clean_names
+def content_hashes(df):
+    """
+    Empreinte de chaque ligne du TSV (colonnes brutes, séquence comprise),
+    calculée par pandas pour tout le morceau. Les champs calculés ensuite
+    (cluster_id, community_id...) n'en font pas partie.
+    """
+    hashes = pd.util.hash_pandas_object(df[TSV_COLUMNS].fillna(""), index=False)
+    return hashes.map("{:016x}".format)
+
+
+def prepare_chunk(df):
+    """
+    Transforme un morceau du TSV en documents protéines et documents séquences
+    (opérations par colonne, puis to_dict("records")).
+
+    Returns:
+        tuple: (documents protéines, documents de la collection annexe des séquences)
+    """
+    sequences = df["Sequence"].fillna("")
+    columns = pd.DataFrame({
+        # _id est indexé par défaut et garantit l'unicité
+        "_id": df["Entry"],
+        "entry_name": df["Entry Name"],
+        "protein_names": protein_names_column(df["Protein names"]),
+        "organism": df["Organism"],
+        # Pré-calculer la longueur accélère les filtres futurs (ex: sequence > 50 AA)
+        "sequence_length": sequences.str.len(),
+        "content_hash": content_hashes(df),
+    })
+    docs = columns.to_dict("records")
+    # Transformation des chaînes "1.1.1; 2.2.2" en listes réelles
+    for doc, ec_numbers, interpro in zip(docs, split_list_column(df["EC number"]), split_list_column(df["InterPro"])):
+        doc["annotations"] = {"ec_numbers": ec_numbers, "interpro": interpro}
+    # Les séquences vont dans une collection annexe compressée (voir sequence_store.py)
+    sequence_docs = pd.DataFrame({"_id": df["Entry"], "sequence": sequences}).to_dict("records")
+    return docs, sequence_docs
+
+
+def iter_chunks(tsv_path, chunk_size=CHUNK_SIZE):
+    """Lit le TSV par morceaux de chunk_size lignes (colonnes utiles uniquement)"""
+    return pd.read_csv(tsv_path, sep='\t', usecols=TSV_COLUMNS, dtype=str, chunksize=chunk_size)
 
 
 def prepare_mongo_documents(tsv_path):
-    df = pd.read_csv(tsv_path, sep='\t')
+    """Tous les documents du fichier (séquence incluse) : à réserver aux petits fichiers"""
     mongo_docs = []
+    for chunk in iter_chunks(tsv_path):
+        docs, sequence_docs = prepare_chunk(chunk)
+        for doc, sequence_doc in zip(docs, sequence_docs):
+            doc["sequence"] = sequence_doc["sequence"]
+        mongo_docs.extend(docs)
+    return mongo_docs
 
-    for index, row in df.iterrows():
-        doc = {
-            # _id est indexé par défaut et garantit l'unicité
-            "_id": row['Entry'],
-            
-            "entry_name": row['Entry Name'],
-            
-            # Transformation du nom en liste
-            "protein_names": process_protein_names(row['Protein names']),
-            
-            "organism": row['Organism'],
-            
-            "sequence": row['Sequence'],
-            
-            # Pré-calculer la longueur accélère les filtres futurs (ex: sequence > 50 AA)
-            "sequence_length": len(row['Sequence']) if not pd.isna(row['Sequence']) else 0,
-            
-            "annotations": {
-                # Transformation des chaînes "1.1.1; 2.2.2" en listes réelles
-                "ec_numbers": split_string_to_list(row['EC number']),
-                "interpro": split_string_to_list(row['InterPro'])
-            }
-        }
-        mongo_docs.append(doc)
 
-    return mongo_docs
+def _insert_unordered(collection, docs):
+    """
+    insert_many non ordonné : le serveur continue après une erreur et peut
+    paralléliser. Les doublons de clé (lot rejoué après une coupure) sont ignorés.
 
-if __name__ == "__main__":
-    tsv_path = os.path.join('backend', 'data', 'raw', 'uniprot.tsv')
-    
-    df = pd.read_csv(tsv_path, sep='\t')
+    Returns:
+        int: documents réellement insérés
+    """
+    try:
+        return len(collection.insert_many(docs, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        errors = [err for err in e.details.get("writeErrors", []) if err.get("code") != DUPLICATE_KEY]
+        if errors:
+            raise
+        return e.details.get("nInserted", 0)
+
+
+def _with_retry(fn, label):
+    """Exécute fn avec reprise (délai croissant) sur erreur réseau"""
+    for attempt in range(1, MAX_RETRIES + 1):
+        try:
+            return fn()
+        except AutoReconnect as e:
+            if attempt == MAX_RETRIES:
+                raise
+            delay = RETRY_DELAY * 2 ** (attempt - 1)
+            print(f"🔄 {label} : nouvel essai dans {delay:.1f} s ({e})")
+            time.sleep(delay)
+
+
+def write_batch(collection, docs, sequence_docs):
+    """Écrit un lot (protéines + séquences) avec reprise sur erreur réseau"""
+    def write():
+        inserted = _insert_unordered(collection, docs)
+        _insert_unordered(sequence_collection(collection), sequence_docs)
+        return {"inserted": inserted}
+
+    return _with_retry(write, f"Lot de {len(docs)} documents")
+
+
+def _split_legacy(collection, changed, stored):
+    """
+    Parmi les documents dont l'empreinte diffère, ceux qui n'ont qu'une empreinte
+    à l'ancien format mais un contenu identique : seule l'empreinte est remplacée
+    (pas de réécriture, ni de mise à jour des index annexes).
+
+    Returns:
+        list: (document, séquence) réellement modifiés
+    """
+    legacy = [doc["_id"] for doc, _ in changed if len(stored.get(doc["_id"]) or "") == LEGACY_HASH_LENGTH]
+    if not legacy:
+        return changed
+    current = {
+        d["_id"]: d for d in collection.find({"_id": {"$in": legacy}}, {field: 1 for field in CONTENT_FIELDS})
+    }
+    sequences = sequence_store.get_sequences(collection, legacy)
+    same = [
+        doc for doc, sequence_doc in changed
+        if doc["_id"] in current
+        and all(current[doc["_id"]].get(field) == doc.get(field) for field in CONTENT_FIELDS)
+        and sequences.get(doc["_id"], "") == sequence_doc["sequence"]
+    ]
+    if same:
+        ops = [UpdateOne({"_id": doc["_id"]}, {"$set": {"content_hash": doc["content_hash"]}}) for doc in same]
+        _with_retry(lambda: collection.bulk_write(ops, ordered=False), f"Empreintes de {len(ops)} documents")
+    same_ids = {doc["_id"] for doc in same}
+    return [(doc, sequence_doc) for doc, sequence_doc in changed if doc["_id"] not in same_ids]
+
+
+def sync_batch(collection, docs, sequence_docs):
+    """
+    Mode "sync" : compare l'empreinte de chaque document à celle stockée et
+    n'écrit que les protéines nouvelles ou modifiées ($set : les champs calculés
+    comme cluster_id sont conservés). Les index annexes (suggestions, k-mers)
+    sont mis à jour pour ces seules protéines, et leur synchronisation Neo4j est
+    enregistrée dans l'outbox (voir sync_tsv).
+    """
+    ids = [doc["_id"] for doc in docs]
+    stored = {
+        d["_id"]: d.get("content_hash")
+        for d in collection.find({"_id": {"$in": ids}}, {"content_hash": 1})
+    }
+    changed = [
+        (doc, sequence_doc) for doc, sequence_doc in zip(docs, sequence_docs)
+        if stored.get(doc["_id"]) != doc["content_hash"]
+    ]
+    # Comptées comme inchangées : seule leur empreinte change de format
+    changed = _split_legacy(collection, changed, stored)
+    stats = {"unchanged": len(docs) - len(changed)}
+    if not changed:
+        return stats
+
+    changed_ids = [doc["_id"] for doc, _ in changed]
+    previous_sequences = sequence_store.get_sequences(collection, changed_ids)
+    ops = [
+        UpdateOne({"_id": doc["_id"]}, {"$set": {k: v for k, v in doc.items() if k != "_id"}}, upsert=True)
+        for doc, _ in changed
+    ]
+
+    def write():
+        collection.bulk_write(ops, ordered=False)
+        sequence_store.store_sequences(collection, [sequence_doc for _, sequence_doc in changed])
+        suggestions.index_proteins(collection, [doc for doc, _ in changed])
+
+    _with_retry(write, f"Synchronisation de {len(ops)} documents")
+    outbox.enqueue(collection, "upsert", changed_ids)
+
+    for doc, sequence_doc in changed:
+        previous = previous_sequences.get(doc["_id"])
+        if previous != sequence_doc["sequence"]:
+            if previous:
+                kmer_index.remove_from_index(collection, doc["_id"], previous)
+            kmer_index.add_to_index(collection, doc["_id"], sequence_doc["sequence"])
+
+    stats["inserted"] = sum(1 for entry in changed_ids if entry not in stored)
+    stats["updated"] = len(changed) - stats["inserted"]
+    return stats
+
+
+def _count_rows(tsv_path):
+    """Nombre de lignes de données (lecture brute, sans analyse)"""
+    with open(tsv_path, "rb") as f:
+        return sum(block.count(b"\n") for block in iter(lambda: f.read(1 << 20), b"")) - 1
 
-    # Préparation des documents MongoDB
-    mongo_docs = prepare_mongo_documents('backend/data/raw/uniprot.tsv')
+
+def _peak_rss_mb():
+    """Pic mémoire du processus en Mo (None si le module resource n'existe pas, ex. Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss est en kilo-octets sous Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _memory_label():
+    peak = _peak_rss_mb()
+    return "?" if peak is None else f"{peak:.0f}"
+
+
+def _process_tsv(collection, tsv_path, handle_batch, desc, chunk_size, batch_size, workers, seen=None,
+                 total_rows=None):
+    """
+    Parcourt le TSV en flux : lecture par morceaux, préparation vectorisée et
+    traitement des lots par un groupe de threads. Le nombre de lots en attente est
+    borné, la mémoire reste donc constante quelle que soit la taille du fichier.
+
+    Args:
+        handle_batch: fonction (collection, docs, sequence_docs) -> dict de compteurs
+        seen (set): si fourni, reçoit les identifiants lus
+        total_rows (int): nombre de lignes attendu, pour la barre de progression
+            (facultatif : le fichier n'est pas relu pour le compter)
+
+    Returns:
+        dict: compteurs cumulés
+    """
+    stats = {}
+    processed = 0
+    start = time.perf_counter()
+    pending = set()
+
+    def collect(done):
+        nonlocal processed
+        for future in done:
+            for key, value in future.result().items():
+                stats[key] = stats.get(key, 0) + value
+                processed += value
+                pbar.update(value)
+        pbar.set_postfix(docs_s=f"{processed / (time.perf_counter() - start):.0f}", rss_mo=_memory_label())
+
+    with ThreadPoolExecutor(max_workers=workers) as executor, \
+            tqdm(total=total_rows, desc=desc, unit="prot") as pbar:
+        for chunk in iter_chunks(tsv_path, chunk_size):
+            docs, sequence_docs = prepare_chunk(chunk)
+            if seen is not None:
+                seen.update(doc["_id"] for doc in docs)
+            for i in range(0, len(docs), batch_size):
+                # Contre-pression : on attend qu'un lot se termine avant d'en soumettre d'autres
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                pending.add(executor.submit(
+                    handle_batch, collection, docs[i:i + batch_size], sequence_docs[i:i + batch_size]
+                ))
+        collect(wait(pending).done)
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"✅ {processed} protéines traitées en {elapsed:.1f} s "
+        f"({processed / max(elapsed, 1e-9):.0f} docs/s, pic mémoire {_memory_label()} Mo)"
+    )
+    return stats
+
+
+def load_tsv(collection, tsv_path, chunk_size=CHUNK_SIZE, batch_size=BATCH_SIZE, workers=WORKERS,
+             total_rows=None):
+    """
+    Import initial (collection vide) par insert_many non ordonnés.
+    (total_rows : voir _process_tsv)
+
+    Returns:
+        int: nombre de protéines insérées
+    """
+    ensure_sequence_collection(collection)
+    stats = _process_tsv(
+        collection, tsv_path, write_batch, "Import MongoDB", chunk_size, batch_size, workers, total_rows=total_rows
+    )
+    return stats.get("inserted", 0)
+
+
+def delete_missing(collection, seen, allow_mass_delete=False, batch_size=BATCH_SIZE):
+    """
+    Supprime les protéines absentes du fichier (et leurs séquences, suggestions et
+    k-mers) ; leur suppression de Neo4j est enregistrée dans l'outbox.
+
+    Raises:
+        ValueError: si la suppression toucherait plus de MAX_DELETE_RATIO de la collection
+    """
+    stale = [doc["_id"] for doc in collection.find({}, {"_id": 1}) if doc["_id"] not in seen]
+    if not stale:
+        return 0
+    total = collection.estimated_document_count()
+    if not allow_mass_delete and len(stale) > MAX_DELETE_RATIO * total:
+        raise ValueError(
+            f"{len(stale)} protéines sur {total} absentes du fichier : suppression refusée "
+            "(fichier incomplet ?). Relancer avec --allow-mass-delete pour confirmer."
+        )
+
+    for i in range(0, len(stale), batch_size):
+        batch = stale[i:i + batch_size]
+        _with_retry(lambda: collection.delete_many({"_id": {"$in": batch}}), f"Suppression de {len(batch)} documents")
+        removed_sequences = sequence_store.delete_sequences(collection, batch)
+        suggestions.remove_proteins(collection, batch)
+        kmer_index.remove_many_from_index(collection, removed_sequences.items())
+        outbox.enqueue(collection, "delete", batch)
+    return len(stale)
+
+
+def sync_tsv(collection, tsv_path, chunk_size=CHUNK_SIZE, batch_size=BATCH_SIZE, workers=WORKERS,
+             allow_mass_delete=False, total_rows=None, neo4j_database=None, apply_neo4j=True):
+    """
+    Rechargement idempotent : seules les protéines nouvelles ou modifiées sont
+    écrites, celles qui ont disparu du fichier sont supprimées. La collection
+    reste en ligne pendant toute l'opération.
+
+    En fin de synchronisation, si quelque chose a changé :
+      - les entrées Neo4j enregistrées dans l'outbox sont appliquées (apply_neo4j,
+        sinon laissées au worker outbox) ;
+      - la version des données est incrémentée (caches de lecture invalidés) ;
+      - les compteurs de stats_store sont recalculés.
+
+    Args:
+        neo4j_database (str): base Neo4j de la collection (par défaut la base active)
+
+    Returns:
+        dict: {"unchanged", "inserted", "updated", "deleted"}
+    """
+    ensure_sequence_collection(collection)
+    seen = set()
+    stats = _process_tsv(
+        collection, tsv_path, sync_batch, "Synchronisation MongoDB", chunk_size, batch_size, workers, seen=seen,
+        total_rows=total_rows
+    )
+    stats["deleted"] = delete_missing(collection, seen, allow_mass_delete, batch_size)
+    for key in ("unchanged", "inserted", "updated"):
+        stats.setdefault(key, 0)
+    print(
+        f"✅ Synchronisation : {stats['inserted']} ajoutées, {stats['updated']} modifiées, "
+        f"{stats['deleted']} supprimées, {stats['unchanged']} inchangées"
+    )
+    if not (stats["inserted"] or stats["updated"] or stats["deleted"]):
+        return stats
+
+    neo4j_database = neo4j_database or datasets.active_neo4j_database(COLLECTION_NAME)
+    if apply_neo4j:
+        applied = outbox.drain(collection, neo4j_database)
+        print(f"✅ Neo4j synchronisé ({applied} entrées)")
+    else:
+        print("ℹ️ Synchronisation Neo4j laissée au worker outbox (python backend/app/outbox.py worker)")
+    bump_data_version(collection)
+    stats_store.recompute(collection, neo4j_database)
+    clusters.mark_stale(collection, stats["inserted"] + stats["updated"] + stats["deleted"])
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import du TSV UniProt dans MongoDB")
+    parser.add_argument("tsv_path", nargs="?", default=os.path.join('backend', 'data', 'raw', 'uniprot.tsv'))
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Lignes lues par morceau")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Documents par insert_many")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Threads d'écriture")
+    parser.add_argument(
+        "--mode", choices=["load", "sync"], default="load",
+        help="load : import initial ; sync : n'écrit que les différences (base en ligne)"
+    )
+    parser.add_argument("--allow-mass-delete", action="store_true",
+                        help=f"sync : autorise la suppression de plus de {MAX_DELETE_RATIO:.0%} de la collection")
+    parser.add_argument("--no-neo4j", action="store_true",
+                        help="sync : laisse la mise à jour de Neo4j au worker outbox")
+    args = parser.parse_args()
 
     # Connexion à MongoDB et insertion des documents
     client = MongoClient(MONGO_URI)
     db = client[DB_NAME]
-    collection = db[COLLECTION_NAME]
-    collection.insert_many(mongo_docs)
\ No newline at end of file
+    # Collection active derrière l'alias (pour un rechargement sans coupure : datasets.py load)
+    dataset = datasets.active_dataset(db, COLLECTION_NAME)
+    collection = db[dataset["mongo"]]
+
+    if args.mode == "sync" and collection.estimated_document_count() > 0:
+        # Suggestions et k-mers sont tenus à jour lot par lot : pas de reconstruction ;
+        # version des données, statistiques et Neo4j sont mis à jour par sync_tsv
+        sync_tsv(collection, args.tsv_path, args.chunk_size, args.batch_size, args.workers,
+                 args.allow_mass_delete, neo4j_database=dataset["neo4j"], apply_neo4j=not args.no_neo4j)
+        ensure_indexes(collection)
+        client.close()
+        raise SystemExit(0)
+
+    load_tsv(collection, args.tsv_path, args.chunk_size, args.batch_size, args.workers)
+
+    # Création des index utilisés par advanced_search (idempotent) : après l'import,
+    # une construction unique est bien plus rapide que la mise à jour à chaque insertion
+    ensure_indexes(collection)
+
+    # Collection annexe pour l'auto-complétion de la barre de recherche
+    build_suggestion_index(collection)
+
+    # Index inversé de k-mers pour la recherche de sous-séquences
+    build_kmer_index(collection)
+    bump_data_version(collection)
+
+    # Compteurs de statistiques (voir stats_store.py), comme après sync_tsv ou datasets.py load
+    try:
+        stats_store.recompute(collection, dataset["neo4j"])
+    except Exception as e:
+        print(f"⚠️ Statistiques non recalculées ({e}) : python backend/app/stats_store.py recompute")
+
+    client.close()
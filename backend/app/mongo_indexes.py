@@ -0,0 +1,207 @@
+"""
+Gestion des index MongoDB de la collection des protéines.
+- ensure_indexes : crée (ou recrée si la définition a changé) les index utilisés par advanced_search
+- check_index_usage : vérifie via explain() que les formes de filtres courantes passent par un index
+  sélectif (clés et documents examinés comparés aux documents renvoyés)
+"""
+
+from pymongo import MongoClient, ASCENDING
+from pymongo.errors import OperationFailure
+import os
+import re
+import dotenv
+
+dotenv.load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI")
+DB_NAME = os.getenv("DB_NAME")
+COLLECTION_NAME = os.getenv("COLLECTION_NAME")
+
+# Collation insensible à la casse (et aux accents) pour les recherches exactes
+CI_COLLATION = {"locale": "en", "strength": 2}
+
+# Index correspondant aux formes de requêtes produites par ProteinDatabase.advanced_search
+PROTEIN_INDEXES = [
+    # Tableaux -> index multikey ($in, $all, égalité)
+    {"name": "ec_numbers", "keys": [("annotations.ec_numbers", ASCENDING)]},
+    {"name": "interpro", "keys": [("annotations.interpro", ASCENDING)]},
+    {"name": "protein_names", "keys": [("protein_names", ASCENDING)]},
+    # Mot-clé : $or de deux $regex, chaque branche parcourt son propre index
+    {"name": "entry_name", "keys": [("entry_name", ASCENDING)]},
+    # Organisme ($regex) combiné à un intervalle de longueur
+    {"name": "organism_length", "keys": [("organism", ASCENDING), ("sequence_length", ASCENDING)]},
+    {"name": "sequence_length", "keys": [("sequence_length", ASCENDING)]},
+    # Recherche exacte insensible à la casse (nom choisi dans la barre d'auto-complétion)
+    {"name": "entry_name_ci", "keys": [("entry_name", ASCENDING)], "collation": CI_COLLATION},
+    # Clusters pré-calculés par clusters.py
+    {"name": "cluster_id", "keys": [("cluster_id", ASCENDING)]},
+    {"name": "community_id", "keys": [("community_id", ASCENDING)]},
+]
+
+# Au-delà de ce nombre de clés ou documents examinés par document renvoyé, l'index est peu sélectif
+MAX_EXAMINED_RATIO = 10
+
+# Formes de filtres représentatives utilisées pour l'auto-vérification
+SAMPLE_FILTERS = {
+    "keyword": {"keyword": "kinase"},
+    "entry_name": {"entry_name": "h17b6_human"},
+    "entry_name_organism": {"entry_name": "h17b6_human", "organism": "Homo sapiens"},
+    "organism": {"organism": "Homo sapiens"},
+    "length": {"length": {"min": 100, "max": 400}},
+    "organism_length": {"organism": "Homo sapiens", "length": {"min": 100}},
+    "ec_single": {"ec": {"values": "1.1.1.1"}},
+    "ec_and": {"ec": {"values": ["1.1.1.1", "1.1.1.2"], "mode": "AND"}},
+    "ec_or": {"ec": {"values": ["1.1.1.1", "1.1.1.2"], "mode": "OR"}},
+    "interpro_groups": {"interpro": {"values": "(IPR000001 AND IPR000002) OR (IPR000003)"}},
+    "cluster": {"cluster": 0},
+}
+
+
+def _index_matches(existing, spec):
+    """Compare une entrée de index_information() avec une définition attendue"""
+    existing_keys = [(field, int(direction)) for field, direction in existing.get("key", [])]
+    if existing_keys != [tuple(k) for k in spec["keys"]]:
+        return False
+    existing_collation = existing.get("collation")
+    if "collation" not in spec:
+        return existing_collation is None
+    if existing_collation is None:
+        return False
+    return all(existing_collation.get(k) == v for k, v in spec["collation"].items())
+
+
+def ensure_indexes(collection, specs=PROTEIN_INDEXES):
+    """
+    Crée les index manquants de façon idempotente.
+    Un index existant portant le même nom mais une définition différente est recréé.
+
+    Returns:
+        dict: {"created": [...], "unchanged": [...], "rebuilt": [...]}
+    """
+    report = {"created": [], "unchanged": [], "rebuilt": []}
+    existing = collection.index_information()
+
+    for spec in specs:
+        name = spec["name"]
+        options = {"name": name}
+        if "collation" in spec:
+            options["collation"] = spec["collation"]
+
+        if name in existing:
+            if _index_matches(existing[name], spec):
+                report["unchanged"].append(name)
+                continue
+            collection.drop_index(name)
+            report["rebuilt"].append(name)
+        else:
+            report["created"].append(name)
+
+        try:
+            collection.create_index(spec["keys"], **options)
+        except OperationFailure as e:
+            print(f"❌ Impossible de créer l'index {name} : {e}")
+
+    return report
+
+
+def _plan_stages(plan):
+    """Liste (récursivement) les étapes d'un plan d'exécution explain()"""
+    stages = [plan.get("stage")]
+    if "inputStage" in plan:
+        stages += _plan_stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        stages += _plan_stages(child)
+    return stages
+
+
+def _unanchored_regexes(query, path=""):
+    """
+    Champs filtrés par une expression régulière qui ne peut pas borner l'index :
+    non ancrée (pas de "^" initial) ou insensible à la casse. L'index est alors
+    parcouru en entier (IXSCAN présent, mais sans bénéfice).
+    """
+    found = []
+    if isinstance(query, list):
+        for item in query:
+            found += _unanchored_regexes(item, path)
+    elif isinstance(query, dict):
+        for key, value in query.items():
+            field = path if key.startswith("$") else key
+            if key == "$regex" or isinstance(value, re.Pattern):
+                pattern = value.pattern if isinstance(value, re.Pattern) else str(value)
+                flags = value.flags if isinstance(value, re.Pattern) else 0
+                if not pattern.startswith("^") or flags & re.IGNORECASE or "i" in query.get("$options", ""):
+                    found.append(field)
+            else:
+                found += _unanchored_regexes(value, field)
+    return sorted(set(found))
+
+
+def check_index_usage(protein_db, sample_filters=SAMPLE_FILTERS, max_ratio=MAX_EXAMINED_RATIO):
+    """
+    Vérifie que chaque forme de filtre courante est servie par un index sélectif :
+    un IXSCAN ne suffit pas, les clés et documents examinés (executionStats)
+    ne doivent pas dépasser max_ratio fois les documents renvoyés.
+
+    Args:
+        protein_db (ProteinDatabase): instance connectée (fournit _build_query)
+
+    Returns:
+        dict: {nom_du_filtre: {"ok", "ixscan", "stages", "n_returned", "keys_examined",
+               "docs_examined", "selective", "unanchored_regex": [champs]}}
+    """
+    report = {}
+    for name, filters in sample_filters.items():
+        query = protein_db._build_query(filters)
+        cursor = protein_db.collection.find(query)
+        collation = protein_db._collation_for(filters)
+        if collation:
+            cursor = cursor.collation(collation)
+        explain = cursor.explain()
+        winning_plan = explain["queryPlanner"]["winningPlan"]
+        # Sur les versions récentes le plan peut être encapsulé (moteur SBE)
+        winning_plan = winning_plan.get("queryPlan", winning_plan)
+        stages = _plan_stages(winning_plan)
+
+        execution = explain.get("executionStats", {})
+        n_returned = execution.get("nReturned", 0)
+        keys_examined = execution.get("totalKeysExamined", 0)
+        docs_examined = execution.get("totalDocsExamined", 0)
+        budget = max_ratio * max(n_returned, 1)
+        selective = keys_examined <= budget and docs_examined <= budget
+        unanchored = _unanchored_regexes(query)
+
+        report[name] = {
+            "ok": "IXSCAN" in stages and "COLLSCAN" not in stages and selective and not unanchored,
+            "ixscan": "IXSCAN" in stages,
+            "stages": stages,
+            "n_returned": n_returned,
+            "keys_examined": keys_examined,
+            "docs_examined": docs_examined,
+            "selective": selective,
+            "unanchored_regex": unanchored,
+        }
+    return report
+
+
+if __name__ == "__main__":
+    import datasets
+    from mongo_queries import ProteinDatabase
+
+    client = MongoClient(MONGO_URI)
+    collection = datasets.active_collection(client[DB_NAME], COLLECTION_NAME)
+    result = ensure_indexes(collection)
+    print(f"✅ Index créés : {result['created']}")
+    print(f"🔄 Index recréés : {result['rebuilt']}")
+    print(f"ℹ️  Index inchangés : {result['unchanged']}")
+    client.close()
+
+    print("\n🔍 Vérification des plans d'exécution :")
+    for name, info in check_index_usage(ProteinDatabase()).items():
+        status = "✅" if info["ok"] else ("⚠️" if info["ixscan"] else "❌")
+        print(
+            f"  {status} {name}: {' <- '.join(s for s in info['stages'] if s)} "
+            f"({info['n_returned']} renvoyés, {info['keys_examined']} clés, {info['docs_examined']} documents examinés)"
+        )
+        if info["unanchored_regex"]:
+            print(f"      regex non ancrée ou insensible à la casse : {', '.join(info['unanchored_regex'])}")
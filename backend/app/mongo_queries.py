@@ -1,10 +1,53 @@
 import os
 import dotenv
 from pymongo import MongoClient
+from pymongo.errors import ExecutionTimeout
 import re
+import json
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from mongo_indexes import CI_COLLATION
+from data_version import get_data_version
+import suggestions
+import kmer_index
+import sequence_store
+import filter_compiler
+import datasets
 
 dotenv.load_dotenv()
 
+# Nombre maximum de comptages gardés en cache (clé = filtres normalisés + version des données)
+COUNT_CACHE_SIZE = 256
+# Au-delà, le total est affiché comme "10 000+"
+DEFAULT_COUNT_CAP = 10_000
+# Répartitions (facettes) : documents lus au maximum, durée maximale (aussi celle du
+# comptage qui les accompagne) et tranches de longueur
+FACET_SCAN_LIMIT = 50_000
+FACET_MAX_TIME_MS = 5_000
+LENGTH_BUCKETS = [0, 100, 200, 300, 500, 1000, 2000, 5000]
+# Expressions d'annotations compilées et nombre de documents par terme gardés en cache
+COMPILED_CACHE_SIZE = 512
+TERM_COUNT_CACHE_SIZE = 4096
+# Sous-séquences résolues en identifiants gardées en cache (clé = motif + autres filtres + version)
+SEQUENCE_CACHE_SIZE = 64
+# Champs d'une ligne de résultat en mode résumé (détails chargés par get_protein_details)
+SUMMARY_FIELDS = ["entry_name", "organism", "sequence_length", "cluster_id", "cluster_size",
+                  "community_id", "community_size"]
+
+_BOOLEAN_EXPRESSION = re.compile(r"[()]|\b(AND|OR|NOT)\b|:", re.IGNORECASE)
+
+
+def _entry_name_alone(filters):
+    """Vrai si entry_name est le seul filtre renseigné"""
+    return bool(filters.get("entry_name")) and all(
+        value in (None, "", [], {}) for key, value in filters.items() if key != "entry_name"
+    )
+
+
 class ProteinDatabase:
     def __init__(self):
         self.mongo_uri = os.getenv("MONGO_URI")
@@ -13,38 +56,93 @@ class ProteinDatabase:
         try:
             self.client = MongoClient(self.mongo_uri)
             self.db = self.client[self.db_name]
-            self.collection = self.db[self.collection_name]
         except Exception as e:
             print(f"❌ Erreur connexion : {e}")
 
-    def _parse_annotation_groups(self, expression):
+        # Comptages en cache et exécution du comptage en parallèle de la page
+        self._count_cache = OrderedDict()
+        self._compiled_cache = OrderedDict()
+        self._term_counts = OrderedDict()
+        self._sequence_cache = OrderedDict()
+        self._count_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="protein-count")
+
+    @property
+    def collection(self):
+        """Collection active derrière l'alias COLLECTION_NAME (voir datasets.py)"""
+        return self.db[datasets.resolve(self.db, self.collection_name)["mongo"]]
+
+    def data_version(self):
+        """Version des données (clé de cache côté interface, change à chaque écriture)"""
+        return self._data_version()
+
+    def cluster_status(self):
+        """État des clusters pré-calculés (voir clusters.cluster_status)"""
+        # Import local : clusters dépend de numpy / pandas, inutiles aux recherches
+        from clusters import cluster_status
+        return cluster_status(self.collection)
+
+    def _data_version(self):
         """
-        Parse une expression comme "(A AND B) OR (C AND D)" 
-        et retourne une liste de groupes: [['A', 'B'], ['C', 'D']]
-        Chaque groupe sera combiné avec $all, et les groupes entre eux avec $or
+        Version des données pour les clés de cache. Le nom de la collection
+        physique en fait partie : une bascule de jeu de données invalide tout.
         """
-        groups = []
-        # Trouver tous les groupes entre parenthèses
-        pattern = r'\(([^)]+)\)'
-        matches = re.findall(pattern, expression)
-        
-        for match in matches:
-            # Séparer les éléments par AND (insensible à la casse)
-            elements = re.split(r'\s+AND\s+', match, flags=re.IGNORECASE)
-            group = [elem.strip() for elem in elements if elem.strip()]
-            if group:
-                groups.append(group)
-        
-        return groups if groups else None
+        collection = self.collection
+        return collection.name, get_data_version(collection)
 
-    def advanced_search(self, filters, page=1, page_size=20):
+    def _term_count(self, field, value, version):
+        """Nombre de documents d'un terme d'annotation (lecture de l'index multikey, mise en cache)"""
+        key = (field, value, version)
+        with self._count_lock:
+            if key in self._term_counts:
+                return self._term_counts[key]
+        count = self.collection.count_documents({field: value})
+        with self._count_lock:
+            self._term_counts[key] = count
+            while len(self._term_counts) > TERM_COUNT_CACHE_SIZE:
+                self._term_counts.popitem(last=False)
+        return count
+
+    def _compile_annotation_expression(self, expression, default_field=None):
         """
-        Recherche avancée basée sur un dictionnaire de filtres.
-        
-        Args:
-            filters (dict): Dictionnaire contenant les critères (voir exemple).
-            page (int): Pagination.
-            page_size (int): Taille de page.
+        Compile une expression booléenne EC / InterPro (voir filter_compiler.py).
+        Le résultat est mis en cache par expression normalisée et version des données :
+        l'ordre des prédicats dépend du nombre de documents de chaque terme.
+        """
+        tree = filter_compiler.parse_expression(expression, default_field)
+        version = self._data_version()
+        key = (filter_compiler.to_string(tree), version)
+        with self._count_lock:
+            if key in self._compiled_cache:
+                self._compiled_cache.move_to_end(key)
+                return self._compiled_cache[key]
+
+        compiled = filter_compiler.compile_node(
+            tree,
+            selectivity=lambda field, value: self._term_count(field, value, version),
+            total=self.collection.estimated_document_count()
+        )
+
+        with self._count_lock:
+            self._compiled_cache[key] = compiled
+            while len(self._compiled_cache) > COMPILED_CACHE_SIZE:
+                self._compiled_cache.popitem(last=False)
+        return compiled
+
+    def _collation_for(self, filters):
+        """
+        Collation à appliquer à la requête : uniquement pour la recherche exacte
+        par entry_name seule, servie par l'index insensible à la casse entry_name_ci.
+        Une collation porte sur toute la requête : combinée à d'autres filtres, elle
+        les rendrait insensibles à la casse et les priverait de leurs index (sans
+        collation). Le nom est alors résolu à part (voir _build_query).
+        """
+        return CI_COLLATION if _entry_name_alone(filters) else None
+
+    def _build_query(self, filters):
+        """
+        Construit la requête MongoDB à partir du dictionnaire de filtres
+        (voir advanced_search pour le format).
         """
         query = {}
 
@@ -56,12 +154,24 @@ class ProteinDatabase:
                 {"protein_names": {"$regex": regex}}
             ]
 
+        # 1bis. Nom exact, insensible à la casse : seul, par la collation de la requête
+        # (voir _collation_for) ; sinon résolu en identifiants par l'index entry_name_ci
+        if filters.get("entry_name"):
+            if _entry_name_alone(filters):
+                query["entry_name"] = filters["entry_name"]
+            else:
+                ids = [
+                    doc["_id"] for doc in
+                    self.collection.find({"entry_name": filters["entry_name"]}, {"_id": 1}, collation=CI_COLLATION)
+                ]
+                query.setdefault("$and", []).append({"_id": {"$in": ids}})
+
         # 2. Gestion de l'Organisme
         if filters.get("organism"):
             query["organism"] = {"$regex": re.compile(filters["organism"], re.IGNORECASE)}
 
         # 3. Gestion des Annotations (Logique avancée pour EC et InterPro)
-        # Supporte: valeurs simples, AND, OR, et combinaisons complexes comme "(A AND B) OR (C AND D)"
+        # Supporte: valeurs simples, listes, et expressions booléennes imbriquées (AND, OR, NOT, parenthèses)
         annotation_fields = {
             "ec": "annotations.ec_numbers",
             "interpro": "annotations.interpro"
@@ -73,28 +183,14 @@ class ProteinDatabase:
             if filter_data and filter_data.get("values"):
                 values = filter_data["values"]
                 
-                # Si c'est une chaîne, on parse les groupes
+                # Si c'est une chaîne, on regarde si c'est une expression booléenne
                 if isinstance(values, str):
-                    # Détection du format avancé: "(A AND B) OR (C AND D)"
-                    if "(" in values and ")" in values:
-                        # Parser les groupes entre parenthèses
-                        groups = self._parse_annotation_groups(values)
-                        if groups:
-                            or_conditions = []
-                            for group in groups:
-                                if len(group) == 1:
-                                    or_conditions.append({mongo_field: group[0]})
-                                else:
-                                    or_conditions.append({mongo_field: {"$all": group}})
-                            
-                            if len(or_conditions) == 1:
-                                query.update(or_conditions[0])
-                            else:
-                                # Combiner avec $or existant si nécessaire
-                                if "$and" not in query:
-                                    query["$and"] = []
-                                query["$and"].append({"$or": or_conditions})
-                            continue
+                    # Format avancé : "(A AND B) OR (C AND NOT D)", préfixes ec:/ipr:
+                    if _BOOLEAN_EXPRESSION.search(values):
+                        query.setdefault("$and", []).append(
+                            self._compile_annotation_expression(values, mongo_field)
+                        )
+                        continue
                     
                     # Format simple: "1.1.1, 2.2.2"
                     values = [x.strip() for x in values.split(',') if x.strip()]
@@ -109,6 +205,12 @@ class ProteinDatabase:
                 else:
                     query[mongo_field] = {operator: values}
 
+        # 3bis. Expression mêlant EC et InterPro (ex: "IPR000001 AND NOT ec:3.1.1.1")
+        if filters.get("annotations"):
+            query.setdefault("$and", []).append(
+                self._compile_annotation_expression(filters["annotations"])
+            )
+
         # 4. Gestion de la longueur (Range)
         length_data = filters.get("length")
         if length_data:
@@ -121,43 +223,304 @@ class ProteinDatabase:
             if range_query:
                 query["sequence_length"] = range_query
 
-        # 5. Gestion de la recherche par sous-séquence
+        # 5. Gestion des clusters (pré-calculés par clusters.py, champs indexés)
+        if filters.get("cluster") is not None and filters.get("cluster") != "":
+            query["cluster_id"] = int(filters["cluster"])
+        if filters.get("community") is not None and filters.get("community") != "":
+            query["community_id"] = int(filters["community"])
+
+        # 6. Gestion de la recherche par sous-séquence, en dernier : elle est restreinte
+        # aux protéines retenues par les autres filtres (voir _sequence_entries)
         if filters.get("sequence"):
-            sequence_pattern = filters["sequence"].upper().replace(" ", "")
-            query["sequence"] = {"$regex": sequence_pattern, "$options": "i"}
+            query["_id"] = {"$in": self._sequence_entries(filters, query)}
 
-        # --- Exécution ---
-        skip_amount = (page - 1) * page_size
-        
+        return query
+
+    def _sequence_entries(self, filters, other_query):
+        """
+        Identifiants dont la séquence contient le motif, parmi ceux retenus par les
+        autres filtres (other_query). Les séquences sont dans une collection annexe
+        (voir sequence_store.py) : pré-filtrage par l'index de k-mers et par les
+        autres filtres s'ils retiennent au plus MAX_SEQUENCE_MATCHES protéines, puis
+        vérification exacte du $regex sur les seuls candidats.
+
+        Résultat mis en cache par motif, autres filtres et version des données : les
+        pages et comptages d'une même recherche ne relisent pas les séquences.
+        """
+        pattern = filters["sequence"].upper().replace(" ", "")
+        others = {k: v for k, v in filters.items() if k != "sequence"}
+        key = (pattern, self._filters_key(others) if other_query else None, self._data_version())
+        with self._count_lock:
+            if key in self._sequence_cache:
+                self._sequence_cache.move_to_end(key)
+                return self._sequence_cache[key]
+
+        candidates = self._sequence_candidates(pattern)
+        if other_query:
+            limit = sequence_store.MAX_SEQUENCE_MATCHES
+            scope = [doc["_id"] for doc in self.collection.find(other_query, {"_id": 1}).limit(limit + 1)]
+            # Autres filtres peu sélectifs : le motif est résolu seul
+            if len(scope) <= limit:
+                candidates = set(scope) if candidates is None else candidates & set(scope)
+        entries = sequence_store.matching_entries(self.collection, pattern, candidates)
+
+        with self._count_lock:
+            self._sequence_cache[key] = entries
+            while len(self._sequence_cache) > SEQUENCE_CACHE_SIZE:
+                self._sequence_cache.popitem(last=False)
+        return entries
+
+    def _sequence_candidates(self, pattern):
+        """
+        Candidats de l'index de k-mers (None si l'index n'est pas complet ou ne peut
+        pas aider). L'état est relu dans "meta" pour la collection active à chaque
+        résolution (elles sont en cache, voir _sequence_entries) : une bascule ou
+        une reconstruction de l'index est prise en compte immédiatement.
+        """
+        collection = self.collection
+        if not kmer_index.index_ready(collection):
+            return None
+        return kmer_index.candidate_entries(collection, pattern)
+
+    def _filters_key(self, filters):
+        """Empreinte stable d'un dictionnaire de filtres (indépendante de l'ordre des clés)"""
+        normalized = json.dumps(filters, sort_keys=True, default=str)
+        return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+
+    def _encode_page_token(self, filters, last_id):
+        """Jeton opaque de continuation : dernier _id vu + empreinte des filtres"""
+        payload = json.dumps({"after": last_id, "f": self._filters_key(filters)})
+        return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+    def _decode_page_token(self, filters, page_token):
+        """
+        Renvoie le dernier _id vu, ou None si le jeton est invalide
+        ou a été produit pour d'autres filtres.
+        """
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(page_token.encode("ascii")))
+        except (ValueError, AttributeError):
+            return None
+        if payload.get("f") != self._filters_key(filters):
+            return None
+        return payload.get("after")
+
+    def _count(self, query, collation, count_mode, count_cap, max_time_ms=None):
+        """
+        Compte les résultats d'une requête.
+        - "exact"  : count_documents complet
+        - "capped" : s'arrête à count_cap + 1 documents (renvoie capped=True au-delà)
+
+        Returns:
+            tuple: (total, capped)
+        """
+        options = {"maxTimeMS": max_time_ms} if max_time_ms else {}
         if not query:
-            total_results = self.collection.estimated_document_count()
-        else:
-            total_results = self.collection.count_documents(query)
+            return self.collection.estimated_document_count(**options), False
+        if count_mode == "capped":
+            total = self.collection.count_documents(query, collation=collation, limit=count_cap + 1, **options)
+            if total > count_cap:
+                return count_cap, True
+            return total, False
+        return self.collection.count_documents(query, collation=collation, **options), False
+
+    def _cached_count(self, filters, query, collation, count_mode, count_cap, max_time_ms=None):
+        """
+        Comptage mis en cache par filtres normalisés : en parcourant les pages d'une
+        même recherche, le comptage n'est exécuté qu'une fois. La version des données
+        fait partie de la clé, donc tout ajout/suppression invalide le cache.
+        Un comptage interrompu par max_time_ms renvoie (None, False), sans mise en cache.
+        """
+        key = (self._filters_key(filters), count_mode, count_cap, self._data_version())
+        with self._count_lock:
+            if key in self._count_cache:
+                self._count_cache.move_to_end(key)
+                return self._count_cache[key]
+
+        try:
+            result = self._count(query, collation, count_mode, count_cap, max_time_ms)
+        except ExecutionTimeout:
+            print(f"⚠️ Comptage interrompu après {max_time_ms} ms : total non affiché")
+            return None, False
+
+        with self._count_lock:
+            self._count_cache[key] = result
+            while len(self._count_cache) > COUNT_CACHE_SIZE:
+                self._count_cache.popitem(last=False)
+        return result
+
+    def _facet_stages(self):
+        """Sous-pipelines $facet des répartitions"""
+        return {
+            "organisms": [
+                {"$sortByCount": "$organism"},
+                {"$limit": 10}
+            ],
+            # Classe EC = premier niveau du numéro ("1.14.14.1" -> "1"), comptée une fois par protéine
+            "ec_classes": [
+                {"$project": {"classes": {"$setUnion": [{"$map": {
+                    "input": {"$ifNull": ["$annotations.ec_numbers", []]},
+                    "as": "ec",
+                    "in": {"$arrayElemAt": [{"$split": ["$$ec", "."]}, 0]}
+                }}]}}},
+                {"$unwind": "$classes"},
+                {"$sortByCount": "$classes"}
+            ],
+            "interpro": [
+                {"$unwind": "$annotations.interpro"},
+                {"$sortByCount": "$annotations.interpro"},
+                {"$limit": 10}
+            ],
+            "lengths": [
+                {"$bucket": {
+                    "groupBy": "$sequence_length",
+                    "boundaries": LENGTH_BUCKETS,
+                    "default": f"{LENGTH_BUCKETS[-1]}+",
+                    "output": {"count": {"$sum": 1}}
+                }}
+            ],
+        }
+
+    def _page_projection(self, summary):
+        """
+        Projection des lignes de résultat : tout sauf la séquence, ou en mode
+        résumé les seuls champs affichés dans la liste (premier nom compris).
+        """
+        if not summary:
+            return {"sequence": 0}
+        projection = {field: 1 for field in SUMMARY_FIELDS}
+        projection["protein_names"] = {"$slice": 1}
+        return projection
 
-        cursor = self.collection.find(query, {"sequence": 0}).skip(skip_amount).limit(page_size)
+    def _facets(self, query, collation, facet_scan_limit):
+        """
+        Répartitions sur les facet_scan_limit premiers documents de la requête :
+        le $limit précède le $facet, seul ce préfixe (lu par l'index du filtre)
+        est parcouru. La page et le total sont lus à part (find indexé, _cached_count).
 
+        Returns:
+            dict: répartitions, ou None si FACET_MAX_TIME_MS est dépassé
+        """
+        pipeline = [{"$match": query}, {"$limit": facet_scan_limit}, {"$facet": self._facet_stages()}]
+        try:
+            output = next(self.collection.aggregate(pipeline, collation=collation, maxTimeMS=FACET_MAX_TIME_MS))
+        except ExecutionTimeout:
+            print(f"⚠️ Répartitions interrompues après {FACET_MAX_TIME_MS} ms : non affichées")
+            return None
         return {
+            name: [{"value": d["_id"], "count": d["count"]} for d in output[name]]
+            for name in ("organisms", "ec_classes", "interpro", "lengths")
+        }
+
+    def advanced_search(self, filters, page=1, page_size=20, page_token=None,
+                        count_mode="exact", count_cap=DEFAULT_COUNT_CAP,
+                        facets=False, facet_scan_limit=FACET_SCAN_LIMIT, summary=False):
+        """
+        Recherche avancée basée sur un dictionnaire de filtres.
+        
+        Args:
+            filters (dict): Dictionnaire contenant les critères (voir exemple).
+            page (int): Pagination.
+            page_size (int): Taille de page.
+            page_token (str): Jeton renvoyé par l'appel précédent (next_page_token).
+                S'il est fourni, la page est obtenue par recherche sur _id (keyset)
+                au lieu d'un skip : le coût ne dépend plus de la profondeur et les
+                ajouts/suppressions ne décalent pas les résultats.
+            count_mode (str): "exact" (par défaut), "capped" (s'arrête à count_cap,
+                total_is_capped=True au-delà) ou "none" (pas de comptage).
+            count_cap (int): Plafond du mode "capped".
+            facets (bool): Ajoute les répartitions (organismes, classes EC, InterPro,
+                longueurs), calculées en parallèle de la page (voir _facets). Si elles
+                ou le comptage dépassent FACET_MAX_TIME_MS, facets / total_matches valent None.
+            facet_scan_limit (int): Nombre maximum de documents lus pour les répartitions.
+            summary (bool): Lignes réduites aux champs de la liste (SUMMARY_FIELDS et
+                premier nom) ; noms complets et annotations via get_protein_details.
+        """
+        query = self._build_query(filters)
+        collation = self._collation_for(filters)
+
+        # --- Exécution ---
+        after = self._decode_page_token(filters, page_token) if page_token else None
+        if after is not None:
+            page_query = {"$and": [query, {"_id": {"$gt": after}}]} if query else {"_id": {"$gt": after}}
+            skip_amount = 0
+        else:
+            page_query = query
+            skip_amount = (page - 1) * page_size
+
+        # Comptage (éventuellement en cache) et répartitions tournent en parallèle de la
+        # lecture de la page ; avec les répartitions, le comptage est borné comme elles
+        count_future = None
+        if count_mode != "none":
+            count_future = self._executor.submit(
+                self._cached_count, filters, query, collation, count_mode, count_cap,
+                FACET_MAX_TIME_MS if facets else None
+            )
+        facet_future = self._executor.submit(self._facets, query, collation, facet_scan_limit) if facets else None
+
+        # Tri sur _id : ordre stable, nécessaire pour la pagination par jeton
+        # (on lit un document de plus pour savoir s'il existe une page suivante)
+        cursor = (
+            self.collection.find(page_query, self._page_projection(summary), collation=collation)
+            .sort("_id", 1)
+            .skip(skip_amount)
+            .limit(page_size + 1)
+        )
+        results = list(cursor)
+
+        if count_future is not None:
+            total_results, total_is_capped = count_future.result()
+        else:
+            total_results, total_is_capped = None, False
+
+        facet_results = facet_future.result() if facet_future is not None else None
+        if facet_results is not None:
+            # Les répartitions ne portent que sur les facet_scan_limit premiers documents
+            facet_results["truncated"] = (
+                total_results is None or total_is_capped or total_results > facet_scan_limit
+            )
+
+        has_next = len(results) > page_size
+        results = results[:page_size]
+
+        next_page_token = None
+        if has_next and results:
+            next_page_token = self._encode_page_token(filters, results[-1]["_id"])
+
+        response = {
             "total_matches": total_results,
+            "total_is_capped": total_is_capped,
             "page": page,
             "per_page": page_size,
-            "results": list(cursor)
+            "results": results,
+            "next_page_token": next_page_token
         }
+        if facets:
+            # None : répartitions interrompues (FACET_MAX_TIME_MS), la page reste servie
+            response["facets"] = facet_results
+        return response
 
-    def get_protein_suggestions(self, prefix, limit=10):
+    def get_protein_suggestions(self, prefix, limit=10, rank=True):
         """
         Récupère les suggestions de noms de protéines basées sur un préfixe.
+        Utilise la collection annexe d'auto-complétion (voir suggestions.py) ;
+        si elle n'a pas encore été construite, on se rabat sur un $regex.
         
         Args:
             prefix (str): Le début du nom de la protéine à rechercher.
             limit (int): Nombre maximum de suggestions à retourner.
+            rank (bool): Trier par popularité (nombre de sélections).
         
         Returns:
             list: Liste de dictionnaires avec entry_name et protein_names.
         """
         if not prefix or len(prefix) < 2:
             return []
+
+        if self._has_suggestion_index():
+            return suggestions.suggest(self.collection, prefix, limit=limit, rank=rank)
         
-        # Recherche le préfixe n'importe où dans le nom (pas juste au début)
+        # Repli : recherche le préfixe n'importe où dans le nom (parcours complet)
         regex_pattern = re.escape(prefix)
         
         # Recherche dans entry_name et protein_names
@@ -183,6 +546,26 @@ class ProteinDatabase:
         results = list(self.collection.aggregate(pipeline))
         return results
 
+    def _has_suggestion_index(self):
+        """Vérifie (une seule fois) que la collection d'auto-complétion est remplie"""
+        if not getattr(self, "_suggestions_ready", False):
+            suggestion_coll = suggestions.suggestion_collection(self.collection)
+            self._suggestions_ready = suggestion_coll.estimated_document_count() > 0
+        return self._suggestions_ready
+
+    def get_protein_details(self, entry):
+        """Document complet d'une protéine, sans la séquence (voir get_sequence)"""
+        return self.collection.find_one({"_id": entry}, {"sequence": 0})
+
+    def get_sequence(self, entry):
+        """Séquence d'une protéine (lue à la demande dans la collection annexe)"""
+        return sequence_store.get_sequences(self.collection, [entry]).get(entry, "")
+
+    def record_suggestion_hit(self, entry_name):
+        """Augmente la popularité d'une suggestion choisie par l'utilisateur"""
+        if self._has_suggestion_index():
+            suggestions.record_hit(self.collection, entry_name)
+
 if __name__ == "__main__":
     db = ProteinDatabase()
     
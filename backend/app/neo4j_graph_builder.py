@@ -3,6 +3,8 @@ import csv
 from tqdm import tqdm
 import os
 
+from neo4j_migrate import parse_list_property, record_schema_version
+
 # Connexion à Neo4j
 uri = os.getenv("NEO4J_URI", "neo4j://127.0.0.1:7687")
 user = os.getenv("NEO4J_USER", "neo4j")
@@ -60,11 +62,12 @@ def import_nodes_optimized(session, nodes_csv_path, batch_size=500):
             batch.append({
                 'entry': row['Entry'],
                 'entry_name': row['Entry Name'],
-                'protein_names': row['Protein names'].split(';') if row['Protein names'] else [],
+                'protein_names': parse_list_property(row['Protein names']),
                 'organism': row.get('Organism', ''),
                 'sequence': row['Sequence'],
-                'ec_numbers': row['EC_numbers'].split(';') if row['EC_numbers'] else [],
-                'interpro_list': row['InterPro_list'].split(';') if row['InterPro_list'] else []
+                # graph_builder.py écrit ces colonnes comme des listes Python sérialisées
+                'ec_numbers': parse_list_property(row['EC_numbers']),
+                'interpro_list': parse_list_property(row['InterPro_list'])
             })
             
             if len(batch) >= batch_size:
@@ -159,5 +162,8 @@ if __name__ == "__main__":
         
         # 4. Import des arêtes
         import_edges_optimized(session, "backend/data/processed/edges.csv")
+        
+        # 5. Base neuve : déjà au schéma courant (voir neo4j_migrate.py)
+        session.execute_write(record_schema_version)
 
 driver.close()
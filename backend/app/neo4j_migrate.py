@@ -0,0 +1,173 @@
+"""
+Migration du schéma des nœuds Protein dans Neo4j.
+
+Les anciennes importations ont laissé interpro_list, ec_numbers et
+protein_names sous plusieurs formes :
+  - chaîne "IPR000001;IPR000002"
+  - liste Python sérialisée "['IPR000001', 'IPR000002']" (nodes.csv écrit par
+    graph_builder.py, puis lu comme du texte)
+  - liste d'un seul élément contenant une telle liste sérialisée
+
+La migration les convertit en vraies listes, par lots, puis enregistre la
+version du schéma dans un nœud (:SchemaVersion {name: "Protein"}). Elle est
+idempotente : les nœuds déjà au bon format ne sont pas réécrits.
+
+Usage :
+    python backend/app/neo4j_migrate.py migrate [--database project] [--dry-run]
+    python backend/app/neo4j_migrate.py status [--database project]
+"""
+
+from neo4j import GraphDatabase
+from datetime import datetime, timezone
+import argparse
+import ast
+import os
+import dotenv
+
+import datasets
+
+dotenv.load_dotenv()
+
+NEO4J_URI = os.getenv("NEO4J_URI", "neo4j://127.0.0.1:7687")
+NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "NoSQLProject")
+COLLECTION_NAME = os.getenv("COLLECTION_NAME")
+
+# Version 2 : propriétés de liste toujours stockées comme des listes de chaînes
+SCHEMA_VERSION = 2
+LIST_PROPERTIES = ("interpro_list", "ec_numbers", "protein_names")
+BATCH_SIZE = 5000
+
+
+def parse_list_property(value, delimiter=";"):
+    """
+    Convertit une valeur de propriété (chaîne, liste sérialisée, liste) en
+    liste de chaînes non vides.
+    """
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        items = []
+        for item in value:
+            items.extend(parse_list_property(item, delimiter))
+        return items
+    value = str(value).strip()
+    if value.startswith("[") and value.endswith("]"):
+        try:
+            return parse_list_property(list(ast.literal_eval(value)), delimiter)
+        except (ValueError, SyntaxError):
+            # Nom entre crochets ("[Pyruvate dehydrogenase] kinase..."), pas une liste
+            pass
+    return [x.strip() for x in value.split(delimiter) if x.strip()]
+
+
+def _normalized(row):
+    """Propriétés à réécrire pour un nœud (vide si déjà conforme)"""
+    changes = {}
+    for prop in LIST_PROPERTIES:
+        value = row[prop]
+        if value is None:
+            continue
+        parsed = parse_list_property(value)
+        if parsed != value:
+            changes[prop] = parsed
+    return changes
+
+
+def get_schema_version(session):
+    """Version du schéma enregistrée dans la base (0 si jamais migrée)"""
+    record = session.run(
+        "MATCH (s:SchemaVersion {name: 'Protein'}) RETURN s.version AS version"
+    ).single()
+    return record["version"] if record else 0
+
+
+def record_schema_version(tx, migrated=0):
+    """Enregistre la version courante du schéma (aussi appelé après un import neuf)"""
+    tx.run(
+        """
+        MERGE (s:SchemaVersion {name: 'Protein'})
+        SET s.version = $version, s.migrated_at = $now, s.migrated_nodes = $migrated
+        """,
+        version=SCHEMA_VERSION, now=datetime.now(timezone.utc).isoformat(), migrated=migrated
+    )
+
+
+def migrate(session, batch_size=BATCH_SIZE, dry_run=False):
+    """
+    Parcourt les nœuds Protein par ordre d'entry (index protein_entry, pagination
+    par clé) et réécrit les propriétés de liste mal typées, un lot par transaction.
+
+    Returns:
+        dict: {"scanned", "migrated"}
+    """
+    def read_batch(tx, after):
+        return list(tx.run(
+            """
+            MATCH (p:Protein) WHERE p.entry > $after
+            RETURN p.entry AS entry, p.interpro_list AS interpro_list,
+                   p.ec_numbers AS ec_numbers, p.protein_names AS protein_names
+            ORDER BY p.entry LIMIT $limit
+            """,
+            after=after, limit=batch_size
+        ))
+
+    def write_batch(tx, rows):
+        tx.run(
+            """
+            UNWIND $rows AS row
+            MATCH (p:Protein {entry: row.entry})
+            SET p += row.changes
+            """,
+            rows=rows
+        ).consume()
+
+    stats = {"scanned": 0, "migrated": 0}
+    after = ""
+    while True:
+        records = session.execute_read(read_batch, after)
+        if not records:
+            break
+        after = records[-1]["entry"]
+        stats["scanned"] += len(records)
+        rows = []
+        for record in records:
+            changes = _normalized(record)
+            if changes:
+                rows.append({"entry": record["entry"], "changes": changes})
+        if rows and not dry_run:
+            session.execute_write(write_batch, rows)
+        stats["migrated"] += len(rows)
+        print(f"🔄 {stats['scanned']} nœuds parcourus, {stats['migrated']} à migrer", end="\r")
+    print()
+
+    if not dry_run:
+        session.execute_write(record_schema_version, stats["migrated"])
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migration des propriétés de liste des nœuds Protein")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = sub.add_parser("migrate", help="Convertit les propriétés en listes")
+    migrate_parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Nœuds par transaction")
+    migrate_parser.add_argument("--dry-run", action="store_true", help="Compte sans écrire")
+    status_parser = sub.add_parser("status", help="Version du schéma")
+    for sub_parser in (migrate_parser, status_parser):
+        sub_parser.add_argument("--database", default=None, help="Base Neo4j (par défaut la base active)")
+    args = parser.parse_args()
+
+    database = args.database or datasets.active_neo4j_database(COLLECTION_NAME)
+    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    try:
+        with driver.session(database=database) as session:
+            if args.command == "migrate":
+                before = get_schema_version(session)
+                if before >= SCHEMA_VERSION:
+                    print(f"ℹ️ Base {database} déjà en version {before}, vérification des nœuds quand même")
+                stats = migrate(session, args.batch_size, args.dry_run)
+                verb = "à migrer" if args.dry_run else "migrés"
+                print(f"✅ {stats['migrated']} nœuds {verb} sur {stats['scanned']} (base {database})")
+            print(f"ℹ️ Version du schéma : {get_schema_version(session)} (attendue : {SCHEMA_VERSION})")
+    finally:
+        driver.close()
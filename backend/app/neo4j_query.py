@@ -1,13 +1,32 @@
 from neo4j import GraphDatabase
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 import os
+import threading
+import time
+
+import datasets
 
 uri = os.getenv("NEO4J_URI", "neo4j://127.0.0.1:7687")
 user = os.getenv("NEO4J_USER", "neo4j")
 password = os.getenv("NEO4J_PASSWORD", "NoSQLProject")
-database_name = os.getenv("NEO4J_DATABASE_NAME", "project")
 
 driver = GraphDatabase.driver(uri, auth=(user, password))
 
+# Cache des voisinages : (base, version du graphe, entry, k, m) -> (horodatage, sous-graphe).
+# Toute écriture dans Neo4j change la version du graphe (voir data_version.py) : les
+# voisinages en cache ne sont plus utilisés.
+SUBGRAPH_CACHE_SIZE = 256
+SUBGRAPH_TTL = 300.0
+# Préchargement : peu de requêtes simultanées, file bornée (la base n'est pas saturée)
+PREFETCH_WORKERS = 4
+PREFETCH_MAX_PENDING = 32
+
+_subgraph_cache = OrderedDict()
+_inflight = {}
+_cache_lock = threading.Lock()
+_prefetch_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="subgraph-prefetch")
+
 
 def get_neighbors(entry, limit_k=20, limit_m=10):
     
@@ -84,7 +103,7 @@ def get_neighbors(entry, limit_k=20, limit_m=10):
         # On renvoie le centre avec des listes de voisins vides
         return dict(result["center"]), [], []
 
-    with driver.session(database=database_name) as session:
+    with driver.session(database=datasets.active_neo4j_database()) as session:
         # On tente d'abord la requête complète
         data = session.execute_read(query_full)
         
@@ -115,7 +134,7 @@ def get_edges(entries):
         )
         return [{"source": r["source"], "target": r["target"], "weight": r["weight"]} for r in results]
 
-    with driver.session(database=database_name) as session:
+    with driver.session(database=datasets.active_neo4j_database()) as session:
         return session.execute_read(query)
 
 
@@ -179,6 +198,96 @@ def build_subgraph(entry, k=10, m=3):
     return {"nodes": nodes, "edges": edges}
 
 
+def _cached(key):
+    """Sous-graphe en cache et encore frais, sinon None (appelé sous _cache_lock)"""
+    item = _subgraph_cache.get(key)
+    if item is None:
+        return None
+    if time.monotonic() - item[0] > SUBGRAPH_TTL:
+        del _subgraph_cache[key]
+        return None
+    _subgraph_cache.move_to_end(key)
+    return item
+
+
+def _load(key, future):
+    """
+    Construit le sous-graphe d'une clé, le range dans le cache LRU et publie le
+    résultat dans future, enregistrée dans _inflight par l'appelant
+    """
+    _, _, entry, k, m = key
+    try:
+        subgraph = build_subgraph(entry, k=k, m=m)
+        with _cache_lock:
+            _subgraph_cache[key] = (time.monotonic(), subgraph)
+            _subgraph_cache.move_to_end(key)
+            while len(_subgraph_cache) > SUBGRAPH_CACHE_SIZE:
+                _subgraph_cache.popitem(last=False)
+        future.set_result(subgraph)
+    except Exception as e:
+        future.set_exception(e)
+    finally:
+        with _cache_lock:
+            # Seulement notre chargement : un autre a pu être enregistré depuis
+            if _inflight.get(key) is future:
+                del _inflight[key]
+
+
+def get_subgraph(entry, k=10, m=3):
+    """
+    build_subgraph avec cache LRU (SUBGRAPH_CACHE_SIZE entrées, SUBGRAPH_TTL
+    secondes). Un seul chargement par voisinage à la fois : les appels
+    simultanés (clics ou préchargement) attendent le chargement en cours au
+    lieu d'interroger Neo4j une seconde fois.
+    """
+    database, graph_version = datasets.active_graph()
+    key = (database, graph_version, entry, k, m)
+    with _cache_lock:
+        item = _cached(key)
+        if item is not None:
+            return item[1]
+        future = _inflight.get(key)
+        owner = future is None
+        if owner:
+            future = Future()
+            _inflight[key] = future
+    if owner:
+        _load(key, future)
+    return future.result()
+
+
+def prefetch_subgraphs(entries, k=10, m=3):
+    """
+    Précharge en arrière-plan les voisinages des protéines affichées
+    (PREFETCH_WORKERS requêtes au plus en parallèle). Les voisinages déjà en
+    cache ou en cours de chargement sont ignorés, ainsi que ceux qui
+    dépasseraient PREFETCH_MAX_PENDING chargements en attente.
+
+    Returns:
+        int: nombre de chargements lancés
+    """
+    database, graph_version = datasets.active_graph()
+    scheduled = 0
+    with _cache_lock:
+        for entry in dict.fromkeys(entries):
+            key = (database, graph_version, entry, k, m)
+            if key in _inflight or _cached(key) is not None:
+                continue
+            if len(_inflight) >= PREFETCH_MAX_PENDING:
+                break
+            future = Future()
+            _inflight[key] = future
+            _prefetch_executor.submit(_load, key, future)
+            scheduled += 1
+    return scheduled
+
+
+def clear_subgraph_cache():
+    """Vide le cache des voisinages (après une suppression ou un ajout)"""
+    with _cache_lock:
+        _subgraph_cache.clear()
+
+
 if __name__ == "__main__":
     test_entry = "A0A087X1C5" 
     print(f"--- Lancement pour {test_entry} ---")
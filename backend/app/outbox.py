@@ -0,0 +1,469 @@
+"""
+Boîte d'envoi (outbox) pour la synchronisation MongoDB -> Neo4j.
+
+En mode "outbox", add_protein / delete_protein écrivent dans MongoDB et
+enregistrent une entrée dans la collection annexe "<collection>_outbox" ;
+la réponse n'attend pas Neo4j. Un worker en arrière-plan applique ensuite les
+entrées à Neo4j, par lots, avec reprises.
+
+{
+  "key": "req-42:P12345",        # clé d'idempotence (unique) : un même appel rejoué n'est enregistré qu'une fois
+  "op": "upsert" | "delete",
+  "entry": "P12345",
+  "status": "pending" | "processing" | "done" | "failed",
+  "attempts": 0,
+  "created_at": ..., "next_attempt_at": ..., "processed_at": ...,
+  "last_error": "..."
+}
+
+Le worker ne rejoue pas l'opération enregistrée : il aligne Neo4j sur l'état
+courant de MongoDB (document présent -> nœud et relations mis à jour, absent ->
+nœud supprimé). Le traitement est donc idempotent et insensible à l'ordre :
+une entrée rejouée, en double ou enregistrée juste avant un arrêt brutal ne
+peut pas faire diverger les deux bases.
+
+L'entrée est enregistrée avant l'écriture MongoDB mais retenue (next_attempt_at
+reporté de HOLD_SECONDS) jusqu'à la fin de celle-ci (held_for_active) : le
+worker ne peut pas la traiter sur un état MongoDB pas encore écrit. Après un
+arrêt entre les deux, elle est traitée à l'expiration du délai.
+
+Usage :
+    python backend/app/outbox.py worker
+    python backend/app/outbox.py status
+    python backend/app/outbox.py retry-failed
+"""
+
+from pymongo import MongoClient, UpdateOne, ASCENDING
+from pymongo.errors import BulkWriteError
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+import argparse
+import os
+import socket
+import threading
+import time
+import uuid
+import dotenv
+
+import datasets
+import sequence_store
+
+dotenv.load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI")
+DB_NAME = os.getenv("DB_NAME")
+COLLECTION_NAME = os.getenv("COLLECTION_NAME")
+
+PENDING = "pending"
+PROCESSING = "processing"
+DONE = "done"
+FAILED = "failed"
+
+# Entrées traitées par lot, attente entre deux lots vides
+BATCH_SIZE = 200
+POLL_INTERVAL = 1.0
+# Reprises : délai RETRY_DELAY * 2^(essai - 1), abandon ("failed") après MAX_ATTEMPTS
+MAX_ATTEMPTS = 8
+RETRY_DELAY = 2.0
+# Une entrée "processing" plus ancienne est reprise (worker arrêté en cours de lot)
+LEASE_SECONDS = 300
+# Les entrées traitées sont supprimées automatiquement (index TTL)
+DONE_TTL_SECONDS = 7 * 24 * 3600
+DUPLICATE_KEY = 11000
+# Délai de retenue d'une entrée enregistrée avant son écriture MongoDB
+HOLD_SECONDS = 60
+
+_ensured = set()
+
+
+def _now():
+    # MongoDB renvoie des dates UTC sans fuseau : on reste homogène
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def outbox_collection(collection):
+    """Collection annexe associée à la collection des protéines"""
+    return collection.database[f"{collection.name}_outbox"]
+
+
+def ensure_outbox_indexes(collection):
+    """Clé d'idempotence unique, file d'attente (status, next_attempt_at), TTL des entrées traitées"""
+    outbox = outbox_collection(collection)
+    if outbox.full_name in _ensured:
+        return outbox
+    outbox.create_index("key", unique=True, name="idempotency_key")
+    outbox.create_index([("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt")
+    outbox.create_index("processed_at", expireAfterSeconds=DONE_TTL_SECONDS, name="processed_ttl")
+    _ensured.add(outbox.full_name)
+    return outbox
+
+
+def enqueue(collection, op, entries, key=None, hold_seconds=0):
+    """
+    Enregistre des opérations à appliquer à Neo4j.
+
+    Args:
+        op (str): "upsert" ou "delete"
+        entries (list): identifiants des protéines
+        key (str): clé d'idempotence de l'appel (par défaut : aléatoire)
+        hold_seconds (float): entrées ignorées par le worker pendant ce délai (voir release)
+
+    Returns:
+        int: nombre d'entrées nouvellement enregistrées (les doublons de clé sont ignorés)
+    """
+    outbox = ensure_outbox_indexes(collection)
+    key = key or uuid.uuid4().hex
+    now = _now()
+    docs = [
+        {
+            "key": f"{key}:{entry}",
+            "op": op,
+            "entry": entry,
+            "status": PENDING,
+            "attempts": 0,
+            "created_at": now,
+            "next_attempt_at": now + timedelta(seconds=hold_seconds),
+        }
+        for entry in dict.fromkeys(entries)
+    ]
+    if not docs:
+        return 0
+    try:
+        return len(outbox.insert_many(docs, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        errors = [err for err in e.details.get("writeErrors", []) if err.get("code") != DUPLICATE_KEY]
+        if errors:
+            raise
+        return e.details.get("nInserted", 0)
+
+
+def release(collection, entries, key):
+    """Rend immédiatement traitables les entrées retenues d'un appel"""
+    outbox = outbox_collection(collection)
+    outbox.update_many(
+        {"key": {"$in": [f"{key}:{entry}" for entry in entries]}, "status": PENDING},
+        {"$set": {"next_attempt_at": _now()}}
+    )
+
+
+@contextmanager
+def held_for_active(op, entries, key=None):
+    """
+    Enregistre les entrées sur la version active du jeu de données, retenues
+    pendant le bloc (l'écriture MongoDB), puis libérées à sa sortie.
+
+        with outbox.held_for_active("upsert", entries, key) as queued:
+            add_proteins_to_mongo(...)
+    """
+    key = key or uuid.uuid4().hex
+    client = MongoClient(MONGO_URI)
+    try:
+        collection = datasets.active_collection(client[DB_NAME], COLLECTION_NAME)
+        queued = enqueue(collection, op, entries, key, hold_seconds=HOLD_SECONDS)
+        try:
+            yield queued
+        finally:
+            # Même après un échec MongoDB : le worker aligne Neo4j sur l'état réel
+            release(collection, entries, key)
+    finally:
+        client.close()
+
+
+def _claimable(now):
+    return {"$or": [
+        {"status": PENDING, "next_attempt_at": {"$lte": now}},
+        {"status": PROCESSING, "claimed_at": {"$lt": now - timedelta(seconds=LEASE_SECONDS)}},
+    ]}
+
+
+def claim_batch(outbox, worker_id, batch_size=BATCH_SIZE):
+    """Réserve jusqu'à batch_size entrées pour ce worker (plusieurs workers peuvent tourner)"""
+    now = _now()
+    ids = [
+        doc["_id"]
+        for doc in outbox.find(_claimable(now), {"_id": 1}).sort("next_attempt_at", ASCENDING).limit(batch_size)
+    ]
+    if not ids:
+        return []
+    outbox.update_many(
+        {"_id": {"$in": ids}, **_claimable(now)},
+        {"$set": {"status": PROCESSING, "claimed_by": worker_id, "claimed_at": now}}
+    )
+    return list(outbox.find({"_id": {"$in": ids}, "claimed_by": worker_id, "claimed_at": now}))
+
+
+def _fail(outbox, items, error):
+    now = _now()
+    ops = []
+    for item in items:
+        attempts = item.get("attempts", 0) + 1
+        update = {"attempts": attempts, "last_error": str(error)[:500]}
+        if attempts >= MAX_ATTEMPTS:
+            update["status"] = FAILED
+        else:
+            update["status"] = PENDING
+            update["next_attempt_at"] = now + timedelta(seconds=RETRY_DELAY * 2 ** (attempts - 1))
+        ops.append(UpdateOne(
+            {"_id": item["_id"]},
+            {"$set": update, "$unset": {"claimed_by": "", "claimed_at": ""}}
+        ))
+    outbox.bulk_write(ops, ordered=False)
+
+
+def apply_entries(collection, neo4j_database, entries):
+    """
+    Aligne Neo4j sur MongoDB pour une liste de protéines.
+
+    Returns:
+        tuple: (nombre de nœuds mis à jour, nombre de nœuds supprimés)
+    """
+    from add_protein import add_nodes_to_neo4j, node_from_document
+    from delete_protein import delete_proteins_from_neo4j
+
+    docs = {doc["_id"]: doc for doc in collection.find({"_id": {"$in": entries}})}
+    sequences = sequence_store.get_sequences(collection, list(docs))
+    nodes = [node_from_document(docs[e], sequences.get(e, "")) for e in entries if e in docs]
+    deletes = [e for e in entries if e not in docs]
+    if nodes:
+        add_nodes_to_neo4j(nodes, database=neo4j_database, collection=collection)
+    if deletes:
+        delete_proteins_from_neo4j(deletes, database=neo4j_database, collection=collection)
+    return len(nodes), len(deletes)
+
+
+def process_batch(collection, neo4j_database, worker_id, batch_size=BATCH_SIZE):
+    """
+    Traite un lot d'entrées. Plusieurs entrées d'une même protéine ne donnent
+    lieu qu'à une seule mise à jour.
+
+    Returns:
+        int: nombre d'entrées traitées (0 si la file est vide)
+    """
+    outbox = ensure_outbox_indexes(collection)
+    items = claim_batch(outbox, worker_id, batch_size)
+    if not items:
+        return 0
+
+    entries = list(dict.fromkeys(item["entry"] for item in items))
+    try:
+        apply_entries(collection, neo4j_database, entries)
+    except Exception as e:
+        print(f"❌ Outbox : échec du lot de {len(items)} entrées ({e})")
+        _fail(outbox, items, e)
+        return len(items)
+
+    outbox.update_many(
+        {"_id": {"$in": [item["_id"] for item in items]}, "claimed_by": worker_id},
+        {"$set": {"status": DONE, "processed_at": _now()}, "$unset": {"claimed_by": "", "claimed_at": ""}}
+    )
+    return len(items)
+
+
+def drain(collection, neo4j_database, batch_size=BATCH_SIZE):
+    """
+    Traite la file jusqu'à ce qu'elle soit vide (entrées retenues ou en attente
+    de reprise exceptées), sans worker en arrière-plan : fin d'une synchronisation
+    par lots (mongo_builder.py --mode sync).
+
+    Returns:
+        int: nombre d'entrées traitées
+    """
+    worker_id = f"drain-{socket.gethostname()}-{os.getpid()}"
+    total = 0
+    while True:
+        count = process_batch(collection, neo4j_database, worker_id, batch_size)
+        if count == 0:
+            return total
+        total += count
+        print(f"🔄 Neo4j : {total} entrées appliquées", end="\r")
+
+
+def reconcile(entries, key=None):
+    """
+    Compensation après une écriture double partiellement échouée : aligne
+    immédiatement Neo4j sur MongoDB (source de vérité), ou confie les entrées
+    au worker si Neo4j reste indisponible.
+
+    Returns:
+        str: "reconciled" ou "queued"
+    """
+    client = MongoClient(MONGO_URI)
+    try:
+        dataset = datasets.active_dataset(client[DB_NAME], COLLECTION_NAME)
+        collection = client[DB_NAME][dataset["mongo"]]
+        try:
+            apply_entries(collection, dataset["neo4j"], list(dict.fromkeys(entries)))
+            return "reconciled"
+        except Exception as e:
+            print(f"❌ Compensation immédiate impossible ({e}) : entrées confiées à l'outbox")
+            enqueue(collection, "reconcile", entries, key)
+            return "queued"
+    finally:
+        client.close()
+
+
+# Exécution simultanée des deux moitiés d'une écriture (mode direct)
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="dual-write")
+
+
+def _outcome(call):
+    try:
+        return call(), None
+    except Exception as e:
+        return None, e
+
+
+def dual_write(mongo_call, neo4j_call, entries, concurrent=True, key=None):
+    """
+    Exécute l'écriture MongoDB et l'écriture Neo4j en parallèle (la latence est
+    celle de la plus lente et non plus leur somme). Si l'une échoue, Neo4j est
+    réaligné sur MongoDB (voir reconcile).
+
+    Returns:
+        dict: {"mongodb": (résultat, erreur), "neo4j": (résultat, erreur),
+               "compensation": None, "reconciled" ou "queued"}
+    """
+    if concurrent:
+        futures = [_executor.submit(_outcome, mongo_call), _executor.submit(_outcome, neo4j_call)]
+        mongo, neo4j = (future.result() for future in futures)
+    else:
+        mongo, neo4j = _outcome(mongo_call), _outcome(neo4j_call)
+
+    result = {"mongodb": mongo, "neo4j": neo4j, "compensation": None}
+    if mongo[1] is not None:
+        print(f"❌ Erreur MongoDB: {mongo[1]}")
+    if neo4j[1] is not None:
+        print(f"❌ Erreur Neo4j: {neo4j[1]}")
+    if mongo[1] is not None or neo4j[1] is not None:
+        result["compensation"] = reconcile(entries, key)
+    return result
+
+
+def outbox_metrics(collection, window_seconds=300):
+    """
+    Indicateurs de la file :
+    - backlog : entrées en attente ou en cours
+    - lag_seconds : âge de la plus ancienne entrée non traitée
+    - failed : entrées abandonnées (voir retry_failed)
+    - processed_recent / avg_apply_seconds : débit et délai moyen MongoDB -> Neo4j sur la fenêtre
+
+    Lecture seule : ne crée ni la collection ni ses index.
+    """
+    outbox = outbox_collection(collection)
+    now = _now()
+    counts = {status: outbox.count_documents({"status": status}) for status in (PENDING, PROCESSING, FAILED)}
+    oldest = outbox.find_one(
+        {"status": {"$in": [PENDING, PROCESSING]}}, {"created_at": 1}, sort=[("created_at", ASCENDING)]
+    )
+    recent = list(outbox.aggregate([
+        {"$match": {"processed_at": {"$gte": now - timedelta(seconds=window_seconds)}}},
+        {"$group": {
+            "_id": None,
+            "n": {"$sum": 1},
+            "avg_ms": {"$avg": {"$subtract": ["$processed_at", "$created_at"]}},
+        }}
+    ]))
+    return {
+        "pending": counts[PENDING],
+        "processing": counts[PROCESSING],
+        "failed": counts[FAILED],
+        "backlog": counts[PENDING] + counts[PROCESSING],
+        "lag_seconds": (now - oldest["created_at"]).total_seconds() if oldest else 0.0,
+        "processed_recent": recent[0]["n"] if recent else 0,
+        "avg_apply_seconds": (recent[0]["avg_ms"] or 0) / 1000 if recent else 0.0,
+        "window_seconds": window_seconds,
+    }
+
+
+def retry_failed(collection):
+    """Remet en file les entrées abandonnées"""
+    result = outbox_collection(collection).update_many(
+        {"status": FAILED},
+        {"$set": {"status": PENDING, "attempts": 0, "next_attempt_at": _now()}}
+    )
+    return result.modified_count
+
+
+class OutboxWorker(threading.Thread):
+    """
+    Worker d'arrière-plan : applique la file à Neo4j tant que stop() n'est pas
+    appelé. Suit la version active du jeu de données (voir datasets.py).
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, poll_interval=POLL_INTERVAL):
+        super().__init__(daemon=True, name="outbox-worker")
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.processed = 0
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        client = MongoClient(MONGO_URI)
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    dataset = datasets.resolve(client[DB_NAME], COLLECTION_NAME)
+                    collection = client[DB_NAME][dataset["mongo"]]
+                    count = process_batch(collection, dataset["neo4j"], self.worker_id, self.batch_size)
+                except Exception as e:
+                    print(f"❌ Outbox : {e}")
+                    count = 0
+                self.processed += count
+                if count == 0:
+                    self._stop_event.wait(self.poll_interval)
+        finally:
+            client.close()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def start_worker():
+    """Démarre (une seule fois par processus) le worker en arrière-plan"""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = OutboxWorker()
+            _worker.start()
+    return _worker
+
+
+def _print_metrics(metrics):
+    print(
+        f"📬 backlog {metrics['backlog']} (en attente {metrics['pending']}, en cours {metrics['processing']}) | "
+        f"retard {metrics['lag_seconds']:.1f} s | abandonnées {metrics['failed']} | "
+        f"{metrics['processed_recent']} traitées en {metrics['window_seconds']} s "
+        f"(délai moyen {metrics['avg_apply_seconds']:.2f} s)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synchronisation MongoDB -> Neo4j (outbox)")
+    parser.add_argument("command", choices=["worker", "status", "retry-failed"])
+    args = parser.parse_args()
+
+    client = MongoClient(MONGO_URI)
+    collection = datasets.active_collection(client[DB_NAME], COLLECTION_NAME)
+    try:
+        if args.command == "worker":
+            worker = OutboxWorker()
+            worker.start()
+            print(f"🔄 Worker {worker.worker_id} démarré (Ctrl+C pour arrêter)")
+            try:
+                while worker.is_alive():
+                    time.sleep(30)
+                    _print_metrics(outbox_metrics(collection))
+            except KeyboardInterrupt:
+                worker.stop()
+                worker.join()
+        elif args.command == "retry-failed":
+            print(f"🔄 {retry_failed(collection)} entrées remises en file")
+        _print_metrics(outbox_metrics(collection))
+    finally:
+        client.close()
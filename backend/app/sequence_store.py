@@ -0,0 +1,158 @@
+"""
+Stockage des séquences hors des documents protéines.
+Collection annexe "<collection>_sequences" (compression zstd côté WiredTiger) :
+
+{ "_id": "O14756", "sequence": "MWLY..." }
+
+Les documents protéines ne gardent que sequence_length : ils sont plus petits,
+tiennent mieux en cache et chaque lecture d'index ramène moins de données.
+La séquence n'est lue que pour la recherche de motif, le détail d'une protéine
+ou l'export FASTA.
+
+Migration d'une base existante (avec mesure avant/après) :
+    python backend/app/sequence_store.py
+"""
+
+from pymongo import MongoClient, ReplaceOne
+import os
+import dotenv
+
+dotenv.load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI")
+DB_NAME = os.getenv("DB_NAME")
+COLLECTION_NAME = os.getenv("COLLECTION_NAME")
+
+# Au-delà, un motif est trop peu sélectif pour être traduit en liste d'identifiants
+MAX_SEQUENCE_MATCHES = 100_000
+
+
+def sequence_collection(collection):
+    """Collection annexe associée à la collection des protéines"""
+    return collection.database[f"{collection.name}_sequences"]
+
+
+def ensure_sequence_collection(collection):
+    """Crée la collection annexe avec compression zstd si elle n'existe pas"""
+    db = collection.database
+    name = f"{collection.name}_sequences"
+    if name not in db.list_collection_names():
+        db.create_collection(
+            name,
+            storageEngine={"wiredTiger": {"configString": "block_compressor=zstd"}}
+        )
+    return db[name]
+
+
+def split_sequence(doc):
+    """Retire la séquence d'un document protéine et renvoie le document annexe"""
+    sequence = doc.pop("sequence", "")
+    return {"_id": doc["_id"], "sequence": sequence if isinstance(sequence, str) else ""}
+
+
+def store_sequences(collection, sequence_docs):
+    """Écrit (ou remplace) des séquences : [{"_id": ..., "sequence": ...}, ...]"""
+    ops = [ReplaceOne({"_id": d["_id"]}, d, upsert=True) for d in sequence_docs]
+    if ops:
+        sequence_collection(collection).bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+def get_sequences(collection, entries):
+    """Renvoie {entry: sequence} pour une liste d'identifiants"""
+    cursor = sequence_collection(collection).find({"_id": {"$in": list(entries)}})
+    return {doc["_id"]: doc.get("sequence", "") for doc in cursor}
+
+
+def delete_sequences(collection, entries):
+    """Supprime des séquences et renvoie {entry: sequence} des séquences supprimées"""
+    sequences = get_sequences(collection, entries)
+    if sequences:
+        sequence_collection(collection).delete_many({"_id": {"$in": list(sequences)}})
+    return sequences
+
+
+def matching_entries(collection, pattern, candidates=None):
+    """
+    Identifiants dont la séquence contient le motif (vérification exacte).
+
+    Args:
+        candidates (set): pré-filtrage éventuel par l'index de k-mers
+
+    Raises:
+        ValueError: si le motif correspond à trop de protéines
+    """
+    query = {"sequence": {"$regex": pattern, "$options": "i"}}
+    if candidates is not None:
+        query["_id"] = {"$in": sorted(candidates)}
+    cursor = sequence_collection(collection).find(query, {"_id": 1}).limit(MAX_SEQUENCE_MATCHES + 1)
+    entries = [doc["_id"] for doc in cursor]
+    if len(entries) > MAX_SEQUENCE_MATCHES:
+        raise ValueError(
+            f"Sous-séquence '{pattern}' trop fréquente (plus de {MAX_SEQUENCE_MATCHES} protéines), "
+            "précisez le motif ou ajoutez des filtres plus sélectifs."
+        )
+    return entries
+
+
+def measure_footprint(collection):
+    """Taille des documents et de la collection (protéines + séquences)"""
+    db = collection.database
+    footprint = {}
+    for name in (collection.name, f"{collection.name}_sequences"):
+        if name not in db.list_collection_names():
+            continue
+        stats = db.command("collStats", name)
+        footprint[name] = {
+            "count": stats.get("count", 0),
+            "avg_doc_bytes": stats.get("avgObjSize", 0),
+            "data_bytes": stats.get("size", 0),
+            "storage_bytes": stats.get("storageSize", 0),
+            "index_bytes": stats.get("totalIndexSize", 0),
+        }
+    return footprint
+
+
+def split_existing_sequences(collection):
+    """
+    Migration : copie les séquences des documents protéines vers la collection
+    annexe ($merge côté serveur), puis les retire des documents protéines.
+    """
+    ensure_sequence_collection(collection)
+    collection.aggregate([
+        {"$match": {"sequence": {"$exists": True}}},
+        {"$project": {"sequence": 1}},
+        {"$merge": {
+            "into": f"{collection.name}_sequences",
+            "whenMatched": "replace",
+            "whenNotMatched": "insert"
+        }}
+    ])
+    result = collection.update_many({"sequence": {"$exists": True}}, {"$unset": {"sequence": ""}})
+    print(f"✅ {result.modified_count} séquences déplacées vers {collection.name}_sequences")
+    return result.modified_count
+
+
+def _print_footprint(title, footprint):
+    print(f"\n📏 {title}")
+    for name, stats in footprint.items():
+        print(
+            f"  {name}: {stats['count']} docs, {stats['avg_doc_bytes']} o/doc, "
+            f"données {stats['data_bytes'] / 1e6:.1f} Mo, disque {stats['storage_bytes'] / 1e6:.1f} Mo, "
+            f"index {stats['index_bytes'] / 1e6:.1f} Mo"
+        )
+
+
+if __name__ == "__main__":
+    import datasets
+
+    client = MongoClient(MONGO_URI)
+    collection = datasets.active_collection(client[DB_NAME], COLLECTION_NAME)
+
+    _print_footprint("Avant migration", measure_footprint(collection))
+    split_existing_sequences(collection)
+    # compact rend l'espace libéré au cache et au disque
+    client[DB_NAME].command("compact", collection.name)
+    _print_footprint("Après migration", measure_footprint(collection))
+
+    client.close()
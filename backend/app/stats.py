@@ -1,6 +1,46 @@
+import json
+import math
 import os
+import threading
+import time
+from collections import Counter
 from typing import Dict, Optional
+import numpy as np
 import pandas as pd
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+from neo4j import GraphDatabase, Query
+from neo4j.exceptions import Neo4jError, DriverError
+import dotenv
+
+import datasets
+import stats_store
+from data_version import get_data_version
+
+dotenv.load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI")
+DB_NAME = os.getenv("DB_NAME")
+COLLECTION_NAME = os.getenv("COLLECTION_NAME")
+
+NEO4J_URI = os.getenv("NEO4J_URI", "neo4j://127.0.0.1:7687")
+NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "NoSQLProject")
+
+# "database" : MongoDB + Neo4j (aucun fichier requis) ; "csv" : nodes.csv / edges.csv
+STATS_BACKEND = os.getenv("STATS_BACKEND", "database")
+# Durée maximale de chaque requête du backend "database"
+STATS_TIMEOUT_MS = int(os.getenv("STATS_TIMEOUT_MS", "5000"))
+
+# Lignes lues par morceau : la mémoire ne dépend pas de la taille des CSV
+CHUNK_SIZE = 200_000
+TOP_N = 20
+WEIGHT_BINS = 20
+CACHE_FILE = "stats_cache.json"
+# Lecture en flux des statistiques détaillées (parcours complets, calcul hors page)
+GRAPH_STATS_TIMEOUT_MS = int(os.getenv("GRAPH_STATS_TIMEOUT_MS", "300000"))
+
+EC_CLASSES = ("1", "2", "3", "4", "5", "6", "7")
 
 
 def _find_data_dir() -> str:
@@ -51,12 +91,116 @@ def _load_nodes_edges(
     return nodes, edges
 
 
+def _with_ratios(total: int, labelled: int, isolated: int) -> Dict[str, float]:
+    return {
+        "total_proteins": total,
+        "labelled_proteins": labelled,
+        "unlabelled_proteins": total - labelled,
+        "isolated_proteins": isolated,
+        "labelled_ratio": (labelled / total * 100.0) if total else 0.0,
+        "isolated_ratio": (isolated / total * 100.0) if total else 0.0,
+    }
+
+
+# Dernier résultat obtenu (repli si les bases ne répondent pas), en mémoire et
+# dans data/processed pour survivre à un redémarrage
+_last_database_stats: Dict[str, Dict] = {}
+SNAPSHOT_FILE = "protein_stats_snapshot.json"
+
+
+def _snapshot_path() -> Optional[str]:
+    try:
+        return os.path.join(_find_data_dir(), SNAPSHOT_FILE)
+    except FileNotFoundError:
+        return None
+
+
+def _save_snapshot(alias: str, stats: Dict) -> None:
+    _last_database_stats[alias] = stats
+    path = _snapshot_path()
+    if path is None:
+        return
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"alias": alias, "stats": stats, "saved_at": time.time()}, f, default=str)
+    except OSError as e:
+        print(f"⚠️ Instantané des statistiques non enregistré : {e}")
+
+
+def _load_snapshot(alias: str) -> Optional[Dict]:
+    if alias in _last_database_stats:
+        return _last_database_stats[alias]
+    path = _snapshot_path()
+    if path is None or not os.path.isfile(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return snapshot["stats"] if snapshot.get("alias") == alias else None
+
+
+# Un seul recalcul complet à la fois quand les compteurs n'existent pas encore
+_recompute_lock = threading.Lock()
+
+
+def compute_protein_stats_from_database(timeout_ms: int = STATS_TIMEOUT_MS) -> Dict[str, float]:
+    """
+    Mêmes chiffres que compute_protein_stats, pour la version active (voir
+    datasets.py), sans lire de fichier :
+      1. compteurs maintenus par stats_store (une lecture) ;
+      2. s'ils n'ont jamais été calculés : stats_store.recompute, une seule fois
+         (les appels simultanés attendent le premier), puis lecture des compteurs
+         enregistrés. Les appels suivants retombent sur le cas 1.
+
+    Si les bases ne répondent pas (timeout_ms pour joindre MongoDB), on renvoie
+    le dernier résultat connu localement (mémoire, puis fichier), sans nouvelle
+    requête ("source" indique l'origine, "stale" un repli).
+    """
+    alias = COLLECTION_NAME
+    client = None
+    try:
+        client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=timeout_ms)
+        db = client[DB_NAME]
+        dataset = datasets.active_dataset(db, alias)
+        collection = db[dataset["mongo"]]
+
+        source = "counters"
+        counters = stats_store.get_stats(collection)
+        if counters is None:
+            with _recompute_lock:
+                # Un autre appel a pu recalculer pendant l'attente du verrou
+                counters = stats_store.get_stats(collection)
+                if counters is None:
+                    stats_store.recompute(collection, dataset["neo4j"])
+                    counters = stats_store.get_stats(collection)
+                    source = "recomputed"
+    except (PyMongoError, Neo4jError, DriverError, OSError) as e:
+        print(f"❌ Statistiques indisponibles ({e}) : repli sur les dernières valeurs connues")
+        cached = _load_snapshot(alias)
+        if cached is None:
+            raise
+        return {**cached, "stale": True}
+    finally:
+        if client is not None:
+            client.close()
+
+    result = {**counters, "source": source, "stale": False}
+    _save_snapshot(alias, result)
+    return result
+
+
 def compute_protein_stats(
     nodes_csv_path: Optional[str] = None,
     edges_csv_path: Optional[str] = None,
+    backend: Optional[str] = None,
 ) -> Dict[str, float]:
     """
-    Calcule des statistiques globales à partir de nodes.csv et edges.csv.
+    Calcule des statistiques globales à partir de nodes.csv et edges.csv, ou
+    directement depuis MongoDB et Neo4j (backend "database", par défaut
+    STATS_BACKEND, voir compute_protein_stats_from_database). Les chemins de
+    CSV explicites imposent le backend "csv".
 
     Renvoie un dict avec :
       - total_proteins
@@ -66,6 +210,12 @@ def compute_protein_stats(
       - labelled_ratio       (labelled / total)
       - isolated_ratio       (isolated / total)
     """
+    backend = backend or ("csv" if nodes_csv_path or edges_csv_path else STATS_BACKEND)
+    if backend == "database":
+        return compute_protein_stats_from_database()
+    if backend != "csv":
+        raise ValueError(f"Backend de statistiques inconnu : {backend}")
+
     nodes, edges = _load_nodes_edges(nodes_csv_path, edges_csv_path)
 
     if "Entry" not in nodes.columns:
@@ -83,7 +233,6 @@ def compute_protein_stats(
 
     total_proteins = int(len(nodes))
     labelled_proteins = int(labelled_mask.sum())
-    unlabelled_proteins = int(total_proteins - labelled_proteins)
 
     if len(edges) == 0:
         isolated_proteins = total_proteins
@@ -96,21 +245,417 @@ def compute_protein_stats(
         isolated_mask = ~nodes["Entry"].astype(str).isin(connected_entries)
         isolated_proteins = int(isolated_mask.sum())
 
-    labelled_ratio = (labelled_proteins / total_proteins * 100.0) if total_proteins else 0.0
-    isolated_ratio = (isolated_proteins / total_proteins * 100.0) if total_proteins else 0.0
+    return {**_with_ratios(total_proteins, labelled_proteins, isolated_proteins), "source": "csv"}
+
+
+class QuantileSketch:
+    """
+    Esquisse de quantiles à buckets logarithmiques : chaque valeur est rangée
+    dans le bucket ceil(log(x) / log(gamma)). Erreur relative bornée par
+    relative_accuracy, mémoire proportionnelle au nombre de buckets (quelques
+    centaines), quel que soit le nombre de valeurs.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets: Counter = Counter()
+        self.zeros = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add_many(self, values) -> None:
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        positive = values[values > 0]
+        self.zeros += len(values) - len(positive)
+        indexes, counts = np.unique(np.ceil(np.log(positive) / self.log_gamma).astype(int), return_counts=True)
+        self.buckets.update(dict(zip(indexes.tolist(), counts.tolist())))
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                # Milieu du bucket (en relatif), borné par les extrêmes observés
+                value = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def summary(self, quantiles=(0.05, 0.25, 0.5, 0.75, 0.95, 0.99)) -> Dict[str, float]:
+        result = {f"p{round(q * 100)}": self.quantile(q) for q in quantiles}
+        result.update(
+            mean=self.total / self.count if self.count else 0.0,
+            min=self.min if self.count else 0.0,
+            max=self.max if self.count else 0.0,
+        )
+        return result
+
+
+def _top(counter: Counter, n: int = TOP_N) -> list:
+    return [[key, int(count)] for key, count in counter.most_common(n)]
+
+
+def _degree_histogram(degrees: np.ndarray) -> list:
+    """Distribution des degrés par puissances de 2 : 0, 1, 2-3, 4-7, 8-15..."""
+    histogram = [{"bucket": "0", "count": int((degrees == 0).sum())}]
+    positive = degrees[degrees > 0]
+    if len(positive):
+        exponents = np.floor(np.log2(positive)).astype(int)
+        for exponent, count in zip(*np.unique(exponents, return_counts=True)):
+            low, high = 2 ** int(exponent), 2 ** (int(exponent) + 1) - 1
+            label = str(low) if low == high else f"{low}-{high}"
+            histogram.append({"bucket": label, "count": int(count)})
+    return histogram
+
+
+def compute_graph_stats(
+    nodes_csv_path: Optional[str] = None,
+    edges_csv_path: Optional[str] = None,
+    chunksize: int = CHUNK_SIZE,
+) -> Dict:
+    """
+    Statistiques détaillées en une seule lecture par morceaux de nodes.csv puis
+    edges.csv (mémoire bornée : un morceau, un compteur de degré par protéine,
+    des compteurs par domaine / organisme et des esquisses de quantiles).
+
+    Renvoie un dict avec :
+      - total_proteins, total_edges
+      - degree           (histogramme par puissances de 2, moyenne, quantiles, isolées)
+      - weight           (histogramme des poids Jaccard sur [0, 1], quantiles approchés)
+      - ec_classes       (protéines par classe EC 1 à 7)
+      - top_interpro, top_organisms (+ nombre de valeurs distinctes)
+      - sequence_length  (quantiles approchés, moyenne, min, max)
+    """
+    data_dir = _find_data_dir() if nodes_csv_path is None or edges_csv_path is None else None
+    nodes_csv_path = nodes_csv_path or os.path.join(data_dir, "nodes.csv")
+    edges_csv_path = edges_csv_path or os.path.join(data_dir, "edges.csv")
+
+    # 1. Nœuds : longueurs, classes EC, domaines, organismes
+    entries = []
+    lengths = QuantileSketch()
+    ec_classes: Counter = Counter()
+    interpro: Counter = Counter()
+    organisms: Counter = Counter()
+    wanted = {"Entry", "Organism", "Sequence", "EC_numbers", "InterPro_list"}
+    for chunk in pd.read_csv(nodes_csv_path, usecols=lambda c: c in wanted, dtype=str, chunksize=chunksize):
+        chunk = chunk.fillna("")
+        entries.append(chunk["Entry"].to_numpy())
+        if "Sequence" in chunk:
+            lengths.add_many(chunk["Sequence"].str.len().to_numpy())
+        if "EC_numbers" in chunk:
+            # Premier nombre de chaque numéro EC, compté une fois par protéine
+            classes = chunk["EC_numbers"].str.findall(r"(?<![\d.])(\d)\.").explode().dropna()
+            classes = classes.reset_index().drop_duplicates()["EC_numbers"]
+            ec_classes.update(classes.value_counts().to_dict())
+        if "InterPro_list" in chunk:
+            interpro.update(chunk["InterPro_list"].str.findall(r"IPR\d+").explode().dropna().value_counts().to_dict())
+        if "Organism" in chunk:
+            organisms.update(chunk["Organism"][chunk["Organism"] != ""].value_counts().to_dict())
 
+    # get_indexer exige un index sans doublon
+    index = pd.Index(np.concatenate(entries) if entries else np.array([], dtype=object)).drop_duplicates()
+    degrees = np.zeros(len(index), dtype=np.int64)
+
+    # 2. Arêtes : degrés et poids
+    total_edges = 0
+    weight_counts = np.zeros(WEIGHT_BINS, dtype=np.int64)
+    weights = QuantileSketch()
+    for chunk in pd.read_csv(edges_csv_path, usecols=["Source", "Target", "Weight"],
+                             dtype={"Source": str, "Target": str}, chunksize=chunksize):
+        total_edges += len(chunk)
+        for column in ("Source", "Target"):
+            positions = index.get_indexer(chunk[column])
+            np.add.at(degrees, positions[positions >= 0], 1)
+        weight = chunk["Weight"].to_numpy(dtype=float)
+        weight_counts += np.histogram(weight, bins=WEIGHT_BINS, range=(0.0, 1.0))[0]
+        weights.add_many(weight)
+
+    bin_edges = np.linspace(0.0, 1.0, WEIGHT_BINS + 1)
     return {
-        "total_proteins": total_proteins,
-        "labelled_proteins": labelled_proteins,
-        "unlabelled_proteins": unlabelled_proteins,
-        "isolated_proteins": isolated_proteins,
-        "labelled_ratio": labelled_ratio,
-        "isolated_ratio": isolated_ratio,
+        "total_proteins": int(len(index)),
+        "total_edges": int(total_edges),
+        "degree": {
+            "histogram": _degree_histogram(degrees),
+            "isolated": int((degrees == 0).sum()),
+            "mean": float(degrees.mean()) if len(degrees) else 0.0,
+            "p50": float(np.percentile(degrees, 50)) if len(degrees) else 0.0,
+            "p90": float(np.percentile(degrees, 90)) if len(degrees) else 0.0,
+            "p99": float(np.percentile(degrees, 99)) if len(degrees) else 0.0,
+            "max": int(degrees.max()) if len(degrees) else 0,
+        },
+        "weight": {
+            "histogram": [
+                {"bin_start": float(bin_edges[i]), "bin_end": float(bin_edges[i + 1]), "count": int(c)}
+                for i, c in enumerate(weight_counts)
+            ],
+            **weights.summary(quantiles=(0.1, 0.5, 0.9)),
+        },
+        "ec_classes": {k: int(ec_classes.get(k, 0)) for k in EC_CLASSES},
+        "top_interpro": _top(interpro),
+        "interpro_distinct": len(interpro),
+        "top_organisms": _top(organisms),
+        "organisms_distinct": len(organisms),
+        "sequence_length": lengths.summary(),
     }
 
 
+def _counted_quantile(pairs, q: float) -> float:
+    """Quantile d'une distribution donnée par des couples (valeur, effectif) triés"""
+    total = sum(n for _, n in pairs)
+    if not total:
+        return 0.0
+    rank = q * (total - 1)
+    seen = 0
+    for value, n in pairs:
+        seen += n
+        if rank < seen:
+            return float(value)
+    return float(pairs[-1][0])
+
+
+def compute_graph_stats_from_database(chunksize: int = CHUNK_SIZE, timeout_ms: int = GRAPH_STATS_TIMEOUT_MS) -> Dict:
+    """
+    Mêmes statistiques que compute_graph_stats, pour la version active (voir
+    datasets.py), en une seule lecture en flux de chaque base, sans fichier :
+      1. MongoDB : un curseur sur les protéines (organisme, longueur, annotations)
+         alimente les compteurs EC / InterPro / organismes et l'esquisse des longueurs ;
+      2. Neo4j   : une requête renvoie, nœud par nœud, le degré et les poids des
+         relations sortantes (chaque relation une fois), qui alimentent le compteur
+         de degrés, l'histogramme et l'esquisse des poids.
+    Les valeurs sont traitées par morceaux de chunksize : la mémoire est bornée
+    par un morceau, les compteurs et les esquisses, comme pour les CSV.
+    """
+    lengths = QuantileSketch()
+    ec_classes: Counter = Counter()
+    interpro: Counter = Counter()
+    organisms: Counter = Counter()
+
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=STATS_TIMEOUT_MS)
+    try:
+        dataset = datasets.active_dataset(client[DB_NAME], COLLECTION_NAME)
+        cursor = client[DB_NAME][dataset["mongo"]].find(
+            {}, {"_id": 0, "organism": 1, "sequence_length": 1, "annotations": 1},
+            max_time_ms=timeout_ms
+        ).batch_size(10_000)
+        buffer = []
+        for doc in cursor:
+            if isinstance(doc.get("sequence_length"), (int, float)):
+                buffer.append(doc["sequence_length"])
+            annotations = doc.get("annotations") or {}
+            # Premier nombre de chaque numéro EC, compté une fois par protéine
+            ec_classes.update({ec.split(".")[0] for ec in annotations.get("ec_numbers") or []})
+            interpro.update(annotations.get("interpro") or [])
+            if doc.get("organism"):
+                organisms[doc["organism"]] += 1
+            if len(buffer) >= chunksize:
+                lengths.add_many(buffer)
+                buffer = []
+        lengths.add_many(buffer)
+    finally:
+        client.close()
+
+    degrees: Counter = Counter()
+    total_edges = 0
+    weight_counts = np.zeros(WEIGHT_BINS, dtype=np.int64)
+    weights = QuantileSketch()
+
+    def flush(buffer):
+        weight = np.asarray(buffer, dtype=float)
+        weight_counts[:] += np.histogram(weight, bins=WEIGHT_BINS, range=(0.0, 1.0))[0]
+        weights.add_many(weight)
+
+    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    try:
+        with driver.session(database=dataset["neo4j"]) as session:
+            buffer = []
+            for record in session.run(Query(
+                """
+                MATCH (p:Protein)
+                RETURN size([(p)-[:SIMILAR]-() | 1]) AS degree,
+                       [(p)-[r:SIMILAR]->() WHERE r.weight IS NOT NULL | r.weight] AS weights
+                """,
+                timeout=timeout_ms / 1000
+            )):
+                degrees[record["degree"]] += 1
+                buffer.extend(record["weights"])
+                if len(buffer) >= chunksize:
+                    total_edges += len(buffer)
+                    flush(buffer)
+                    buffer = []
+            total_edges += len(buffer)
+            flush(buffer)
+    finally:
+        driver.close()
+
+    # Histogramme des degrés par puissances de 2, comme compute_graph_stats
+    pairs = sorted(degrees.items())
+    histogram = {}
+    for degree, proteins in pairs:
+        if degree == 0:
+            label = "0"
+        else:
+            low = 2 ** int(math.log2(degree))
+            label = str(low) if low == 1 else f"{low}-{2 * low - 1}"
+        histogram[label] = histogram.get(label, 0) + proteins
+    total_proteins = sum(degrees.values())
+
+    bin_edges = np.linspace(0.0, 1.0, WEIGHT_BINS + 1)
+    return {
+        "total_proteins": int(total_proteins),
+        "total_edges": int(total_edges),
+        "degree": {
+            "histogram": [{"bucket": label, "count": int(count)} for label, count in histogram.items()],
+            "isolated": int(degrees.get(0, 0)),
+            "mean": sum(d * n for d, n in pairs) / total_proteins if total_proteins else 0.0,
+            "p50": _counted_quantile(pairs, 0.5),
+            "p90": _counted_quantile(pairs, 0.9),
+            "p99": _counted_quantile(pairs, 0.99),
+            "max": int(pairs[-1][0]) if pairs else 0,
+        },
+        "weight": {
+            "histogram": [
+                {"bin_start": float(bin_edges[i]), "bin_end": float(bin_edges[i + 1]), "count": int(c)}
+                for i, c in enumerate(weight_counts)
+            ],
+            **weights.summary(quantiles=(0.1, 0.5, 0.9)),
+        },
+        "ec_classes": {k: int(ec_classes.get(k, 0)) for k in EC_CLASSES},
+        "top_interpro": _top(interpro),
+        "interpro_distinct": len(interpro),
+        "top_organisms": _top(organisms),
+        "organisms_distinct": len(organisms),
+        "sequence_length": lengths.summary(),
+    }
+
+
+def _file_signature(path: str) -> list:
+    stat = os.stat(path)
+    return [os.path.abspath(path), stat.st_size, int(stat.st_mtime)]
+
+
+def _database_signature() -> list:
+    """Version active et version de ses données (une lecture de meta)"""
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=STATS_TIMEOUT_MS)
+    try:
+        dataset = datasets.active_dataset(client[DB_NAME], COLLECTION_NAME)
+        collection = client[DB_NAME][dataset["mongo"]]
+        return ["database", dataset["mongo"], dataset["neo4j"], get_data_version(collection)]
+    finally:
+        client.close()
+
+
+# Cache en mémoire si data/processed n'existe pas (serveur sans fichiers de données)
+_graph_stats_cache: Dict[str, Dict] = {}
+
+
+def _cache_path() -> Optional[str]:
+    try:
+        return os.path.join(_find_data_dir(), CACHE_FILE)
+    except FileNotFoundError:
+        return None
+
+
+def _read_graph_cache() -> Optional[Dict]:
+    path = _cache_path()
+    if path is None or not os.path.isfile(path):
+        return _graph_stats_cache.get("cached")
+    try:
+        with open(path, encoding="utf-8") as f:
+            cached = json.load(f)
+        return cached if "stats" in cached else None
+    except (OSError, ValueError):
+        return None
+
+
+def _write_graph_cache(cached: Dict) -> None:
+    _graph_stats_cache["cached"] = cached
+    path = _cache_path()
+    if path is None:
+        return
+    # Écriture atomique : un lecteur concurrent ne voit jamais un fichier partiel
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cached, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"⚠️ Cache des statistiques détaillées non enregistré : {e}")
+
+
+def get_graph_stats(
+    nodes_csv_path: Optional[str] = None,
+    edges_csv_path: Optional[str] = None,
+    refresh: bool = False,
+    build: bool = True,
+    backend: Optional[str] = None,
+) -> Optional[Dict]:
+    """
+    Statistiques détaillées avec cache JSON (data/processed/stats_cache.json,
+    ou en mémoire sans dossier de données), calculées depuis MongoDB et Neo4j
+    (backend "database", par défaut STATS_BACKEND) ou depuis nodes.csv /
+    edges.csv (backend "csv", imposé par des chemins explicites).
+
+    Le cache est valide tant que la version active et sa data_version (ou la
+    taille et la date des CSV) n'ont pas changé. Avec build=False (affichage),
+    rien n'est calculé : le cache est renvoyé même périmé ("stale": True), ou
+    None s'il n'existe pas.
+    """
+    backend = backend or ("csv" if nodes_csv_path or edges_csv_path else STATS_BACKEND)
+    cached = None if refresh else _read_graph_cache()
+    try:
+        if backend == "database":
+            signature = _database_signature()
+        elif backend == "csv":
+            data_dir = _find_data_dir() if nodes_csv_path is None or edges_csv_path is None else None
+            nodes_csv_path = nodes_csv_path or os.path.join(data_dir, "nodes.csv")
+            edges_csv_path = edges_csv_path or os.path.join(data_dir, "edges.csv")
+            signature = [_file_signature(nodes_csv_path), _file_signature(edges_csv_path)]
+        else:
+            raise ValueError(f"Backend de statistiques inconnu : {backend}")
+    except (PyMongoError, OSError) as e:
+        # Bases injoignables ou CSV absents : dernier calcul connu, s'il existe
+        if cached is None and build:
+            raise
+        print(f"⚠️ Statistiques détaillées non vérifiables ({e}) : dernier calcul conservé")
+        return {**cached["stats"], "stale": True} if cached else None
+
+    if cached is not None and cached.get("signature") == signature:
+        return {**cached["stats"], "stale": False}
+    if not build:
+        return {**cached["stats"], "stale": True} if cached else None
+
+    start = time.perf_counter()
+    if backend == "database":
+        stats = compute_graph_stats_from_database()
+    else:
+        stats = compute_graph_stats(nodes_csv_path, edges_csv_path)
+    stats["source"] = backend
+    stats["computed_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    stats["compute_seconds"] = round(time.perf_counter() - start, 1)
+    _write_graph_cache({"signature": signature, "stats": stats})
+    return {**stats, "stale": False}
+
+
 if __name__ == "__main__":
     stats = compute_protein_stats()
     print("=== Protein statistics ===")
     for k, v in stats.items():
         print(f"{k}: {v}")
+
+    graph_stats = get_graph_stats(refresh=True)
+    print("=== Graph statistics ===")
+    print(json.dumps(graph_stats, indent=2, ensure_ascii=False))
@@ -0,0 +1,164 @@
+"""
+Statistiques globales maintenues au fil des écritures, stockées dans la
+collection "meta" (un document par collection physique, voir datasets.py) :
+
+{
+  "_id": "stats:proteins__v3",
+  "total_proteins": 570000,
+  "labelled_proteins": 270000,      # au moins un numéro EC
+  "isolated_proteins": 41000,       # aucune relation SIMILAR dans Neo4j
+  "similar_edges": 12000000,
+  "recomputed_at": ..., "updated_at": ...
+}
+
+Chaque ajout ou suppression applique un $inc (une écriture, quelle que soit la
+taille de la base) :
+  - côté MongoDB (add_proteins_to_mongo / delete_proteins_from_mongo) : total et labellisées ;
+  - côté Neo4j (add_nodes_to_neo4j / delete_proteins_from_neo4j) : isolées et relations,
+    d'après le degré des seuls nœuds touchés (lu en O(1) par Neo4j) ; les suppressions
+    le lisent dans leurs propres requêtes, sans comptage avant et après.
+
+Deux écritures simultanées sur les mêmes protéines peuvent décaler les
+compteurs : recompute() les recalcule entièrement (réparation).
+
+Usage :
+    python backend/app/stats_store.py show
+    python backend/app/stats_store.py recompute
+"""
+
+from pymongo import MongoClient
+from neo4j import GraphDatabase
+from datetime import datetime, timezone
+import argparse
+import os
+import dotenv
+
+from data_version import META_COLLECTION
+import datasets
+
+dotenv.load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI")
+DB_NAME = os.getenv("DB_NAME")
+COLLECTION_NAME = os.getenv("COLLECTION_NAME")
+
+NEO4J_URI = os.getenv("NEO4J_URI", "neo4j://127.0.0.1:7687")
+NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "NoSQLProject")
+
+COUNTERS = ("total_proteins", "labelled_proteins", "isolated_proteins", "similar_edges")
+# Document labellisé : au moins un numéro EC
+LABELLED_FILTER = {"annotations.ec_numbers.0": {"$exists": True}}
+
+
+def _stats_id(collection):
+    return f"stats:{collection.name}"
+
+
+def increment(collection, **deltas):
+    """Applique des variations aux compteurs (un seul $inc)"""
+    deltas = {k: int(v) for k, v in deltas.items() if v}
+    if not deltas:
+        return
+    collection.database[META_COLLECTION].update_one(
+        {"_id": _stats_id(collection)},
+        {"$inc": deltas, "$set": {"updated_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+
+
+def labelled_entries(collection, entries):
+    """Parmi entries, celles dont le document actuel est labellisé"""
+    return {doc["_id"] for doc in collection.find({"_id": {"$in": list(entries)}, **LABELLED_FILTER}, {"_id": 1})}
+
+
+def count_isolated(tx, entries):
+    """Nombre de protéines de la liste sans relation SIMILAR (degré lu nœud par nœud)"""
+    return tx.run(
+        """
+        UNWIND $entries AS entry
+        MATCH (p:Protein {entry: entry})
+        WHERE NOT (p)-[:SIMILAR]-()
+        RETURN count(p) AS isolated
+        """,
+        entries=list(entries)
+    ).single()["isolated"]
+
+
+def get_stats(collection):
+    """
+    Statistiques au format de stats.compute_protein_stats (plus similar_edges),
+    ou None si elles n'ont jamais été calculées pour cette collection.
+    """
+    doc = collection.database[META_COLLECTION].find_one({"_id": _stats_id(collection)})
+    if not doc or "recomputed_at" not in doc:
+        return None
+    total = max(doc.get("total_proteins", 0), 0)
+    labelled = min(max(doc.get("labelled_proteins", 0), 0), total)
+    isolated = min(max(doc.get("isolated_proteins", 0), 0), total)
+    return {
+        "total_proteins": total,
+        "labelled_proteins": labelled,
+        "unlabelled_proteins": total - labelled,
+        "isolated_proteins": isolated,
+        "labelled_ratio": (labelled / total * 100.0) if total else 0.0,
+        "isolated_ratio": (isolated / total * 100.0) if total else 0.0,
+        "similar_edges": max(doc.get("similar_edges", 0), 0),
+        "updated_at": doc.get("updated_at"),
+    }
+
+
+def recompute(collection, neo4j_database=None, driver=None):
+    """Recalcule entièrement les compteurs (réparation, ou après un rechargement)"""
+    neo4j_database = neo4j_database or datasets.active_neo4j_database(COLLECTION_NAME)
+    own_driver = driver is None
+    if own_driver:
+        driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    try:
+        with driver.session(database=neo4j_database) as session:
+            isolated = session.run(
+                "MATCH (p:Protein) WHERE NOT (p)-[:SIMILAR]-() RETURN count(p) AS n"
+            ).single()["n"]
+            # Comptage servi par le count store de Neo4j
+            edges = session.run("MATCH ()-[r:SIMILAR]->() RETURN count(r) AS n").single()["n"]
+    finally:
+        if own_driver:
+            driver.close()
+
+    now = datetime.now(timezone.utc)
+    counters = {
+        "total_proteins": collection.count_documents({}),
+        "labelled_proteins": collection.count_documents(LABELLED_FILTER),
+        "isolated_proteins": isolated,
+        "similar_edges": edges,
+    }
+    collection.database[META_COLLECTION].replace_one(
+        {"_id": _stats_id(collection)},
+        {**counters, "recomputed_at": now, "updated_at": now},
+        upsert=True
+    )
+    print(f"✅ Statistiques recalculées pour {collection.name} : {counters}")
+    return counters
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Statistiques globales maintenues incrémentalement")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("show", help="Affiche les compteurs")
+    sub.add_parser("recompute", help="Recalcule les compteurs depuis MongoDB et Neo4j")
+    args = parser.parse_args()
+
+    client = MongoClient(MONGO_URI)
+    try:
+        dataset = datasets.active_dataset(client[DB_NAME], COLLECTION_NAME)
+        collection = client[DB_NAME][dataset["mongo"]]
+        if args.command == "recompute":
+            recompute(collection, dataset["neo4j"])
+        stats = get_stats(collection)
+        if stats is None:
+            print("ℹ️ Statistiques jamais calculées : lancez 'recompute'")
+        else:
+            for k, v in stats.items():
+                print(f"{k}: {v}")
+    finally:
+        client.close()
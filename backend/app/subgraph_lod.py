@@ -0,0 +1,153 @@
+"""
+Niveau de détail des voisinages affichés (voir neo4j_query.build_subgraph).
+
+Un grand voisinage (k et m élevés) compte des centaines de nœuds et des
+milliers d'arêtes induites : le navigateur ne peut pas les animer. Avant
+l'affichage, simplify_subgraph :
+  1. garde pour chaque nœud l'arête qui le rattache au niveau précédent
+     (niveau 1 -> centre, niveau 2 -> meilleur voisin de niveau 1), puis les
+     autres arêtes par poids décroissant, au plus max_edges_per_node par nœud ;
+  2. regroupe les feuilles de niveau 2 d'un même parent en un nœud agrégé
+     ("+12") dès qu'il y en a plus de collapse_threshold ;
+  3. calcule une disposition radiale (centre, anneau du niveau 1, anneau du
+     niveau 2 dans le secteur de chaque parent) : l'affichage se fait sans
+     simulation physique.
+
+Le coût de rendu dépend donc du nombre d'éléments visibles, pas de la taille
+du voisinage.
+"""
+
+import math
+
+MAX_EDGES_PER_NODE = 6
+COLLAPSE_THRESHOLD = 4
+RING_RADIUS = (0, 300, 600)
+LEVELS = {"center": 0, "level1": 1, "level2": 2}
+# Propriétés inutiles à l'affichage (la séquence est de loin la plus lourde)
+DROPPED_FIELDS = ("sequence",)
+
+
+def _backbone(nodes, edges):
+    """Parent de chaque nœud : son voisin le plus proche du niveau précédent"""
+    level = {n["entry"]: LEVELS.get(n.get("group"), 2) for n in nodes}
+    parent = {}
+    for edge in sorted(edges, key=lambda e: e.get("weight") or 0, reverse=True):
+        for child, other in ((edge["source"], edge["target"]), (edge["target"], edge["source"])):
+            if child in parent or child not in level or other not in level:
+                continue
+            if level[other] == level[child] - 1:
+                parent[child] = (other, edge)
+    return parent
+
+
+def _cap_edges(edges, parent, max_edges_per_node):
+    """Arêtes de rattachement, puis les plus fortes dans la limite par nœud"""
+    kept = [edge for _, edge in parent.values()]
+    kept_ids = {id(edge) for edge in kept}
+    degree = {}
+    for edge in kept:
+        for entry in (edge["source"], edge["target"]):
+            degree[entry] = degree.get(entry, 0) + 1
+    for edge in sorted(edges, key=lambda e: e.get("weight") or 0, reverse=True):
+        if id(edge) in kept_ids:
+            continue
+        if degree.get(edge["source"], 0) >= max_edges_per_node or degree.get(edge["target"], 0) >= max_edges_per_node:
+            continue
+        kept.append(edge)
+        for entry in (edge["source"], edge["target"]):
+            degree[entry] = degree.get(entry, 0) + 1
+    return kept, degree
+
+
+def _layout(nodes_by_id, children):
+    """Coordonnées radiales : chaque parent de niveau 1 reçoit un secteur pour ses enfants"""
+    center = next((e for e, n in nodes_by_id.items() if n.get("group") == "center"), None)
+    level1 = sorted(children.get(center, []), key=lambda e: -(nodes_by_id[e].get("similarity") or 0))
+    placed = {}
+    if center is not None:
+        placed[center] = (0.0, 0.0)
+    sector = 2 * math.pi / max(len(level1), 1)
+    for i, entry in enumerate(level1):
+        angle = i * sector
+        placed[entry] = (RING_RADIUS[1] * math.cos(angle), RING_RADIUS[1] * math.sin(angle))
+        kids = children.get(entry, [])
+        for j, kid in enumerate(kids):
+            # Enfants répartis dans le secteur du parent, centrés sur son angle
+            kid_angle = angle + sector * ((j + 1) / (len(kids) + 1) - 0.5)
+            placed[kid] = (RING_RADIUS[2] * math.cos(kid_angle), RING_RADIUS[2] * math.sin(kid_angle))
+    # Nœuds sans rattachement (cas dégénéré) : sur un anneau extérieur
+    orphans = [e for e in nodes_by_id if e not in placed]
+    for i, entry in enumerate(orphans):
+        angle = 2 * math.pi * i / max(len(orphans), 1)
+        placed[entry] = (1.3 * RING_RADIUS[2] * math.cos(angle), 1.3 * RING_RADIUS[2] * math.sin(angle))
+    return placed
+
+
+def simplify_subgraph(subgraph, max_edges_per_node=MAX_EDGES_PER_NODE, collapse_threshold=COLLAPSE_THRESHOLD):
+    """
+    Réduit un sous-graphe de build_subgraph pour l'affichage.
+
+    Returns:
+        dict: {"nodes": [... + "x", "y", agrégats {"group": "aggregate", "count", "members"}],
+               "edges": [...], "lod": {"nodes_total", "edges_total", "nodes_shown", "edges_shown", "collapsed"}}
+    """
+    if not subgraph:
+        return subgraph
+    nodes = [{k: v for k, v in n.items() if k not in DROPPED_FIELDS} for n in subgraph.get("nodes", [])]
+    edges = subgraph.get("edges", [])
+    nodes_by_id = {n["entry"]: n for n in nodes}
+
+    parent = _backbone(nodes, edges)
+    kept, degree = _cap_edges(edges, parent, max_edges_per_node)
+
+    # Feuilles de niveau 2 : seule arête conservée = celle vers le parent
+    leaves = {}
+    for entry, (parent_entry, _) in parent.items():
+        if nodes_by_id[entry].get("group") == "level2" and degree.get(entry, 0) <= 1:
+            leaves.setdefault(parent_entry, []).append(entry)
+
+    collapsed = set()
+    for parent_entry, members in leaves.items():
+        if len(members) <= collapse_threshold:
+            continue
+        aggregate_id = f"{parent_entry}::+{len(members)}"
+        best = max(members, key=lambda e: nodes_by_id[e].get("similarity") or 0)
+        nodes_by_id[aggregate_id] = {
+            "id": aggregate_id,
+            "entry": aggregate_id,
+            "group": "aggregate",
+            "count": len(members),
+            "members": sorted(members),
+            "similarity": nodes_by_id[best].get("similarity"),
+        }
+        aggregate_edge = {"source": parent_entry, "target": aggregate_id, "weight": parent[best][1].get("weight")}
+        parent[aggregate_id] = (parent_entry, aggregate_edge)
+        kept.append(aggregate_edge)
+        collapsed.update(members)
+
+    for entry in collapsed:
+        del nodes_by_id[entry]
+        del parent[entry]
+    kept = [e for e in kept if e["source"] not in collapsed and e["target"] not in collapsed]
+
+    children = {}
+    for entry, (parent_entry, _) in parent.items():
+        children.setdefault(parent_entry, []).append(entry)
+    for kids in children.values():
+        kids.sort(key=lambda e: -(nodes_by_id[e].get("similarity") or 0))
+
+    positions = _layout(nodes_by_id, children)
+    for entry, node in nodes_by_id.items():
+        node["x"], node["y"] = positions[entry]
+
+    return {
+        "nodes": list(nodes_by_id.values()),
+        "edges": kept,
+        "lod": {
+            "nodes_total": len(nodes),
+            "edges_total": len(edges),
+            "nodes_shown": len(nodes_by_id),
+            "edges_shown": len(kept),
+            "collapsed": len(collapsed),
+        },
+    }
@@ -0,0 +1,197 @@
+"""
+Index d'auto-complétion pour get_protein_suggestions.
+Collection annexe "<collection>_suggestions", un document par protéine :
+
+{
+  "_id": "O14756",
+  "entry_name": "H17B6_HUMAN",
+  "protein_names": ["17-beta-hydroxysteroid dehydrogenase type 6", ...],
+  "tokens": ["h1", "h17", "h17b", ..., "hu", "hum", ...],   # préfixes (edge n-grams) des mots et du nom complet
+  "popularity": 0                                          # nombre de sélections dans la barre de recherche
+}
+
+L'index composé (tokens, popularity) permet de répondre à une frappe par une
+seule lecture d'index, déjà triée par popularité.
+"""
+
+from pymongo import MongoClient, UpdateOne, ASCENDING, DESCENDING
+import os
+import re
+import dotenv
+
+dotenv.load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI")
+DB_NAME = os.getenv("DB_NAME")
+COLLECTION_NAME = os.getenv("COLLECTION_NAME")
+
+MIN_PREFIX = 2
+MAX_PREFIX = 15
+# Nombre de noms alternatifs conservés pour l'affichage
+MAX_NAMES = 3
+# Préfixe plus long que MAX_PREFIX : candidats lus par suggestion renvoyée
+LONG_PREFIX_SCAN = 20
+
+_WORD_SPLIT = re.compile(r"[^0-9a-z]+")
+
+
+def suggestion_collection(collection):
+    """Collection annexe associée à la collection des protéines"""
+    return collection.database[f"{collection.name}_suggestions"]
+
+
+def _edge_ngrams(text):
+    """Préfixes de longueur MIN_PREFIX à MAX_PREFIX"""
+    return [text[:i] for i in range(MIN_PREFIX, min(len(text), MAX_PREFIX) + 1)]
+
+
+def name_tokens(entry_name, protein_names):
+    """
+    Calcule les préfixes indexés pour une protéine :
+    - préfixes de chaque mot (entry_name découpé sur "_", noms découpés sur la ponctuation)
+    - préfixes du nom complet (pour les recherches de plusieurs mots, ex: "cytochrome b")
+    """
+    tokens = set()
+    names = [entry_name or ""] + list(protein_names or [])
+    for name in names:
+        name = name.lower().strip()
+        if not name:
+            continue
+        tokens.update(_edge_ngrams(name))
+        for word in _WORD_SPLIT.split(name):
+            tokens.update(_edge_ngrams(word))
+    return sorted(tokens)
+
+
+def matches_prefix(text, names):
+    """
+    Même règle que l'index, sans limite de longueur : le nom complet ou l'un de
+    ses mots commence par text (déjà en minuscules).
+    """
+    for name in names:
+        name = (name or "").lower().strip()
+        if name.startswith(text) or any(word.startswith(text) for word in _WORD_SPLIT.split(name)):
+            return True
+    return False
+
+
+def prepare_suggestion_document(doc):
+    """Construit le document de suggestion à partir d'un document protéine"""
+    protein_names = doc.get("protein_names") or []
+    return {
+        "_id": doc["_id"],
+        "entry_name": doc.get("entry_name", ""),
+        "protein_names": protein_names[:MAX_NAMES],
+        "tokens": name_tokens(doc.get("entry_name", ""), protein_names),
+    }
+
+
+def ensure_suggestion_indexes(collection):
+    """Index composé multikey (tokens, popularity décroissante) + entry_name pour record_hit"""
+    suggestions = suggestion_collection(collection)
+    suggestions.create_index(
+        [("tokens", ASCENDING), ("popularity", DESCENDING)],
+        name="tokens_popularity"
+    )
+    suggestions.create_index("entry_name", name="entry_name")
+
+
+def index_proteins(collection, docs):
+    """
+    Ajoute ou met à jour les suggestions d'une liste de documents protéines.
+    La popularité déjà acquise est conservée.
+    """
+    ops = []
+    for doc in docs:
+        suggestion = prepare_suggestion_document(doc)
+        ops.append(UpdateOne(
+            {"_id": suggestion["_id"]},
+            {"$set": suggestion, "$setOnInsert": {"popularity": 0}},
+            upsert=True
+        ))
+    if not ops:
+        return 0
+    result = suggestion_collection(collection).bulk_write(ops, ordered=False)
+    return result.upserted_count + result.modified_count
+
+
+def remove_proteins(collection, entries):
+    """Supprime les suggestions des protéines supprimées"""
+    return suggestion_collection(collection).delete_many({"_id": {"$in": list(entries)}}).deleted_count
+
+
+def build_suggestion_index(collection, batch_size=5000):
+    """(Re)construit toute la collection de suggestions à partir des protéines"""
+    suggestions = suggestion_collection(collection)
+    suggestions.drop()
+
+    total = 0
+    batch = []
+    for doc in collection.find({}, {"entry_name": 1, "protein_names": 1}):
+        suggestion = prepare_suggestion_document(doc)
+        suggestion["popularity"] = 0
+        batch.append(suggestion)
+        if len(batch) >= batch_size:
+            suggestions.insert_many(batch, ordered=False)
+            total += len(batch)
+            batch = []
+    if batch:
+        suggestions.insert_many(batch, ordered=False)
+        total += len(batch)
+
+    # Index créé après le chargement : plus rapide qu'une mise à jour à chaque insertion
+    ensure_suggestion_indexes(collection)
+    print(f"✅ {total} protéines indexées pour l'auto-complétion")
+    return total
+
+
+def suggest(collection, prefix, limit=10, rank=True):
+    """
+    Renvoie les suggestions pour un préfixe tapé dans la barre de recherche.
+
+    Args:
+        prefix (str): texte saisi (au moins MIN_PREFIX caractères)
+        limit (int): nombre maximum de suggestions
+        rank (bool): trier par popularité décroissante
+
+    Returns:
+        list: [{"entry_name": ..., "protein_names": [...]}, ...]
+    """
+    text = (prefix or "").lower().strip()
+    if len(text) < MIN_PREFIX:
+        return []
+
+    projection = {"_id": 0, "entry_name": 1, "protein_names": 1}
+    # Au-delà de MAX_PREFIX caractères, on interroge le préfixe indexé (tronqué)
+    # puis on applique la même règle de préfixe au texte complet
+    key = text[:MAX_PREFIX]
+    cursor = suggestion_collection(collection).find({"tokens": key}, projection)
+    if rank:
+        cursor = cursor.sort("popularity", DESCENDING)
+
+    if len(text) <= MAX_PREFIX:
+        return list(cursor.limit(limit))
+
+    results = []
+    for doc in cursor.limit(limit * LONG_PREFIX_SCAN):
+        if matches_prefix(text, [doc.get("entry_name", "")] + list(doc.get("protein_names", []))):
+            results.append(doc)
+            if len(results) >= limit:
+                break
+    return results
+
+
+def record_hit(collection, entry_name):
+    """Incrémente la popularité d'une protéine choisie dans la barre de recherche"""
+    suggestion_collection(collection).update_one(
+        {"entry_name": entry_name},
+        {"$inc": {"popularity": 1}}
+    )
+
+
+if __name__ == "__main__":
+    import datasets
+
+    client = MongoClient(MONGO_URI)
+    build_suggestion_index(datasets.active_collection(client[DB_NAME], COLLECTION_NAME))
+    client.close()
@@ -0,0 +1,393 @@
+"""
+Benchmarks des chemins de requête critiques, sur une collection synthétique.
+Les données sont écrites dans la collection "<COLLECTION_NAME>_bench" (jamais
+dans la collection de l'application) et supprimées à la fin.
+
+Usage :
+    python backend/utils/benchmarks.py kmer --n 1000000
+    python backend/utils/benchmarks.py filters   (lecture seule, sur la collection de l'application)
+    python backend/utils/benchmarks.py add --sizes 1 100 10000
+        (nœuds "BENCH..." écrits dans une base Neo4j temporaire "<NEO4J_DATABASE_NAME>-bench",
+        ou dans --neo4j-database ; les bases de l'application sont refusées)
+    python backend/utils/benchmarks.py writes --repeat 200
+        (latence d'un ajout / d'une suppression, écritures successives puis simultanées)
+"""
+
+from pymongo import MongoClient
+from neo4j import GraphDatabase
+from contextlib import contextmanager
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import dotenv
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'app'))
+import add_protein
+import datasets
+import delete_protein
+from data_version import META_COLLECTION
+import filter_compiler
+import kmer_index
+import outbox
+from mongo_indexes import ensure_indexes
+import sequence_store
+
+dotenv.load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI")
+DB_NAME = os.getenv("DB_NAME")
+COLLECTION_NAME = os.getenv("COLLECTION_NAME")
+
+NEO4J_URI = os.getenv("NEO4J_URI", "neo4j://127.0.0.1:7687")
+NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "NoSQLProject")
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+# Base Neo4j temporaire des benchmarks d'écriture (créée puis supprimée)
+BENCH_NEO4J_DATABASE = f"{datasets.NEO4J_DATABASE}-bench"
+
+
+def _timed(fn, repeat):
+    """Exécute fn `repeat` fois et renvoie les durées en millisecondes"""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+def _report(label, durations):
+    durations = sorted(durations)
+    p95 = durations[int(len(durations) * 0.95) - 1] if len(durations) >= 20 else durations[-1]
+    print(f"  {label:<35} p50 = {statistics.median(durations):9.2f} ms | p95 = {p95:9.2f} ms")
+
+
+def _random_sequence(rng, mean_length=350):
+    length = max(30, int(rng.gauss(mean_length, 120)))
+    return "".join(rng.choices(AMINO_ACIDS, k=length))
+
+
+def bench_collection(client):
+    collection = client[DB_NAME][f"{COLLECTION_NAME}_bench"]
+    cleanup(collection)
+    sequence_store.ensure_sequence_collection(collection)
+    return collection
+
+
+def cleanup(collection):
+    kmer_index.kmer_collection(collection).drop()
+    sequence_store.sequence_collection(collection).drop()
+    collection.drop()
+    # Version des données et statistiques de la collection de test
+    collection.database[META_COLLECTION].delete_many(
+        {"_id": {"$in": [f"data_version:{collection.name}", f"stats:{collection.name}"]}}
+    )
+
+
+def generate_proteins(collection, n, seed=42, batch_size=10_000):
+    """
+    Insère n protéines synthétiques (séquences dans la collection annexe)
+    et renvoie un échantillon de séquences (pour les motifs)
+    """
+    rng = random.Random(seed)
+    samples = []
+    batch = []
+    start = time.perf_counter()
+
+    def flush(docs):
+        sequence_docs = [sequence_store.split_sequence(doc) for doc in docs]
+        collection.insert_many(docs, ordered=False)
+        sequence_store.sequence_collection(collection).insert_many(sequence_docs, ordered=False)
+
+    for i in range(n):
+        sequence = _random_sequence(rng)
+        batch.append({"_id": f"B{i:08d}", "sequence": sequence, "sequence_length": len(sequence)})
+        if len(samples) < 200 and rng.random() < 0.01:
+            samples.append(sequence)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+    print(f"📦 {n} séquences générées en {time.perf_counter() - start:.1f} s")
+    return samples
+
+
+def bench_kmer(client, n, repeat):
+    """Recherche de motif : $regex sur toute la collection vs index de k-mers + vérification"""
+    collection = bench_collection(client)
+    try:
+        samples = generate_proteins(collection, n)
+
+        start = time.perf_counter()
+        kmer_index.build_kmer_index(collection)
+        print(f"🧱 Index de {kmer_index.K}-mers construit en {time.perf_counter() - start:.1f} s")
+
+        rng = random.Random(7)
+        for motif_length in (5, 8, 12):
+            motifs = []
+            for _ in range(repeat):
+                sequence = rng.choice(samples)
+                offset = rng.randrange(0, len(sequence) - motif_length)
+                motifs.append(sequence[offset:offset + motif_length])
+
+            print(f"\n🔍 Motifs de longueur {motif_length} ({repeat} requêtes)")
+            sequences = sequence_store.sequence_collection(collection)
+            it = iter(motifs)
+            _report("$regex (parcours complet)", _timed(
+                lambda: list(sequences.find({"sequence": {"$regex": next(it)}}, {"_id": 1})), repeat))
+
+            def indexed():
+                motif = next(it)
+                candidates = kmer_index.candidate_entries(collection, motif)
+                sequence_store.matching_entries(collection, motif, candidates)
+
+            it = iter(motifs)
+            _report("k-mers + vérification", _timed(indexed, repeat))
+    finally:
+        cleanup(collection)
+
+
+SAMPLE_EXPRESSIONS = [
+    "IPR000001",
+    "(1.14.14.1 AND 4.2.1.152) OR 1.14.14.19",
+    "IPR036396 AND (ec:1.14.14.1 OR ec:1.14.13.-) AND NOT IPR017972",
+    "((IPR001128 OR IPR002401) AND (IPR017972 OR IPR036396)) AND NOT (ec:1.14.14.1 OR ec:1.14.14.19)",
+]
+
+
+def bench_filters(repeat):
+    """
+    Expressions booléennes d'annotations : analyse, compilation à froid
+    (comptage des termes) et en cache, puis exécution de la recherche.
+    """
+    from mongo_queries import ProteinDatabase
+
+    db = ProteinDatabase()
+    try:
+        for expression in SAMPLE_EXPRESSIONS:
+            print(f"\n🧮 {expression}")
+
+            def parse():
+                filter_compiler.parse_expression.cache_clear()
+                filter_compiler.parse_expression(expression)
+
+            _report("analyse", _timed(parse, repeat))
+
+            def compile_cold():
+                db._compiled_cache.clear()
+                db._term_counts.clear()
+                db._compile_annotation_expression(expression)
+
+            _report("compilation (à froid)", _timed(compile_cold, max(1, repeat // 4)))
+            _report("compilation (en cache)", _timed(lambda: db._compile_annotation_expression(expression), repeat))
+            print(f"  requête : {db._compile_annotation_expression(expression)}")
+
+            _report("recherche (page 1)", _timed(
+                lambda: db.advanced_search({"annotations": expression}, count_mode="none"), repeat))
+    finally:
+        db.client.close()
+
+
+def _synthetic_protein(rng, i, n_domains=2000):
+    """Protéine synthétique : domaines tirés d'un vocabulaire fictif (loi de puissance)"""
+    sequence = _random_sequence(rng)
+    domains = {f"IPR9{int(n_domains * rng.random() ** 3):05d}" for _ in range(rng.randint(1, 4))}
+    return {
+        "entry": f"BENCH{i:07d}",
+        "entry_name": f"BENCH{i}_SYNTH",
+        "protein_names": f"Synthetic protein {i}",
+        "organism": "Benchmark",
+        "sequence": sequence,
+        "ec_numbers": "",
+        "interpro": ";".join(sorted(domains)),
+    }
+
+
+def cleanup_neo4j(database, chunk_size=5000):
+    """Supprime les nœuds BENCH... (par morceaux)"""
+    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    try:
+        with driver.session(database=database) as session:
+            session.run(
+                """
+                MATCH (p:Protein) WHERE p.entry STARTS WITH 'BENCH'
+                CALL (p) { DETACH DELETE p } IN TRANSACTIONS OF $chunk ROWS
+                """,
+                chunk=chunk_size
+            ).consume()
+    finally:
+        driver.close()
+
+
+@contextmanager
+def bench_neo4j_database(client, database=None):
+    """
+    Base Neo4j des benchmarks d'écriture : `database` si elle est fournie, sinon
+    BENCH_NEO4J_DATABASE, créée (avec l'index Protein.entry) puis supprimée.
+
+    Raises:
+        ValueError: base active ou précédente de l'application, ou création impossible
+            (édition de Neo4j sans bases multiples : indiquer --neo4j-database)
+    """
+    db = client[DB_NAME]
+    pointer = datasets.get_pointer(db, COLLECTION_NAME) or {}
+    protected = {datasets.active_dataset(db, COLLECTION_NAME)["neo4j"]}
+    if pointer.get("previous"):
+        protected.add(pointer["previous"]["neo4j"])
+    if database in protected:
+        raise ValueError(f"{database} est une base de l'application : indiquez une base dédiée aux benchmarks")
+    if database:
+        yield database
+        return
+
+    import neo4j_graph_builder
+
+    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    try:
+        try:
+            datasets.create_neo4j_database(driver, BENCH_NEO4J_DATABASE)
+        except Exception as e:
+            raise ValueError(
+                f"Création de la base {BENCH_NEO4J_DATABASE} impossible ({e}) : "
+                "indiquez une base existante dédiée aux benchmarks avec --neo4j-database"
+            ) from e
+        try:
+            with driver.session(database=BENCH_NEO4J_DATABASE) as session:
+                session.execute_write(neo4j_graph_builder.create_indexes)
+            yield BENCH_NEO4J_DATABASE
+        finally:
+            datasets.drop_neo4j_database(driver, BENCH_NEO4J_DATABASE)
+    finally:
+        driver.close()
+
+
+def bench_add(client, sizes, database, corpus=0, proteins_per_size=10_000):
+    """
+    Débit d'ajout (protéines/s) pour différentes tailles de lot, MongoDB et Neo4j séparément.
+    corpus : protéines préchargées dans MongoDB (la recherche des candidats
+    passe par l'index InterPro : le débit ne doit pas dépendre de ce nombre).
+    database : base Neo4j dédiée (voir bench_neo4j_database)
+    """
+    rng = random.Random(42)
+    for batch_size in sizes:
+        collection = bench_collection(client)
+        ensure_indexes(collection)
+        cleanup_neo4j(database)
+        for i in range(0, corpus, 10_000):
+            add_protein.add_proteins_to_mongo(
+                [_synthetic_protein(rng, 5_000_000 + j) for j in range(i, min(corpus, i + 10_000))],
+                collection=collection
+            )
+        # Les lots unitaires sont lents : on en mesure moins
+        total = min(proteins_per_size, max(batch_size, 200 * batch_size))
+        proteins = [_synthetic_protein(rng, i) for i in range(total)]
+        # Les protéines du corpus ne sont que dans MongoDB : seules les relations
+        # entre protéines mesurées sont créées dans Neo4j
+        batches = [proteins[i:i + batch_size] for i in range(0, total, batch_size)]
+        try:
+            start = time.perf_counter()
+            for batch in batches:
+                add_protein.add_proteins_to_mongo(batch, collection=collection)
+            mongo_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            relations = sum(
+                len(add_protein.add_proteins_to_neo4j(batch, database=database, collection=collection)["relations"])
+                for batch in batches
+            )
+            neo4j_s = time.perf_counter() - start
+
+            print(
+                f"  lots de {batch_size:>6} : {total} protéines | MongoDB {total / mongo_s:8.0f} prot/s | "
+                f"Neo4j {total / neo4j_s:8.0f} prot/s ({relations} relations)"
+            )
+        finally:
+            cleanup(collection)
+            cleanup_neo4j(database)
+
+
+def bench_writes(client, repeat, database):
+    """
+    Latence d'un ajout puis d'une suppression unitaires (MongoDB + Neo4j),
+    les deux moitiés exécutées l'une après l'autre puis simultanément (outbox.dual_write).
+    database : base Neo4j dédiée (voir bench_neo4j_database)
+    """
+    rng = random.Random(42)
+    collection = bench_collection(client)
+    ensure_indexes(collection)
+    cleanup_neo4j(database)
+    try:
+        for concurrent in (False, True):
+            label = "simultanées" if concurrent else "successives"
+            proteins = [_synthetic_protein(rng, i) for i in range(repeat)]
+            adds, deletes = [], []
+            for protein in proteins:
+                start = time.perf_counter()
+                outbox.dual_write(
+                    lambda: add_protein.add_proteins_to_mongo([protein], collection=collection),
+                    lambda: add_protein.add_proteins_to_neo4j([protein], database=database, collection=collection),
+                    [protein["entry"]], concurrent=concurrent
+                )
+                adds.append((time.perf_counter() - start) * 1000)
+            for protein in proteins:
+                start = time.perf_counter()
+                outbox.dual_write(
+                    lambda: delete_protein.delete_proteins_from_mongo([protein["entry"]], collection=collection),
+                    lambda: delete_protein.delete_proteins_from_neo4j(
+                        [protein["entry"]], database=database, collection=collection
+                    ),
+                    [protein["entry"]], concurrent=concurrent
+                )
+                deletes.append((time.perf_counter() - start) * 1000)
+            print(f"Écritures {label} ({repeat} protéines)")
+            _report("ajout", adds)
+            _report("suppression", deletes)
+    finally:
+        cleanup(collection)
+        cleanup_neo4j(database)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks ProteinProject")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    kmer_parser = sub.add_parser("kmer", help="Recherche de sous-séquence")
+    kmer_parser.add_argument("--n", type=int, default=1_000_000, help="Nombre de séquences synthétiques")
+    kmer_parser.add_argument("--repeat", type=int, default=20, help="Requêtes par longueur de motif")
+
+    filters_parser = sub.add_parser("filters", help="Expressions booléennes EC / InterPro")
+    filters_parser.add_argument("--repeat", type=int, default=20, help="Répétitions par expression")
+
+    add_parser = sub.add_parser("add", help="Ajout de protéines par lots (add_proteins)")
+    add_parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 10_000], help="Tailles de lot")
+    add_parser.add_argument("--neo4j-database", default=None,
+                            help=f"Base Neo4j dédiée (par défaut {BENCH_NEO4J_DATABASE}, temporaire)")
+    add_parser.add_argument("--corpus", type=int, default=0, help="Protéines préchargées dans MongoDB")
+
+    writes_parser = sub.add_parser("writes", help="Latence des écritures MongoDB + Neo4j")
+    writes_parser.add_argument("--repeat", type=int, default=200, help="Ajouts et suppressions mesurés par mode")
+    writes_parser.add_argument("--neo4j-database", default=None,
+                               help=f"Base Neo4j dédiée (par défaut {BENCH_NEO4J_DATABASE}, temporaire)")
+
+    args = parser.parse_args()
+    if args.bench == "filters":
+        bench_filters(args.repeat)
+        sys.exit(0)
+
+    client = MongoClient(MONGO_URI)
+    try:
+        if args.bench == "kmer":
+            bench_kmer(client, args.n, args.repeat)
+        elif args.bench == "add":
+            with bench_neo4j_database(client, args.neo4j_database) as database:
+                bench_add(client, args.sizes, database, args.corpus)
+        elif args.bench == "writes":
+            with bench_neo4j_database(client, args.neo4j_database) as database:
+                bench_writes(client, args.repeat, database)
+    finally:
+        client.close()
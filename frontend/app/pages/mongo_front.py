@@ -1,15 +1,22 @@
 import streamlit as st
 import sys
 import os
+import json
+import tempfile
+import time
+import plotly.express as px
 from streamlit_searchbox import st_searchbox
 
 # Ajouter le chemin du backend pour importer mongo_queries
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'backend', 'app'))
 from mongo_queries import ProteinDatabase
 # --- AJOUT: import du graphe Neo4j ---
-from neo4j_query import build_subgraph
+from neo4j_query import get_subgraph, prefetch_subgraphs, clear_subgraph_cache
+from subgraph_lod import simplify_subgraph, MAX_EDGES_PER_NODE
 
-from delete_protein import delete_protein
+from delete_protein import delete_protein, WRITE_MODE
+import outbox
+from export import EXPORT_FORMATS, write_export
 
 # --- AJOUT: visualisation de graphe ---
 try:
@@ -18,10 +25,15 @@ try:
 except Exception:
     AGRAPH_AVAILABLE = False
 
-@st.cache_data(show_spinner=False)
-def cached_subgraph(entry_for_graph: str, k: int, m: int):
-    # On passe les paramètres au backend
-    return build_subgraph(entry_for_graph, k=k, m=m)
+# Paramètres par défaut du graphe (ceux qui sont préchargés pour la page affichée)
+DEFAULT_GRAPH_K = 5
+DEFAULT_GRAPH_M = 2
+
+
+def cached_subgraph(entry_for_graph: str, k: int, m: int, max_edges: int = MAX_EDGES_PER_NODE):
+    # Cache partagé par toutes les sessions, alimenté aussi par le préchargement (voir neo4j_query.py),
+    # puis réduit pour l'affichage (voir subgraph_lod.py)
+    return simplify_subgraph(get_subgraph(entry_for_graph, k=k, m=m), max_edges_per_node=max_edges)
 
 # Configuration de la page
 st.set_page_config(
@@ -35,6 +47,27 @@ st.set_page_config(
 def get_database():
     return ProteinDatabase()
 
+
+# Pages de résultats en cache : clé = filtres normalisés (JSON trié) + page + version des
+# données. Toute écriture change la version : les pages en cache ne sont plus utilisées.
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_search(filters_json: str, page: int, page_size: int, page_token, facets: bool, data_version):
+    return get_database().advanced_search(
+        filters=json.loads(filters_json),
+        page=page,
+        page_size=page_size,
+        page_token=page_token,
+        count_mode="capped",
+        facets=facets,
+        summary=True
+    )
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def cached_protein_details(entry: str, data_version):
+    # Noms complets et annotations, chargés seulement quand la ligne est dépliée
+    return get_database().get_protein_details(entry)
+
 # Fonction de recherche pour l'auto-complétion (appelée en temps réel)
 def search_proteins(search_term: str):
     """Fonction appelée par st_searchbox pour chercher les protéines en temps réel"""
@@ -72,6 +105,10 @@ if 'interpro_groups' not in st.session_state:
     st.session_state.interpro_groups = ['']  # Liste des groupes InterPro
 if 'current_page' not in st.session_state:
     st.session_state.current_page = 1
+if 'page_tokens' not in st.session_state:
+    st.session_state.page_tokens = {}  # {numéro de page: jeton de continuation (keyset)}
+if 'last_search_signature' not in st.session_state:
+    st.session_state.last_search_signature = None
 
 # États pour la suppression de protéines
 if 'delete_message' not in st.session_state:
@@ -98,6 +135,7 @@ def reset_all():
     st.session_state.ec_groups = ['']
     st.session_state.interpro_groups = ['']
     st.session_state.current_page = 1
+    st.session_state.page_tokens = {}
 
 # Titre principal
 st.title("🧬 Recherche de Protéines")
@@ -118,6 +156,10 @@ with st.expander("ℹ️ Guide d'utilisation des filtres"):
     - → Recherche : `1.14.14.19 OR (1.14.14.1 AND 4.2.1.152)`
     
     Cela trouve les protéines ayant soit EC 1.14.14.19, soit les deux EC 1.14.14.1 et 4.2.1.152.
+    
+    **Expression avancée :** parenthèses imbriquées, `AND`, `OR`, `NOT`, EC et InterPro mélangés
+    - `IPR000001 AND NOT (ec:3.1.1.1 OR ec:3.1.1.2)`
+    - `(1.14.14.1 AND (IPR001128 OR IPR002401)) OR 4.2.1.152`
     """)
 
 # ===========================================
@@ -134,6 +176,14 @@ selected_protein = st_searchbox(
     default=None,
 )
 
+# Popularité des suggestions : on compte chaque nouvelle sélection une seule fois
+if selected_protein and st.session_state.get("last_selected_protein") != selected_protein:
+    st.session_state.last_selected_protein = selected_protein
+    try:
+        get_database().record_suggestion_hit(selected_protein)
+    except Exception:
+        pass
+
 st.markdown("---")
 
 # ===========================================
@@ -214,6 +264,13 @@ if st.sidebar.button("➕ Ajouter groupe InterPro (OR)", key="add_interpro", use
     add_interpro_group()
     st.rerun()
 
+# Expression libre mêlant EC et InterPro (parenthèses, AND, OR, NOT)
+annotation_expression = st.sidebar.text_input(
+    "Expression avancée",
+    placeholder="Ex: IPR000001 AND NOT (ec:3.1.1.1 OR ec:3.1.1.2)",
+    help="Combine EC et InterPro avec AND, OR, NOT et des parenthèses (préfixes ec: / ipr: si besoin)"
+)
+
 # 6. Longueur de séquence
 st.sidebar.subheader("📏 Longueur de Séquence")
 col1, col2 = st.sidebar.columns(2)
@@ -222,7 +279,33 @@ with col1:
 with col2:
     length_max = st.number_input("Max", min_value=0, value=0, step=50, help="0 = pas de limite")
 
-# 7. Pagination
+# 7. Clusters (composantes connexes / communautés pré-calculées)
+st.sidebar.subheader("🧩 Clusters")
+col1, col2 = st.sidebar.columns(2)
+with col1:
+    cluster_filter = st.text_input("Cluster", placeholder="Ex: 12", help="Composante connexe du graphe de similarité")
+with col2:
+    community_filter = st.text_input("Communauté", placeholder="Ex: 3", help="Communauté pondérée (famille)")
+
+
+@st.cache_data(show_spinner=False, ttl=30)
+def cached_cluster_status(data_version):
+    return get_database().cluster_status()
+
+
+try:
+    cluster_status = cached_cluster_status(get_database().data_version())
+except Exception:
+    cluster_status = None
+if cluster_status is None:
+    st.sidebar.caption("ℹ️ Clusters pas encore calculés (`python backend/app/clusters.py`)")
+elif cluster_status["stale"]:
+    st.sidebar.caption(
+        f"⚠️ {cluster_status['changes']} protéine(s) ajoutée(s) ou supprimée(s) depuis le calcul "
+        f"des clusters : résultats approximatifs (`python backend/app/clusters.py`)"
+    )
+
+# 8. Pagination
 st.sidebar.subheader("📄 Pagination")
 page_size = st.sidebar.selectbox(
     "Résultats par page",
@@ -230,6 +313,9 @@ page_size = st.sidebar.selectbox(
     index=1
 )
 
+# Répartitions calculées dans la même requête que la page
+show_facets = st.sidebar.checkbox("📊 Afficher les répartitions", value=False)
+
 # Bouton de recherche
 search_button = st.sidebar.button("🔍 Rechercher", type="primary", use_container_width=True)
 
@@ -238,6 +324,34 @@ if st.sidebar.button("🔄 Réinitialiser", use_container_width=True):
     reset_all()
     st.rerun()
 
+# Synchronisation MongoDB -> Neo4j en arrière-plan (DUAL_WRITE_MODE=outbox)
+@st.cache_resource
+def start_sync_worker():
+    """Un seul worker outbox par processus Streamlit"""
+    return outbox.start_worker()
+
+@st.cache_data(ttl=10, show_spinner=False)
+def cached_outbox_metrics():
+    """Indicateurs de la file, relus au plus toutes les 10 s (pas à chaque interaction)"""
+    return outbox.outbox_metrics(get_database().collection)
+
+if WRITE_MODE == "outbox":
+    start_sync_worker()
+
+    with st.sidebar.expander("🔄 Synchronisation Neo4j"):
+        try:
+            sync = cached_outbox_metrics()
+            st.metric("En attente", sync["backlog"])
+            st.metric("Retard", f"{sync['lag_seconds']:.1f} s")
+            if sync["failed"]:
+                st.warning(f"{sync['failed']} opération(s) en échec (voir outbox.py retry-failed)")
+            st.caption(
+                f"{sync['processed_recent']} traitées en {sync['window_seconds'] // 60} min, "
+                f"délai moyen {sync['avg_apply_seconds']:.2f} s"
+            )
+        except Exception as e:
+            st.caption(f"Indicateurs indisponibles : {e}")
+
 # Fonction pour construire l'expression avancée à partir des groupes
 def build_advanced_expression(groups):
     """
@@ -278,7 +392,8 @@ def build_filters():
     # Priorité à la barre de recherche centrale (selected_protein) si elle est utilisée
     # Sinon, utiliser le mot-clé de la sidebar
     if selected_protein:
-        filters["keyword"] = selected_protein
+        # Le nom vient de l'auto-complétion : recherche exacte servie par l'index entry_name_ci
+        filters["entry_name"] = selected_protein
     elif keyword:
         filters["keyword"] = keyword
     
@@ -304,6 +419,9 @@ def build_filters():
             "mode": "AND"
         }
     
+    if annotation_expression.strip():
+        filters["annotations"] = annotation_expression.strip()
+    
     if length_min > 0 or length_max > 0:
         filters["length"] = {}
         if length_min > 0:
@@ -311,26 +429,112 @@ def build_filters():
         if length_max > 0:
             filters["length"]["max"] = length_max
     
+    if cluster_filter.strip().isdigit():
+        filters["cluster"] = int(cluster_filter.strip())
+    if community_filter.strip().isdigit():
+        filters["community"] = int(community_filter.strip())
+    
     return filters
 
+# Libellés des classes EC (premier niveau)
+EC_CLASS_LABELS = {
+    "1": "Oxydoréductases",
+    "2": "Transférases",
+    "3": "Hydrolases",
+    "4": "Lyases",
+    "5": "Isomérases",
+    "6": "Ligases",
+    "7": "Translocases",
+}
+
+# Affichage des répartitions (facettes) renvoyées par advanced_search
+def display_facets(facets):
+    with st.expander("📊 Répartitions des résultats", expanded=True):
+        if facets.get("truncated"):
+            st.caption("Répartitions calculées sur un échantillon des premiers résultats.")
+
+        c1, c2 = st.columns(2)
+        with c1:
+            organisms = facets.get("organisms", [])
+            if organisms:
+                fig = px.bar(
+                    x=[o["count"] for o in organisms],
+                    y=[o["value"] for o in organisms],
+                    orientation="h",
+                    title="Organismes (top 10)",
+                    labels={"x": "Protéines", "y": ""},
+                )
+                fig.update_layout(margin=dict(t=40, b=10, l=10, r=10), yaxis=dict(autorange="reversed"))
+                st.plotly_chart(fig, use_container_width=True)
+        with c2:
+            ec_classes = facets.get("ec_classes", [])
+            if ec_classes:
+                fig = px.pie(
+                    names=[f"EC {c['value']} - {EC_CLASS_LABELS.get(c['value'], '?')}" for c in ec_classes],
+                    values=[c["count"] for c in ec_classes],
+                    hole=0.3,
+                    title="Classes EC",
+                )
+                fig.update_layout(margin=dict(t=40, b=10, l=10, r=10))
+                st.plotly_chart(fig, use_container_width=True)
+
+        c3, c4 = st.columns(2)
+        with c3:
+            interpro = facets.get("interpro", [])
+            if interpro:
+                fig = px.bar(
+                    x=[i["count"] for i in interpro],
+                    y=[i["value"] for i in interpro],
+                    orientation="h",
+                    title="Domaines InterPro (top 10)",
+                    labels={"x": "Protéines", "y": ""},
+                )
+                fig.update_layout(margin=dict(t=40, b=10, l=10, r=10), yaxis=dict(autorange="reversed"))
+                st.plotly_chart(fig, use_container_width=True)
+        with c4:
+            lengths = facets.get("lengths", [])
+            if lengths:
+                fig = px.bar(
+                    x=[f"≥ {b['value']}" if isinstance(b["value"], int) else b["value"] for b in lengths],
+                    y=[b["count"] for b in lengths],
+                    title="Longueur de séquence (aa)",
+                    labels={"x": "", "y": "Protéines"},
+                )
+                fig.update_layout(margin=dict(t=40, b=10, l=10, r=10))
+                st.plotly_chart(fig, use_container_width=True)
+
 # Affichage des résultats
 def display_results(results_data):
     total = results_data["total_matches"]
     page = results_data["page"]
     per_page = results_data["per_page"]
     results = results_data["results"]
+    next_page_token = results_data.get("next_page_token")
+    # Comptage plafonné : au-delà du plafond on affiche "10 000+" et la dernière page est inconnue
+    total_is_capped = results_data.get("total_is_capped", False)
+    if total is None:
+        # Comptage désactivé ou interrompu (délai dépassé)
+        total_display, pages_display = "?", "?"
+    else:
+        total_display = f"{total:,}+".replace(",", " ") if total_is_capped else total
+        pages_display = f"{max(1, (total + per_page - 1) // per_page)}{'+' if total_is_capped else ''}"
     
     # Statistiques
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("📊 Total de résultats", total)
+        st.metric("📊 Total de résultats", total_display)
     with col2:
-        st.metric("📄 Page actuelle", f"{page} / {max(1, (total + per_page - 1) // per_page)}")
+        st.metric("📄 Page actuelle", f"{page} / {pages_display}")
     with col3:
         st.metric("🔢 Résultats affichés", len(results))
     
     st.markdown("---")
     
+    if results_data.get("facets"):
+        display_facets(results_data["facets"])
+    elif "facets" in results_data:
+        st.caption("⚠️ Répartitions indisponibles : calcul interrompu (filtre trop large)")
+    
     # ======== MESSAGE DE SUPPRESSION ========
     if st.session_state.delete_message:
         msg = st.session_state.delete_message
@@ -360,11 +564,13 @@ def display_results(results_data):
             if st.button("✅ Oui, supprimer", key="confirm_delete_btn", type="primary"):
                 # Effectuer la suppression
                 delete_result = delete_protein(protein_id)
-                if delete_result["mongodb"]["deleted"] or delete_result["neo4j"]["deleted"]:
-                    st.session_state.delete_message = {
-                        "type": "success",
-                        "text": f"✅ Protéine `{protein_name}` supprimée avec succès."
-                    }
+                # Les voisinages en cache peuvent contenir la protéine supprimée
+                clear_subgraph_cache()
+                if delete_result["success"]:
+                    text = f"✅ Protéine `{protein_name}` supprimée avec succès."
+                    if delete_result["neo4j"]["pending"] or delete_result["neo4j"]["queued"]:
+                        text += " Le graphe sera mis à jour en arrière-plan."
+                    st.session_state.delete_message = {"type": "success", "text": text}
                 else:
                     st.session_state.delete_message = {
                         "type": "error",
@@ -396,7 +602,9 @@ def display_results(results_data):
         if graph_key not in st.session_state:
             st.session_state[graph_key] = False
 
-        label = f"🧬 **{protein.get('entry_name', 'N/A')}** - {protein.get('protein_names', 'N/A')[:80]}..."
+        # Résultats en mode résumé : seul le premier nom est chargé
+        first_name = (protein.get('protein_names') or ['N/A'])[0]
+        label = f"🧬 **{protein.get('entry_name', 'N/A')}** - {first_name[:80]}..."
         with st.expander(label, expanded=st.session_state[expander_key]):
             # Forcer l’expander à rester ouvert si le graphe est affiché
             if st.session_state[graph_key] and not st.session_state[expander_key]:
@@ -410,23 +618,36 @@ def display_results(results_data):
                 st.write(f"**Entry Name:** {protein.get('entry_name', 'N/A')}")
                 st.write(f"**Organisme:** {protein.get('organism', 'N/A')}")
                 st.write(f"**Longueur:** {protein.get('sequence_length', 'N/A')} aa")
+                if protein.get('cluster_id') is not None:
+                    st.write(f"**Cluster:** {protein['cluster_id']} ({protein.get('cluster_size', '?')} protéines)")
+                if protein.get('community_id') is not None:
+                    st.write(f"**Communauté:** {protein['community_id']} ({protein.get('community_size', '?')} protéines)")
+
+            # --- Détails (noms complets, annotations) chargés à la demande ---
+            details_key = f"details_open_{entry_for_graph}"
+            details = None
+            if st.session_state.get(details_key):
+                details = cached_protein_details(entry_for_graph, get_database().data_version()) or {}
 
             with col2:
                 st.markdown("**Annotations**")
-                annotations = protein.get('annotations', {})
-                ec_numbers = annotations.get('ec_numbers', [])
-                if ec_numbers:
-                    st.write(f"**EC Numbers:** {', '.join(ec_numbers) if isinstance(ec_numbers, list) else ec_numbers}")
+                if details is None:
+                    if st.button("Afficher les annotations", key=f"btn_show_details_{entry_for_graph}"):
+                        st.session_state[details_key] = True
+                        st.session_state[expander_key] = True
+                        st.rerun()
                 else:
-                    st.write("**EC Numbers:** Aucun")
-                interpro_ids = annotations.get('interpro', [])
-                if interpro_ids:
-                    if isinstance(interpro_ids, list):
+                    annotations = details.get('annotations', {})
+                    ec_numbers = annotations.get('ec_numbers', [])
+                    if ec_numbers:
+                        st.write(f"**EC Numbers:** {', '.join(ec_numbers)}")
+                    else:
+                        st.write("**EC Numbers:** Aucun")
+                    interpro_ids = annotations.get('interpro', [])
+                    if interpro_ids:
                         st.write(f"**InterPro:** {', '.join(interpro_ids[:5])}{'...' if len(interpro_ids) > 5 else ''}")
                     else:
-                        st.write(f"**InterPro:** {interpro_ids}")
-                else:
-                    st.write("**InterPro:** Aucun")
+                        st.write("**InterPro:** Aucun")
                 
                 # Bouton pour demander confirmation de suppression
                 if st.button("Supprimer cette protéine", key=f"delete_btn_{entry_for_graph}", type="primary"):
@@ -436,8 +657,18 @@ def display_results(results_data):
                     }
                     st.rerun()
 
-            st.markdown("**Nom complet de la protéine:**")
-            st.info(protein.get('protein_names', 'N/A'))
+            if details is not None:
+                st.markdown("**Nom complet de la protéine:**")
+                st.info("; ".join(details.get('protein_names', [])) or 'N/A')
+
+            # --- Séquence (stockée à part, lue seulement à la demande) ---
+            sequence_key = f"sequence_open_{entry_for_graph}"
+            if st.session_state.get(sequence_key):
+                st.code(get_database().get_sequence(entry_for_graph) or "Séquence indisponible", language=None)
+            elif st.button("Afficher la séquence", key=f"btn_show_seq_{entry_for_graph}"):
+                st.session_state[sequence_key] = True
+                st.session_state[expander_key] = True
+                st.rerun()
 
             # --- Graphe Neo4j (lazy, état persistant) ---
             st.markdown("**Graphe de similarité (Neo4j)**")
@@ -463,22 +694,25 @@ def display_results(results_data):
                     
                     # --- PARAMÈTRES DU GRAPHE ---
                     # On permet à l'utilisateur de régler la densité
-                    c_param1, c_param2, c_legend = st.columns([1, 1, 2])
+                    c_param1, c_param2, c_param3, c_legend = st.columns([1, 1, 1, 2])
                     with c_param1:
-                        k_val = st.slider(f"Voisins directs (k) - {entry_for_graph}", 1, 20, 5, key=f"k_{entry_for_graph}")
+                        k_val = st.slider(f"Voisins directs (k) - {entry_for_graph}", 1, 20, DEFAULT_GRAPH_K, key=f"k_{entry_for_graph}")
                     with c_param2:
-                        m_val = st.slider(f"Voisins niv.2 (m) - {entry_for_graph}", 0, 10, 2, key=f"m_{entry_for_graph}")
+                        m_val = st.slider(f"Voisins niv.2 (m) - {entry_for_graph}", 0, 10, DEFAULT_GRAPH_M, key=f"m_{entry_for_graph}")
+                    with c_param3:
+                        max_edges_val = st.slider(f"Arêtes max par nœud - {entry_for_graph}", 1, 20, MAX_EDGES_PER_NODE, key=f"lod_{entry_for_graph}")
                     with c_legend:
                         st.info(
                             "🔴 **Rouge** : Protéine Cible\n\n"
                             "🔵 **Bleu** : Voisins directs (Niveau 1)\n\n"
-                            "🟢 **Vert** : Voisins de voisins (Niveau 2)"
+                            "🟢 **Vert** : Voisins de voisins (Niveau 2)\n\n"
+                            "⚪ **Gris (+n)** : Voisins de niveau 2 regroupés"
                         )
 
                     with st.spinner("Construction du graphe..."):
                         try:
                             # Appel avec les paramètres dynamiques
-                            subgraph = cached_subgraph(entry_for_graph, k=k_val, m=m_val)
+                            subgraph = cached_subgraph(entry_for_graph, k=k_val, m=m_val, max_edges=max_edges_val)
                         except Exception as e:
                             subgraph = None
                             st.error(f"Erreur Neo4j: {e}")
@@ -496,6 +730,12 @@ def display_results(results_data):
                         # Affichage du message si isolé
                         if is_isolated:
                             st.info("⚠️ **Nœud isolé** : Cette protéine ne possède pas de voisins similaires (arêtes) avec les paramètres actuels.")
+                        lod = subgraph.get("lod", {})
+                        if lod.get("nodes_shown", 0) < lod.get("nodes_total", 0) or lod.get("edges_shown", 0) < lod.get("edges_total", 0):
+                            st.caption(
+                                f"Vue simplifiée : {lod['nodes_shown']}/{lod['nodes_total']} nœuds, "
+                                f"{lod['edges_shown']}/{lod['edges_total']} arêtes ({lod['collapsed']} voisins regroupés)"
+                            )
                         nodes = []
                         for n in nodes_list:
                             # --- NOUVELLE LOGIQUE DE COULEURS ---
@@ -504,6 +744,23 @@ def display_results(results_data):
                             group = n.get("group", "neighbor")
 
                             # Formatage du score en pourcentage (ex: 0.954 -> 95.4%)
+                            if group == "aggregate":
+                                # Voisins de niveau 2 regroupés (voir subgraph_lod.py)
+                                members = n.get("members", [])
+                                nodes.append(
+                                    Node(
+                                        id=n["id"],
+                                        label=f"+{n.get('count', len(members))}",
+                                        size=20,
+                                        title="Voisins regroupés :\n" + "\n".join(members[:15]) + ("\n..." if len(members) > 15 else ""),
+                                        color="#adb5bd",
+                                        shape="dot",
+                                        x=n["x"],
+                                        y=n["y"],
+                                    )
+                                )
+                                continue
+
                             if group == "center":
                                 score_display = "REF (100%)"
                             elif similarity:
@@ -537,11 +794,8 @@ def display_results(results_data):
                             ec_numbers = n.get("ec_numbers", [])
                             interpro_list = n.get("interpro_list", [])
                             
-                            # Gestion propre des listes pour l'affichage
-                            if isinstance(protein_names, list):
-                                p_names_str = "; ".join(protein_names[:2]) # On n'en montre que 2
-                            else:
-                                p_names_str = str(protein_names)
+                            # Propriétés toujours stockées en listes (voir neo4j_migrate.py)
+                            p_names_str = "; ".join(protein_names[:2]) # On n'en montre que 2
                                 
                             title = (
                                 f"[{group.upper()}] - Sim: {score_display}\n" 
@@ -550,8 +804,8 @@ def display_results(results_data):
                                 f"Name: {entry_name}\n"
                                 f"Org: {organism}\n"
                                 f"Desc: {p_names_str[:100]}..."
-                                f"\nEC: {', '.join(ec_numbers) if isinstance(ec_numbers, list) else ec_numbers}"
-                                f"\nInterPro: {', '.join(interpro_list) if isinstance(interpro_list, list) else interpro_list}"
+                                f"\nEC: {', '.join(ec_numbers)}"
+                                f"\nInterPro: {', '.join(interpro_list)}"
                             )
 
                             nodes.append(
@@ -564,6 +818,9 @@ def display_results(results_data):
                                     shape="dot",
                                     borderWidth=2,
                                     borderWidthSelected=4,
+                                    # Disposition précalculée (voir subgraph_lod.py)
+                                    x=n["x"],
+                                    y=n["y"],
                                 )
                             )
 
@@ -575,13 +832,6 @@ def display_results(results_data):
                             # Sécurité : on s'assure que le poids est entre 0 et 1
                             weight = max(0, min(1, weight))
                             
-                            # --- CALCUL DE LA DISTANCE PHYSIQUE ---
-                            # Distance basée sur la dissimilarité (1 - weight)
-                            # weight = 0.99 -> length = 150 + (0.01 * 400) = 154px
-                            # weight = 0.50 -> length = 150 + (0.50 * 400) = 350px
-                            # weight = 0.10 -> length = 150 + (0.90 * 400) = 510px
-                            edge_length = 150 + (1 - weight) * 400
-                            
                             # --- CALCUL DE L'ÉPAISSEUR VISUELLE ---
                             # Arêtes fines : de 0.3px à 2px
                             edge_width = 0.3 + (weight * 1.7)
@@ -592,39 +842,34 @@ def display_results(results_data):
                                 source=e["source"], 
                                 target=e["target"],
                                 color=edge_color,
-                                width=edge_width,
-                                length=edge_length
+                                width=edge_width
                             ))
                         
+                        # Positions précalculées côté serveur : pas de simulation physique dans le navigateur
                         config = Config(
                             width=1000,
                             height=600,
                             directed=False,
-                            physics=True,
+                            physics=False,
                             hierarchical=False,
-                            physicsOptions={
-                                "barnesHut": {
-                                    "gravitationalConstant": -3000,  # Augmenté pour plus de répulsion
-                                    "centralGravity": 0.2,           # Réduit pour moins attirer au centre
-                                    "springConstant": 0.08,          # Augmenté pour mieux respecter edge_length
-                                    "springLength": 200,             # Distance de repos des ressorts
-                                    "damping": 0.15,                 # Augmenté pour stabiliser plus vite
-                                    "avoidOverlap": 0.8              # Augmenté pour éviter les chevauchements
-                                },
-                                "stabilization": {
-                                    "enabled": True,
-                                    "iterations": 200                # Plus d'itérations pour converger
-                                }
-                            }
                         )
                         
                         left, center_col, right = st.columns([1, 10, 1])
                         with center_col:
                             agraph(nodes=nodes, edges=edges, config=config) # Pas de key=agraph_key ici parfois ça bug avec agraph, test sans d'abord
 
+    # Préchargement des graphes de la page en arrière-plan : l'affichage d'un graphe devient immédiat
+    if AGRAPH_AVAILABLE:
+        try:
+            prefetch_subgraphs([p["_id"] for p in results if p.get("_id")], k=DEFAULT_GRAPH_K, m=DEFAULT_GRAPH_M)
+        except Exception as e:
+            print(f"ℹ️ Préchargement des graphes impossible : {e}")
+
     # Pagination
     st.markdown("---")
-    total_pages = max(1, (total + per_page - 1) // per_page)
+    # Nombre de pages inconnu si le comptage a été interrompu (total None)
+    total_pages = None if total is None else max(1, (total + per_page - 1) // per_page)
+    last_page_unknown = total_pages is None or total_is_capped
     
     col1, col2, col3, col4, col5 = st.columns([1, 1, 2, 1, 1])
     
@@ -639,18 +884,41 @@ def display_results(results_data):
             st.rerun()
     
     with col3:
-        st.markdown(f"<p style='text-align: center;'>Page {page} sur {total_pages}</p>", unsafe_allow_html=True)
+        st.markdown(f"<p style='text-align: center;'>Page {page} sur {pages_display}</p>", unsafe_allow_html=True)
     
     with col4:
-        if st.button("Suivant ▶️", disabled=(page >= total_pages)):
+        if st.button("Suivant ▶️", disabled=not next_page_token):
+            # La page suivante est lue par jeton (keyset) plutôt que par skip
+            st.session_state.page_tokens[page + 1] = next_page_token
             st.session_state.current_page = page + 1
             st.rerun()
     
     with col5:
-        if st.button("Fin ⏭️", disabled=(page >= total_pages)):
+        if st.button("Fin ⏭️", disabled=(last_page_unknown or page >= total_pages)):
             st.session_state.current_page = total_pages
             st.rerun()
 
+# Exports préparés : fichiers temporaires supprimés après téléchargement, ou au
+# plus tard EXPORT_FILE_MAX_AGE secondes après leur création (session abandonnée)
+EXPORT_FILE_PREFIX = "proteines-export-"
+EXPORT_FILE_MAX_AGE = 3600
+
+
+def discard_export_file():
+    """Supprime l'export préparé de la session et les exports abandonnés"""
+    export_file = st.session_state.pop("export_file", None)
+    if export_file and os.path.isfile(export_file["path"]):
+        os.remove(export_file["path"])
+    now = time.time()
+    for name in os.listdir(tempfile.gettempdir()):
+        path = os.path.join(tempfile.gettempdir(), name)
+        try:
+            if name.startswith(EXPORT_FILE_PREFIX) and now - os.path.getmtime(path) > EXPORT_FILE_MAX_AGE:
+                os.remove(path)
+        except OSError:
+            pass
+
+
 # Logique principale
 try:
     db = get_database()
@@ -667,6 +935,8 @@ try:
         filter_tags = []
         if filters.get("keyword"):
             filter_tags.append(f"🔤 Mot-clé: `{filters['keyword']}`")
+        if filters.get("entry_name"):
+            filter_tags.append(f"🔤 Protéine: `{filters['entry_name']}`")
         if filters.get("organism"):
             filter_tags.append(f"🦠 Organisme: `{filters['organism']}`")
         if filters.get("sequence"):
@@ -677,46 +947,196 @@ try:
         if filters.get("interpro"):
             ipr_expr = filters['interpro']['values']
             filter_tags.append(f"🏷️ InterPro: `{ipr_expr}`")
+        if filters.get("annotations"):
+            filter_tags.append(f"🧮 Expression: `{filters['annotations']}`")
         if filters.get("length"):
             length_str = f"Min: {filters['length'].get('min', '-')}, Max: {filters['length'].get('max', '-')}"
             filter_tags.append(f"📏 Longueur: `{length_str}`")
+        if filters.get("cluster") is not None:
+            filter_tags.append(f"🧩 Cluster: `{filters['cluster']}`")
+        if filters.get("community") is not None:
+            filter_tags.append(f"🧩 Communauté: `{filters['community']}`")
         
         st.markdown(" | ".join(filter_tags))
         st.markdown("---")
     
+    # Nouveaux filtres : on repart de la première page et on oublie les jetons
+    search_signature = json.dumps({"filters": filters, "page_size": page_size}, sort_keys=True, default=str)
+    if search_signature != st.session_state.last_search_signature:
+        st.session_state.last_search_signature = search_signature
+        st.session_state.current_page = 1
+        st.session_state.page_tokens = {}
+    
     # Effectuer la recherche
+    # (jeton de continuation si la page a été atteinte avec "Suivant", sinon pagination par skip)
     with st.spinner("🔍 Recherche en cours..."):
-        results = db.advanced_search(
-            filters=filters,
-            page=st.session_state.current_page,
-            page_size=page_size
+        results = cached_search(
+            json.dumps(filters, sort_keys=True, default=str),
+            st.session_state.current_page,
+            page_size,
+            st.session_state.page_tokens.get(st.session_state.current_page),
+            show_facets,
+            db.data_version()
         )
     
     # Afficher les résultats
     display_results(results)
 
+    # Export de tous les résultats (pas seulement la page affichée)
+    with st.expander("📥 Exporter tous les résultats"):
+        export_format = st.selectbox("Format", options=list(EXPORT_FORMATS), format_func=str.upper)
+        # Un export préparé ne vaut que pour ces filtres, ce format et cette version des données
+        export_key = (json.dumps(filters, sort_keys=True, default=str), export_format, db.data_version())
+        if st.button("Préparer l'export", key="prepare_export"):
+            discard_export_file()
+            # Génération en flux vers un fichier temporaire : seul son chemin est gardé
+            # dans la session, le contenu n'est jamais copié en mémoire par la page
+            with st.spinner("Export en cours..."):
+                with tempfile.NamedTemporaryFile(
+                    prefix=EXPORT_FILE_PREFIX, suffix=f".{EXPORT_FORMATS[export_format]['extension']}", delete=False
+                ) as f:
+                    try:
+                        size = write_export(db, filters, f, fmt=export_format)
+                    except Exception:
+                        f.close()
+                        os.remove(f.name)
+                        raise
+            st.session_state.export_file = {"key": export_key, "format": export_format, "path": f.name, "size": size}
+
+        export_file = st.session_state.get("export_file")
+        if export_file and (export_file["key"] != export_key or not os.path.isfile(export_file["path"])):
+            # Filtres ou données modifiés depuis la préparation : l'export n'est plus valable
+            discard_export_file()
+            export_file = None
+        if export_file:
+            fmt_info = EXPORT_FORMATS[export_file["format"]]
+            with open(export_file["path"], "rb") as f:
+                st.download_button(
+                    f"⬇️ Télécharger ({export_file['size'] / 1e6:.1f} Mo)",
+                    data=f,
+                    file_name=f"proteines.{fmt_info['extension']}",
+                    mime=fmt_info["mime"],
+                    # Fichier supprimé une fois téléchargé
+                    on_click=discard_export_file,
+                )
+
+except ValueError as e:
+    # Filtre invalide ou trop peu sélectif (ex: sous-séquence trop courante)
+    st.warning(f"⚠️ {e}")
 except Exception as e:
     st.error(f"❌ Erreur de connexion à la base de données: {e}")
     st.info("Vérifiez que MongoDB est en cours d'exécution et que les variables d'environnement sont configurées.")
 
 
-import plotly.express as px
-from stats import compute_protein_stats  # nouveau
-@st.cache_data(show_spinner=False)
-def get_global_protein_stats():
+from stats import compute_protein_stats, get_graph_stats  # nouveau
+
+
+@st.cache_data(show_spinner=False, ttl=15)
+def get_computed_protein_stats():
     """
-    Wrap de compute_protein_stats() avec cache Streamlit,
-    pour éviter de relire les gros CSV à chaque interaction.
+    Wrap de compute_protein_stats() avec cache Streamlit. Backend par défaut :
+    MongoDB + Neo4j (STATS_BACKEND), aucun CSV requis sur le serveur web.
     """
     return compute_protein_stats()
 
 
+@st.cache_data(show_spinner=False, ttl=60)
+def get_detailed_stats():
+    """
+    Statistiques détaillées du graphe lues dans le cache du backend (voir
+    stats.get_graph_stats) : rien n'est calculé à l'affichage, None si le cache
+    n'existe pas encore.
+    """
+    return get_graph_stats(build=False)
+
+
+def display_detailed_stats(detailed):
+    st.caption(
+        f"{detailed['total_proteins']} protéines, {detailed['total_edges']} relations SIMILAR "
+        f"— calculées le {detailed.get('computed_at', '-')}"
+        + (" (données modifiées depuis)" if detailed.get("stale") else "")
+    )
+    c1, c2 = st.columns(2)
+    with c1:
+        degree = detailed["degree"]
+        fig = px.bar(
+            x=[b["bucket"] for b in degree["histogram"]],
+            y=[b["count"] for b in degree["histogram"]],
+            log_y=True,
+            title=f"Degrés (moyenne {degree['mean']:.1f}, médiane {degree['p50']:.0f}, max {degree['max']})",
+            labels={"x": "Voisins", "y": "Protéines"},
+        )
+        fig.update_layout(margin=dict(t=40, b=10, l=10, r=10))
+        st.plotly_chart(fig, use_container_width=True)
+    with c2:
+        weight = detailed["weight"]
+        fig = px.bar(
+            x=[f"{b['bin_start']:.2f}" for b in weight["histogram"]],
+            y=[b["count"] for b in weight["histogram"]],
+            title=f"Poids de Jaccard (médiane ≈ {weight['p50']:.2f})",
+            labels={"x": "Poids", "y": "Relations"},
+        )
+        fig.update_layout(margin=dict(t=40, b=10, l=10, r=10))
+        st.plotly_chart(fig, use_container_width=True)
+
+    c3, c4 = st.columns(2)
+    with c3:
+        fig = px.pie(
+            names=[f"EC {k} - {EC_CLASS_LABELS.get(k, '?')}" for k in detailed["ec_classes"]],
+            values=list(detailed["ec_classes"].values()),
+            hole=0.3,
+            title="Classes EC",
+        )
+        fig.update_layout(margin=dict(t=40, b=10, l=10, r=10))
+        st.plotly_chart(fig, use_container_width=True)
+    with c4:
+        lengths = detailed["sequence_length"]
+        quantiles = ["p5", "p25", "p50", "p75", "p95", "p99"]
+        fig = px.bar(
+            x=quantiles,
+            y=[lengths[q] for q in quantiles],
+            title=f"Longueur de séquence : quantiles (moyenne {lengths['mean']:.0f} aa)",
+            labels={"x": "", "y": "Acides aminés"},
+        )
+        fig.update_layout(margin=dict(t=40, b=10, l=10, r=10))
+        st.plotly_chart(fig, use_container_width=True)
+
+    c5, c6 = st.columns(2)
+    for column, key, title in (
+        (c5, "top_interpro", f"Domaines InterPro (top 20 sur {detailed['interpro_distinct']})"),
+        (c6, "top_organisms", f"Organismes (top 20 sur {detailed['organisms_distinct']})"),
+    ):
+        with column:
+            fig = px.bar(
+                x=[count for _, count in detailed[key]],
+                y=[value for value, _ in detailed[key]],
+                orientation="h",
+                title=title,
+                labels={"x": "Protéines", "y": ""},
+            )
+            fig.update_layout(margin=dict(t=40, b=10, l=10, r=10), yaxis=dict(autorange="reversed"))
+            st.plotly_chart(fig, use_container_width=True)
+
+
+def get_global_protein_stats():
+    """
+    Compteurs maintenus à chaque ajout / suppression (voir stats_store.py), lus
+    par compute_protein_stats : une seule lecture, recalcul seulement s'ils
+    n'existent pas, dernières valeurs connues si les bases ne répondent pas.
+    """
+    return get_computed_protein_stats()
+
+
 # ==============================
-# Statistiques globales (CSV)
+# Statistiques globales
 # ==============================
-with st.expander("📈 Statistiques globales (nodes.csv / edges.csv)", expanded=False):
+with st.expander("📈 Statistiques globales", expanded=False):
     try:
         stats = get_global_protein_stats()
+        if stats.get("stale"):
+            st.caption("⚠️ Bases injoignables : dernières valeurs connues")
+        elif stats.get("source") == "csv":
+            st.caption("Calculées depuis nodes.csv / edges.csv (lancez `python backend/app/stats_store.py recompute`)")
 
         col1, col2, col3 = st.columns(3)
         with col1:
@@ -790,6 +1210,23 @@ with st.expander("📈 Statistiques globales (nodes.csv / edges.csv)", expanded=
     except Exception as e:
         st.error(f"Erreur lors du calcul des statistiques globales : {e}")
 
+    st.markdown("### Statistiques détaillées du graphe")
+    if st.checkbox("Afficher (degrés, poids, classes EC, domaines, organismes, longueurs)", key="detailed_stats"):
+        try:
+            detailed = get_detailed_stats()
+            if detailed is None:
+                st.info("ℹ️ Statistiques détaillées pas encore calculées.")
+            else:
+                display_detailed_stats(detailed)
+            if detailed is None or detailed.get("stale"):
+                if st.button("🔄 Calculer depuis MongoDB et Neo4j", key="build_detailed_stats"):
+                    with st.spinner("Calcul des statistiques détaillées..."):
+                        get_graph_stats()
+                    get_detailed_stats.clear()
+                    st.rerun()
+        except Exception as e:
+            st.error(f"Erreur lors du calcul des statistiques détaillées : {e}")
+
 
 # Footer
 st.markdown("---")